@@ -0,0 +1,265 @@
+"""
+End-to-end benchmarks of Client, Session and Transporter against a local
+stand-in server.
+
+    python -m benchmarks.bench_client [--requests 500] [--threads 8]
+        [--latency 0.001] [--scenario latency ...] [--output results.json]
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+
+from monitoring.client import Client
+from monitoring.configs import MonitoringConfig
+from monitoring.exceptions import (
+    MonitoringUnreachableHostException,
+    RequestException
+)
+from monitoring.http.hosts import HostsCollection
+from monitoring.http.verb import Verb
+
+from benchmarks.bench_serializer import session_stop
+from benchmarks.server import StandInServer
+
+
+def connect(servers, **options):
+    # type: (list, **object) -> Client
+
+    config = MonitoringConfig('benchmark', 'benchmark-key')
+    config.hosts = HostsCollection([
+        server.host(priority=len(servers) - i)
+        for i, server in enumerate(servers)
+    ])
+
+    for name, value in options.items():
+        setattr(config, name, value)
+
+    return Client.connect_with_config(config)
+
+
+def run_session(client, payload):
+    # type: (Client, dict) -> None
+
+    session = client.monitoring_session('benchmark', 'model')
+    session.start()
+    session.set_data_input(payload['data_input'])
+    session.set_data_output(payload['data_output'])
+    session.set_metadata(payload['metadata'])
+    session.stop()
+
+
+def measure(name, calls, function, threads=1):
+    # type: (str, int, Callable[[], None], int) -> dict
+
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def worker(count):
+        own = []
+        for _ in range(count):
+            started = time.time()
+            try:
+                function()
+            except (RequestException, MonitoringUnreachableHostException):
+                with lock:
+                    errors[0] += 1
+            own.append(time.time() - started)
+
+        with lock:
+            latencies.extend(own)
+
+    started = time.time()
+    workers = [
+        threading.Thread(target=worker,
+                         args=(calls // threads + (i < calls % threads),))
+        for i in range(threads)
+    ]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.time() - started
+
+    latencies.sort()
+
+    def percentile(q):
+        return latencies[min(int(len(latencies) * q), len(latencies) - 1)] \
+            * 1000
+
+    return {
+        'scenario': name,
+        'calls': len(latencies),
+        'threads': threads,
+        'errors': errors[0],
+        'seconds': elapsed,
+        'calls_per_second': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(0.5),
+        'p90_ms': percentile(0.9),
+        'p99_ms': percentile(0.99),
+        'max_ms': latencies[-1] * 1000,
+    }
+
+
+def latency(args):
+    # type: (argparse.Namespace) -> dict
+    """Sessions one after the other, one thread."""
+
+    server = StandInServer(latency=args.latency).start()
+    client = connect([server])
+    payload = session_stop(10)
+
+    try:
+        result = measure('latency', args.requests,
+                         lambda: run_session(client, payload))
+    finally:
+        client.close()
+        server.stop()
+
+    result['server'] = server.stats()
+    return result
+
+
+def throughput(args):
+    # type: (argparse.Namespace) -> dict
+    """Sessions from `--threads` threads sharing one client."""
+
+    server = StandInServer(latency=args.latency).start()
+    client = connect([server], pool_size=args.threads)
+    payload = session_stop(10)
+
+    try:
+        result = measure('throughput', args.requests,
+                         lambda: run_session(client, payload), args.threads)
+    finally:
+        client.close()
+        server.stop()
+
+    result['server'] = server.stats()
+    result['pool'] = client.pool_stats()
+    return result
+
+
+def large_payload(args):
+    # type: (argparse.Namespace) -> dict
+    """Sessions with 10000 input features."""
+
+    server = StandInServer(latency=args.latency).start()
+    client = connect([server])
+    payload = session_stop(10000)
+
+    try:
+        result = measure('large_payload', max(args.requests // 10, 1),
+                         lambda: run_session(client, payload))
+    finally:
+        client.close()
+        server.stop()
+
+    result['server'] = server.stats()
+    return result
+
+
+def transporter(args):
+    # type: (argparse.Namespace) -> dict
+    """Raw Transporter writes, without the session layer."""
+
+    server = StandInServer(latency=args.latency).start()
+    client = connect([server])
+    data = {'type': 'session', 'query_id': 'benchmark'}
+
+    try:
+        result = measure('transporter', args.requests, lambda: client._transporter.write(  # noqa: E501
+            Verb.PUT, 'applications/benchmark/model/session_start',
+            dict(data), None))
+    finally:
+        client.close()
+        server.stop()
+
+    result['server'] = server.stats()
+    return result
+
+
+def failover(args):
+    # type: (argparse.Namespace) -> dict
+    """The preferred host answers 503 to half the requests."""
+
+    flaky = StandInServer(latency=args.latency, error_rate=0.5).start()
+    healthy = StandInServer(latency=args.latency).start()
+    client = connect([flaky, healthy])
+    payload = session_stop(10)
+
+    try:
+        result = measure('failover', args.requests,
+                         lambda: run_session(client, payload))
+    finally:
+        client.close()
+        flaky.stop()
+        healthy.stop()
+
+    result['servers'] = [flaky.stats(), healthy.stats()]
+    return result
+
+
+def timeouts(args):
+    # type: (argparse.Namespace) -> dict
+    """5% of the requests to the preferred host hang past the timeout."""
+
+    hanging = StandInServer(latency=args.latency, timeout_rate=0.05,
+                            hang=1.0).start()
+    healthy = StandInServer(latency=args.latency).start()
+    client = connect([hanging, healthy], write_timeout=0.2)
+    payload = session_stop(10)
+
+    try:
+        result = measure('timeouts', max(args.requests // 5, 1),
+                         lambda: run_session(client, payload))
+    finally:
+        client.close()
+        hanging.stop()
+        healthy.stop()
+
+    result['servers'] = [hanging.stats(), healthy.stats()]
+    return result
+
+
+SCENARIOS = {
+    'latency': latency,
+    'throughput': throughput,
+    'large_payload': large_payload,
+    'transporter': transporter,
+    'failover': failover,
+    'timeouts': timeouts,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=8)
+    # In seconds, added by the server to every answer
+    parser.add_argument('--latency', type=float, default=0.001)
+    parser.add_argument('--scenario', action='append',
+                        choices=sorted(SCENARIOS))
+    parser.add_argument('--output')
+    args = parser.parse_args(argv)
+
+    results = {
+        'python': sys.version.split()[0],
+        'started_at': time.time(),
+        'scenarios': [SCENARIOS[name](args)
+                      for name in args.scenario or sorted(SCENARIOS)],
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
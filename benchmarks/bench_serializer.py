@@ -0,0 +1,68 @@
+"""
+Micro-benchmark of the DataSerializer backends on session_stop payloads.
+
+    python -m benchmarks.bench_serializer [--number 2000]
+"""
+import argparse
+import datetime
+import decimal
+import json
+import random
+import sys
+import timeit
+import uuid
+
+from monitoring.http.serializer import DataSerializer
+
+
+def session_stop(features):
+    # type: (int) -> dict
+
+    rng = random.Random(features)
+
+    return {
+        'type': 'session',
+        'query_id': str(uuid.UUID(int=rng.getrandbits(128))),
+        'data_input': dict(
+            ('feature_{}'.format(i), rng.random()) for i in range(features)
+        ),
+        'data_output': {
+            'score': decimal.Decimal('0.8731'),
+            'label': 'positive',
+        },
+        'metadata': {
+            'user_id': rng.randint(0, 10 ** 9),
+            'country': rng.choice(['fr', 'de', 'us']),
+            'created_at': datetime.datetime(2019, 6, 1, 12, 30),
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--number', type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    results = []
+    for features in (10, 100, 1000):
+        payload = session_stop(features)
+
+        for backend in sorted(DataSerializer._backends):
+            DataSerializer.use(backend)
+            seconds = min(timeit.repeat(
+                lambda: DataSerializer.serialize_bytes(payload),
+                number=args.number, repeat=3))
+
+            results.append({
+                'backend': backend,
+                'features': features,
+                'bytes': len(DataSerializer.serialize_bytes(payload)),
+                'us_per_payload': seconds / args.number * 1e6,
+            })
+
+    json.dump(results, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+"""
+Local stand-in for the monitoring API, for benchmarks: answers the
+applications and session endpoints with keep-alive HTTP/1.1, after a
+configurable latency, with a share of errors and hung requests. Listings
+are paginated with `page` and `hitsPerPage`.
+
+    python -m benchmarks.server [--port 8080] [--latency 0.005]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs
+except ImportError:  # pragma: no cover
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs
+
+from monitoring.http.hosts import Host
+
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    """
+    `latency` seconds are added to every answer. A share `error_rate` of
+    the requests get an `error_status` answer, and a share `timeout_rate`
+    hang for `hang` seconds, past the client timeouts. `listing_size`
+    applications, and as many models per application, are listed.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, error_rate=0.0, error_status=503,
+                 timeout_rate=0.0, hang=10.0, listing_size=0):
+        # type: (int, float, float, int, float, float, int) -> None
+
+        HTTPServer.__init__(self, ('127.0.0.1', port), _Handler)
+
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.timeout_rate = timeout_rate
+        self.hang = hang
+        self.listing_size = listing_size
+
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.received_bytes = 0
+
+        self._random = random.Random(port)
+        self._lock = threading.Lock()
+        self._thread = None  # type: threading.Thread
+
+    @property
+    def port(self):
+        # type: () -> int
+
+        return self.server_address[1]
+
+    def host(self, priority=0):
+        # type: (int) -> Host
+
+        return Host('127.0.0.1:{}'.format(self.port), priority, scheme='http')
+
+    def start(self):
+        # type: () -> StandInServer
+
+        self._thread = threading.Thread(target=self.serve_forever,
+                                        name='stand-in-server')
+        self._thread.daemon = True
+        self._thread.start()
+
+        return self
+
+    def stop(self):
+        # type: () -> None
+
+        self.shutdown()
+        self.server_close()
+
+    def stats(self):
+        # type: () -> dict
+
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'received_bytes': self.received_bytes,
+        }
+
+    def draw(self, size):
+        # type: (int) -> str
+        """
+        Fate of one request: 'ok', 'error' or 'timeout'.
+        """
+
+        with self._lock:
+            self.requests += 1
+            self.received_bytes += size
+
+            roll = self._random.random()
+            if roll < self.timeout_rate:
+                self.timeouts += 1
+                return 'timeout'
+
+            if roll < self.timeout_rate + self.error_rate:
+                self.errors += 1
+                return 'error'
+
+        return 'ok'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Head and body in one segment, Nagle would hold the body back for
+    # the client's delayed ACK otherwise.
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._answer()
+
+    do_PUT = do_POST = do_DELETE = do_GET
+
+    def log_message(self, format, *args):
+        pass
+
+    def _answer(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            length = self._read_chunks()
+        else:
+            length = int(self.headers.get('Content-Length') or 0)
+            if length:
+                self.rfile.read(length)
+
+        server = self.server
+        fate = server.draw(length)
+
+        if fate == 'timeout':
+            time.sleep(server.hang)
+        elif server.latency:
+            time.sleep(server.latency)
+
+        if fate == 'error':
+            self._send(server.error_status, {'message': 'Stand-in error'})
+        else:
+            self._send(200, self._content())
+
+    def _read_chunks(self):
+        # type: () -> int
+
+        length = 0
+        while True:
+            size = int(self.rfile.readline().split(b';')[0], 16)
+            if size == 0:
+                # Trailers, up to the blank line.
+                while self.rfile.readline() not in (b'\r\n', b'\n', b''):
+                    pass
+
+                return length
+
+            self.rfile.read(size + 2)
+            length += size
+
+    def _content(self):
+        # type: () -> dict
+
+        path, _, query = self.path.partition('?')
+        path = path.strip('/')
+        parts = [part for part in path.split('/') if part]
+
+        # <app_id>/applications/<name>/<model>/<action>
+        if len(parts) >= 5 and parts[1] == 'applications':
+            return {'query_id': None, 'action': parts[4], 'status': 'ok'}
+
+        if len(parts) == 4 and parts[1] == 'applications' \
+                and parts[3] == 'models':
+            return self._page('models', 'model_name', query)
+
+        if len(parts) >= 3 and parts[1] == 'applications':
+            return {'application_name': parts[2], 'models': []}
+
+        if len(parts) == 2 and parts[1] == 'applications':
+            return self._page('applications', 'application_name', query)
+
+        return {'status': 'ok', 'path': path}
+
+    def _page(self, key, name, query):
+        # type: (str, str, str) -> dict
+
+        params = parse_qs(query)
+        page = int(params.get('page', ['0'])[0])
+        size = int(params.get('hitsPerPage', ['100'])[0])
+        total = self.server.listing_size
+
+        start = page * size
+        return {
+            key: [{name: '{}-{}'.format(name, i)}
+                  for i in range(start, min(start + size, total))],
+            'page': page,
+            'nbPages': (total + size - 1) // size,
+        }
+
+    def _send(self, status, content):
+        # type: (int, dict) -> None
+
+        body = json.dumps(content).encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--timeout-rate', type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    server = StandInServer(args.port, args.latency, args.error_rate,
+                           timeout_rate=args.timeout_rate)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
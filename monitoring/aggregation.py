@@ -0,0 +1,268 @@
+import atexit
+import threading
+import time
+
+from typing import Any, Dict, Optional, Tuple
+
+from monitoring import forking
+from monitoring.helpers import endpoint
+from monitoring.http.verb import Verb
+from monitoring.http.arrays import numpy_module, pandas_module
+from monitoring.sketches import FeatureSummary, schema_types
+
+
+class FeatureAggregator(object):
+    """
+    Streaming summaries of the data_input, data_output and metadata of one
+    model. Feature types come from the application schema when it is
+    known, and are inferred from the first value otherwise.
+    """
+
+    SECTIONS = ('data_input', 'data_output', 'metadata')
+
+    def __init__(self, schema=None, accuracy=0.01, capacity=64):
+        # type: (Optional[Dict[str, Any]], float, int) -> None
+
+        schema = schema or {}
+
+        self._accuracy = accuracy
+        self._capacity = capacity
+        self._types = dict((section, schema_types(schema.get(section)))
+                           for section in self.SECTIONS)
+        self._summaries = dict((section, {}) for section in self.SECTIONS)  # type: Dict[str, Dict[str, FeatureSummary]]  # noqa: E501
+
+        self.lock = threading.Lock()
+        self.flushed = False
+        self.sessions = 0
+        self.started = time.time()
+
+    def add(self, section, data):
+        # type: (str, Any) -> None
+
+        if data is None:
+            return
+
+        numpy = numpy_module()
+        pandas = pandas_module()
+        if pandas is not None and isinstance(data, pandas.DataFrame):
+            for column in data.columns:
+                self._summary(section, column, data[column].to_numpy()) \
+                    .add_many(data[column].to_numpy())
+        elif pandas is not None and isinstance(data, pandas.Series):
+            self.add(section, data.to_dict())
+        elif numpy is not None and isinstance(data, numpy.ndarray):
+            self._add_array(section, data)
+        elif isinstance(data, dict):
+            for name, value in data.items():
+                summary = self._summary(section, name, value)
+                if isinstance(value, (list, tuple)) or (
+                        numpy is not None and
+                        isinstance(value, numpy.ndarray)):
+                    summary.add_many(value)
+                else:
+                    summary.add(value)
+        else:
+            self._summary(section, section, data).add(data)
+
+    def snapshot(self):
+        # type: () -> Dict[str, Any]
+
+        snapshot = {
+            'sessions': self.sessions,
+            'interval_start': self.started,
+            'interval_end': time.time(),
+        }  # type: Dict[str, Any]
+
+        for section in self.SECTIONS:
+            snapshot[section] = dict(
+                (name, summary.snapshot())
+                for name, summary in self._summaries[section].items()
+            )
+
+        return snapshot
+
+    def _add_array(self, section, data):
+        # type: (str, Any) -> None
+
+        names = list(self._types[section]) or None
+
+        # A 0-d array is one value, a 1-d array one row.
+        if data.ndim < 2:
+            data = data.reshape(1, -1)
+
+        for i in range(data.shape[1]):
+            name = names[i] if names and i < len(names) else str(i)
+            self._summary(section, name, data[:, i]).add_many(data[:, i])
+
+    def _summary(self, section, name, sample):
+        # type: (str, Any, Any) -> FeatureSummary
+
+        name = str(name)
+        summary = self._summaries[section].get(name)
+        if summary is None:
+            numeric = self._types[section].get(name)
+            if numeric is None:
+                numeric = _looks_numeric(sample)
+
+            summary = FeatureSummary(numeric, self._accuracy, self._capacity)
+            self._summaries[section][name] = summary
+
+        return summary
+
+
+class Aggregator(object):
+    """
+    Aggregation mode: sessions update per-model feature summaries in
+    memory, and a background thread sends their snapshots every
+    `aggregation_interval` seconds, then starts a new interval.
+    """
+
+    def __init__(self, transporter, config, schemas):
+        # type: (Transporter, MonitoringConfig, Dict[str, Dict[str, Any]]) -> None  # noqa: E501
+
+        self._transporter = transporter
+        self._interval = float(config.aggregation_interval)
+        self._accuracy = config.sketch_accuracy
+        self._capacity = config.heavy_hitters
+        self._schemas = schemas
+
+        self._models = {}  # type: Dict[Tuple[str, str], FeatureAggregator]
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None  # type: Optional[threading.Thread]
+
+        self.sent = 0
+        self.failed = 0
+        self.last_error = None  # type: Optional[Exception]
+
+        forking.register(self)
+
+    def add(self, application_name, model_name, data_input, data_output,
+            metadata, sessions=1):
+        # type: (str, str, Any, Any, Any, int) -> None
+        """
+        Add the data of `sessions` sessions, several for a batch given
+        column-wise.
+        """
+
+        if self._thread is None:
+            self._start()
+
+        key = (application_name, model_name)
+
+        while True:
+            with self._lock:
+                aggregator = self._models.get(key)
+                if aggregator is None:
+                    aggregator = FeatureAggregator(
+                        self._schemas.get(application_name), self._accuracy,
+                        self._capacity)
+                    self._models[key] = aggregator
+
+            with aggregator.lock:
+                if aggregator.flushed:
+                    # Its interval was sent meanwhile, add to the next one.
+                    continue
+
+                aggregator.sessions += sessions
+                aggregator.add('data_input', data_input)
+                aggregator.add('data_output', data_output)
+                aggregator.add('metadata', metadata)
+
+                return
+
+    def flush(self):
+        # type: () -> None
+        """
+        Send the snapshots of the current interval and start a new one.
+        """
+
+        with self._lock:
+            models, self._models = self._models, {}
+
+        for (application_name, model_name), aggregator in models.items():
+            # Waits for the sessions still adding to this interval.
+            with aggregator.lock:
+                aggregator.flushed = True
+                snapshot = aggregator.snapshot()
+
+            snapshot['type'] = 'sketches'
+
+            try:
+                self._transporter.write(
+                    Verb.PUT,
+                    endpoint('applications/{}/{}/sketches', application_name,
+                             model_name),
+                    snapshot,
+                    None
+                )
+            except Exception as e:
+                self.failed += 1
+                self.last_error = e
+            else:
+                self.sent += 1
+
+    def close(self):
+        # type: () -> None
+
+        self._stopped.set()
+
+        unregister = getattr(atexit, 'unregister', None)
+        if unregister is not None:
+            unregister(self.close)
+
+        if self._thread is not None:
+            self._thread.join()
+
+        self.flush()
+
+    def _after_fork_child(self):
+        # type: () -> None
+
+        # The parent reports the sessions summarized so far.
+        self._models = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        self.sent = 0
+        self.failed = 0
+        self.last_error = None
+
+    def _start(self):
+        # type: () -> None
+
+        with self._lock:
+            if self._thread is not None:
+                return
+
+            thread = threading.Thread(target=self._run,
+                                      name='monitoring-aggregator')
+            thread.daemon = True
+            thread.start()
+
+            self._thread = thread
+
+        atexit.register(self.close)
+
+    def _run(self):
+        # type: () -> None
+
+        while not self._stopped.wait(self._interval):
+            self.flush()
+
+
+def _looks_numeric(sample):
+    # type: (Any) -> bool
+
+    numpy = numpy_module()
+    if numpy is not None and isinstance(sample, numpy.ndarray):
+        return sample.dtype.kind in 'iuf'
+
+    if isinstance(sample, (list, tuple)):
+        sample = next((value for value in sample if value is not None), None)
+
+    if numpy is not None and isinstance(sample, numpy.generic):
+        return isinstance(sample, numpy.number)
+
+    return isinstance(sample, (int, float)) and not isinstance(sample, bool)
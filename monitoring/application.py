@@ -34,7 +34,9 @@ from .helpers import deprecated
 from .helpers import urlify
 from .helpers import safe
 from .helpers import endpoint
+from .pagination import page_options, paginate
 
+from monitoring.http.cache import ReadCache
 from monitoring.http.verb import Verb
 
 
@@ -77,34 +79,46 @@ class Application(object):
         # type: (Transporter, MonitoringConfig, str, str, str, str, str , list[dict], dict, list[dict], dict, Optional[RequestOptions]) -> str
         
         application = Application(transporter, config, application_name)
-        application.label = application_label
-        application.description = description
-        application.prediction_type = prediction_type
-        application.data_input = data_input
-        application.data_output = data_output
-        application.metadata = metadata
-        application.params = params
-        
-        raw_response = application._transporter.write(
-            Verb.PUT,
-            endpoint('applications/{}/operation', application._name),
-            {
-                'type':'application',
-                'name':application._name,
-                'label':application_label,
-                'description':application.description,
-                'prediction_type': prediction_type,
-                'data_input':data_input,
-                'data_output':data_output,
-                'metadata':metadata,
-                'params':params
-            },
-            request_options
-        )
+        application._define(application_label, description, prediction_type, data_input, data_output, metadata, params)
+        application._save(request_options)
 
         return application
 
         
+    def _define(self, label, description, prediction_type, data_input, data_output, metadata, params):
+        # type: (str, str, str, list[dict], list[dict], list[dict], dict) -> None
+
+        self.label = label
+        self.description = description
+        self.prediction_type = prediction_type
+        self.data_input = data_input
+        self.data_output = data_output
+        self.metadata = metadata
+        self.params = params
+
+    def _save(self, request_options=None):
+        # type: (Optional[RequestOptions]) -> dict
+
+        try:
+            return self._transporter.write(
+                Verb.PUT,
+                endpoint('applications/{}/operation', self._name),
+                {
+                    'type':'application',
+                    'name':self._name,
+                    'label':self.label,
+                    'description':self.description,
+                    'prediction_type': self.prediction_type,
+                    'data_input':self.data_input,
+                    'data_output':self.data_output,
+                    'metadata':self.metadata,
+                    'params':self.params
+                },
+                request_options
+            )
+        finally:
+            self._transporter.invalidate(self._name, ReadCache.APPLICATIONS)
+
     def add_model(self, model_name, model_label, model_description, model_version, params, request_options=None):
         """
         Add an model in this application.
@@ -116,20 +130,23 @@ class Application(object):
         # type: (str, str, str, str, dict, Optional[RequestOptions]) -> dict
         
         model = Model(self._transporter, self._config, self._name, model_name, model_label, model_description, model_version, params)        
-        raw_response = model._transporter.write(
-            Verb.PUT,
-            endpoint('applications/{}/{}/operation', self._name, model_name),
-            {
-                'type':'model',
-                'application_owner':self._name,
-                'name':model_name,
-                'label':model_label,
-                'description':model_description,
-                'version': model_version,
-                'params':params
-            },
-            request_options
-        )
+        try:
+            raw_response = model._transporter.write(
+                Verb.PUT,
+                endpoint('applications/{}/{}/operation', self._name, model_name),
+                {
+                    'type':'model',
+                    'application_owner':self._name,
+                    'name':model_name,
+                    'label':model_label,
+                    'description':model_description,
+                    'version': model_version,
+                    'params':params
+                },
+                request_options
+            )
+        finally:
+            self._transporter.invalidate(self._name)
         
         return raw_response
 
@@ -145,7 +162,8 @@ class Application(object):
             Verb.GET,
             endpoint('applications/{}/{}/operation', self._name, model_name),
             model_name,
-            request_options
+            request_options,
+            (self._name,)
         )
         
         return raw_response
@@ -161,12 +179,15 @@ class Application(object):
         if not model_name:
             raise MonitoringException('model_name cannot be empty')
 
-        raw_response = self._transporter.write(
-            Verb.DELETE,
-            endpoint('applications/{}/{}/delete', self._name, model_name),
-            model_name,
-            request_options
-        )
+        try:
+            raw_response = self._transporter.write(
+                Verb.DELETE,
+                endpoint('applications/{}/{}/delete', self._name, model_name),
+                model_name,
+                request_options
+            )
+        finally:
+            self._transporter.invalidate(self._name)
         
         return raw_response
 
@@ -183,8 +204,28 @@ class Application(object):
             Verb.GET,
             endpoint('applications/{}/models', self._name),
             filters,
-            request_options
+            request_options,
+            (self._name,)
         )
         
         return raw_response
 
+    def iter_models(self, filters=None, page_size=100, prefetch=True, request_options=None):
+        """
+        Iterate over the models of the application, fetched page by page.
+        @param filters optional filters list
+        @param page_size models per page
+        @param prefetch read the next page while the current one is consumed
+        """
+        # type: (Optional[str], int, bool, Optional[RequestOptions]) -> Iterator[dict]
+
+        def fetch(params):
+            return self._transporter.read(
+                Verb.GET,
+                endpoint('applications/{}/models', self._name),
+                filters,
+                page_options(request_options, params),
+                (self._name,)
+            )
+
+        return paginate(fetch, 'models', page_size, prefetch)
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright (c) 2019 Valind&GO
+http://www.validandgo.com/
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+import asyncio
+
+from .application import Application
+from .client import Client
+from .session import Session
+from .helpers import MonitoringException
+from .helpers import endpoint
+from .pagination import next_page, page_items, page_key, page_options
+from .configs import MonitoringConfig
+
+from monitoring.http.async_requester import AsyncRequester
+from monitoring.http.async_transporter import AsyncTransporter
+from monitoring.http.verb import Verb
+
+
+class AsyncClient(Client):
+    """
+    asyncio flavour of the Client (Python 3 only).
+    Every method that talks to the API returns an awaitable:
+    >>> client = AsyncClient.connect('VALIDANDGO_API_ID', 'VALIDANDGO_API_KEY')
+    >>> await client.get_application('my_application_name')
+    """
+
+    def __init__(self, transporter, monitoring_config):
+        # type: (AsyncTransporter, MonitoringConfig) -> None
+
+        if monitoring_config.buffered or monitoring_config.aggregate:
+            raise MonitoringException(
+                'Buffered and aggregation modes are not supported by '
+                'AsyncClient')
+
+        if monitoring_config.spool_directory is not None:
+            raise MonitoringException(
+                'The disk spool is not supported by AsyncClient')
+
+        if monitoring_config.read_cache_size:
+            raise MonitoringException(
+                'The read cache is not supported by AsyncClient')
+
+        if monitoring_config.forwarder_socket is not None:
+            raise MonitoringException(
+                'The forwarder is not supported by AsyncClient')
+
+        super(AsyncClient, self).__init__(transporter, monitoring_config)
+
+    def submit(self, function, *args, **kwargs):
+        # type: (Callable[..., Any], *Any, **Any) -> None
+
+        raise MonitoringException(
+            'AsyncClient calls are awaitable, schedule them as asyncio tasks')
+
+    @staticmethod
+    def connect(app_id=None, api_key=None):
+        # type: (Optional[str], Optional[str]) -> AsyncClient
+
+        config = MonitoringConfig(app_id, api_key)
+
+        return AsyncClient.connect_with_config(config)
+
+    @staticmethod
+    def connect_with_config(config):
+        # type: (MonitoringConfig) -> AsyncClient
+
+        requester = AsyncRequester(config.pool_size, config.pool_idle_timeout,
+                                   config.metrics)
+        transporter = AsyncTransporter(requester, config)
+
+        return AsyncClient(transporter, config)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    async def create_application(self, application_name, application_label, description, prediction_type, data_input, data_output, metadata, params):
+        """
+        Create an application object, see `Client.create_application`.
+        """
+        # type: (str, str, str, str, list, dict, list, dict) -> Application
+
+        self._register_schema(application_name, data_input, data_output, metadata)
+
+        application = AsyncApplication(self._transporter, self._config, application_name)
+        application._define(application_label, description, prediction_type, data_input, data_output, metadata, params)
+        await application._save()
+
+        return application
+
+    def init_application(self, application_name):
+        # type: (str) -> AsyncApplication
+
+        return AsyncApplication(self._transporter, self._config, application_name)
+
+    async def iter_applications(self, filters=None, page_size=100, prefetch=True, request_options=None):
+        """
+        Asynchronous iterator over the applications, see
+        `Client.iter_applications`:
+        >>> async for application in client.iter_applications():
+        """
+        # type: (Optional[list[dict]], int, bool, Optional[RequestOptions]) -> AsyncIterator[dict]
+
+        def fetch(params):
+            return self._transporter.read(
+                Verb.GET,
+                endpoint('/applications',),
+                filters,
+                page_options(request_options, params),
+            )
+
+        async for item in _paginate(fetch, 'applications', page_size, prefetch):
+            yield item
+
+    def monitoring_session(self, application_name, model_name, sampler=None):
+        """
+        Create a new monitoring session whose `start()` and `stop()` are
+        coroutines.
+        """
+        # type: (str, str, Optional[Sampler]) -> AsyncSession
+
+        sampler = self._config.sampler if sampler is None else sampler
+
+        return AsyncSession(self._transporter, self._config, application_name, model_name, None, sampler, None, self._encoder(application_name))
+
+
+class AsyncApplication(Application):
+    """
+    Application of the AsyncClient, whose methods that talk to the API
+    return awaitables.
+    """
+
+    async def iter_models(self, filters=None, page_size=100, prefetch=True, request_options=None):
+        """
+        Asynchronous iterator over the models of the application, see
+        `Application.iter_models`:
+        >>> async for model in application.iter_models():
+        """
+        # type: (Optional[str], int, bool, Optional[RequestOptions]) -> AsyncIterator[dict]
+
+        def fetch(params):
+            return self._transporter.read(
+                Verb.GET,
+                endpoint('applications/{}/models', self._name),
+                filters,
+                page_options(request_options, params),
+            )
+
+        async for item in _paginate(fetch, 'models', page_size, prefetch):
+            yield item
+
+
+async def _paginate(fetch, items_key, page_size, prefetch):
+    """
+    Asynchronous `monitoring.pagination.paginate`, `fetch(params)` returns
+    an awaitable. The next page is read as a task.
+    """
+    params = {'page': 0, 'hitsPerPage': page_size}
+    pending = asyncio.ensure_future(fetch(params))
+    previous = None
+
+    try:
+        while pending is not None:
+            response = await pending
+            pending = None
+
+            items = page_items(response, items_key)
+            key = page_key(items)
+            if previous is not None and key == previous:
+                return
+            previous = key
+
+            params = next_page(response, params, len(items), page_size)
+
+            if params is not None and prefetch:
+                pending = asyncio.ensure_future(fetch(params))
+
+            for item in items:
+                yield item
+
+            items = response = None
+
+            if params is not None and pending is None:
+                pending = asyncio.ensure_future(fetch(params))
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+
+class AsyncSession(Session):
+    """
+    Monitoring session for the AsyncClient.
+    >>> await session.start()
+    >>> await session.stop()
+    """
+
+    async def start(self, request_options=None, sampling_key=None):
+        """
+        Start a new session to record logs from model.
+        """
+        raw_response = super(AsyncSession, self).start(request_options,
+                                                       sampling_key)
+        if raw_response is not None:
+            raw_response = await raw_response
+
+        self.id = raw_response
+
+        return raw_response
+
+    async def stop(self, request_options=None):
+        """
+        Stop session
+        """
+        raw_response = super(AsyncSession, self).stop(request_options)
+        if raw_response is not None:
+            raw_response = await raw_response
+
+        return raw_response
+
+    async def log_batch(self, inputs, outputs=None, metadata=None, request_options=None):
+        """
+        Log N predictions at once, see `Session.log_batch`. The chunks are
+        sent concurrently.
+        """
+        query_ids, records = self._batch_records(inputs, outputs, metadata)
+
+        await asyncio.gather(*[
+            self._send('session_batch', record, request_options)
+            for record in records
+        ])
+
+        return query_ids
@@ -0,0 +1,234 @@
+import atexit
+import threading
+import time
+
+from typing import Any, Dict, List, Optional
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue  # type: ignore  # pragma: no cover
+
+from monitoring import forking
+from monitoring.helpers import endpoint
+from monitoring.http.serializer import DataSerializer
+from monitoring.http.verb import Verb
+
+_FLUSH = object()
+_STOP = object()
+
+
+class Batcher(object):
+    """
+    Buffers session records in memory and sends them in bulk from a
+    background thread. A batch is flushed once it holds `batch_size`
+    records, once it reaches about `batch_max_bytes` serialized bytes, or
+    once its oldest record has waited `batch_max_latency` seconds. The size
+    is estimated from the first record of the batch, the others are only
+    serialized when sent.
+    """
+
+    PATH = 'sessions/batch'
+
+    def __init__(self, transporter, config):
+        # type: (Transporter, MonitoringConfig) -> None
+
+        self._transporter = transporter
+        self._batch_size = max(int(config.batch_size), 1)
+        self._max_latency = float(config.batch_max_latency)
+        self._max_bytes = int(config.batch_max_bytes)
+        self._queue = queue.Queue(config.batch_queue_size)
+
+        self._lock = threading.Lock()
+        # Notified when the last push in progress is done.
+        self._pushed = threading.Condition(self._lock)
+        self._pushing = 0
+        self._thread = None  # type: Optional[threading.Thread]
+        self._closed = False
+
+        self.sent = 0
+        self.failed = 0
+        self.last_error = None  # type: Optional[Exception]
+
+        forking.register(self)
+
+    def push(self, record):
+        # type: (Dict[str, Any]) -> None
+
+        with self._lock:
+            if self._closed:
+                # Nothing would read the queue anymore.
+                raise RuntimeError('Batcher is closed')
+
+            # `close` waits for the record before stopping the thread.
+            self._pushing += 1
+
+        try:
+            if self._thread is None:
+                self._start()
+
+            # Blocks only when the queue is full, as back pressure.
+            self._queue.put(record)
+        finally:
+            with self._lock:
+                self._pushing -= 1
+                if not self._pushing:
+                    self._pushed.notify_all()
+
+    def pending(self):
+        # type: () -> int
+        """
+        Records queued and not picked up by the background thread yet.
+        """
+
+        return self._queue.qsize()
+
+    def flush(self, timeout=None):
+        # type: (Optional[float]) -> bool
+        """
+        Send every record queued so far. Returns False on timeout, and at
+        once after `close`, which drained the queue.
+        """
+
+        thread = self._thread
+        if thread is None or self._closed or not thread.is_alive():
+            return True
+
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+
+        return done.wait(timeout)
+
+    def close(self, timeout=None):
+        # type: (Optional[float]) -> None
+        """
+        Drain the queue and stop the background thread.
+        """
+
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+
+            while self._pushing:
+                self._pushed.wait()
+            thread = self._thread
+
+        unregister = getattr(atexit, 'unregister', None)
+        if unregister is not None:
+            unregister(self.close)
+
+        if thread is not None:
+            self._queue.put((_STOP, None))
+            thread.join(timeout)
+
+    def _after_fork_child(self):
+        # type: () -> None
+
+        # Records queued in the parent are sent by the parent; the thread
+        # is started again on the first push.
+        self._queue = queue.Queue(self._queue.maxsize)
+        self._lock = threading.Lock()
+        self._pushed = threading.Condition(self._lock)
+        self._pushing = 0
+        self._thread = None
+
+        self.sent = 0
+        self.failed = 0
+        self.last_error = None
+
+    def _start(self):
+        # type: () -> None
+
+        with self._lock:
+            if self._thread is not None:
+                return
+
+            thread = threading.Thread(target=self._run,
+                                      name='monitoring-batcher')
+            thread.daemon = True
+            thread.start()
+
+            self._thread = thread
+
+        atexit.register(self.close)
+
+    def _run(self):
+        # type: () -> None
+
+        batch = []  # type: List[Dict[str, Any]]
+        size = 0
+        # Serialized size of the first record of the batch
+        item_size = 0
+        deadline = None  # type: Optional[float]
+
+        while True:
+            timeout = None
+            if deadline is not None:
+                timeout = max(deadline - time.time(), 0.0)
+
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._send(batch)
+                batch, size, deadline = [], 0, None
+                continue
+
+            if isinstance(item, tuple) and item[0] in (_FLUSH, _STOP):
+                self._send(batch)
+                batch, size, deadline = [], 0, None
+
+                if item[0] is _STOP:
+                    return
+
+                item[1].set()
+                continue
+
+            if not batch:
+                try:
+                    item_size = len(DataSerializer.serialize_bytes(item))
+                except Exception as e:
+                    # Dropped alone, the thread keeps serving the queue.
+                    self.failed += 1
+                    self.last_error = e
+                    continue
+
+                deadline = time.time() + self._max_latency
+
+            batch.append(item)
+            size += item_size
+
+            if len(batch) >= self._batch_size or size >= self._max_bytes:
+                self._send(batch)
+                batch, size, deadline = [], 0, None
+
+    def _send(self, batch):
+        # type: (List[Dict[str, Any]]) -> None
+
+        if not batch:
+            return
+
+        try:
+            self._transporter.write(
+                Verb.PUT,
+                endpoint(self.PATH),
+                {
+                    'type': 'session_batch',
+                    'records': batch
+                },
+                None
+            )
+        except (TypeError, ValueError, OverflowError) as e:
+            if len(batch) == 1:
+                self.failed += 1
+                self.last_error = e
+                return
+
+            # A record could not be serialized, it is dropped alone.
+            for record in batch:
+                self._send([record])
+        except Exception as e:
+            self.failed += len(batch)
+            self.last_error = e
+        else:
+            self.sent += len(batch)
@@ -24,8 +24,10 @@ import hashlib
 import base64
 import random
 import sys
+import threading
 import time
 import copy
+from concurrent import futures
 from platform import python_version
 
 try:
@@ -33,16 +35,24 @@ try:
 except ImportError:
     from urllib.parse import urlencode
 
+from . import forking
 from .version import VERSION
 from .application import Application
 from .session import Session
+from .aggregation import Aggregator
+from .batching import Batcher
+from .forwarder import ForwarderChannel
+from .spool import Spool, SpoolReplayer
 from .transport import Transport
+from .pagination import page_options, paginate
 from .helpers import deprecated
 from .helpers import safe
 from .helpers import urlify
 from .helpers import endpoint
 from .configs import MonitoringConfig
+from .schema import EncoderCache, RecordEncoder
 
+from monitoring.http.cache import ReadCache
 from monitoring.http.transporter import Transporter
 from monitoring.http.requester import Requester
 from monitoring.http.verb import Verb
@@ -54,6 +64,8 @@ class Client(object):
     Entry point in the Python Client API.
     You should instantiate a Client object with your ApplicationID, ApiKey to
     start using Monitoring Service.
+    A Client is thread-safe: share one between the threads of a process,
+    its connection pools and host health are common to all of them.
     """
     
     
@@ -81,7 +93,43 @@ class Client(object):
 
         self._transporter = transporter
         self._config = monitoring_config
+        self._batcher = None
+        if monitoring_config.forwarder_socket is not None:
+            self._batcher = ForwarderChannel(transporter, monitoring_config)
+        elif monitoring_config.buffered:
+            self._batcher = Batcher(transporter, monitoring_config)
 
+        # Field definitions of the applications created by this client.
+        self._schemas = {}
+        self._encoders = (EncoderCache(self._schemas)
+                          if monitoring_config.positional_records else None)
+        self._aggregator = (Aggregator(transporter, monitoring_config, self._schemas)
+                            if monitoring_config.aggregate else None)
+
+        self._spool_replayer = None
+        if monitoring_config.spool_directory is not None:
+            transporter.spool = Spool.create(monitoring_config)
+            self._spool_replayer = SpoolReplayer(
+                transporter.spool, transporter, monitoring_config.batch_size,
+                monitoring_config.spool_replay_interval)
+
+        self._submit_executor = None
+        self._submit_lock = threading.Lock()
+        self._submit_slots = threading.BoundedSemaphore(
+            monitoring_config.submit_workers +
+            monitoring_config.submit_queue_size)
+        self._closed = False
+
+        forking.register(self)
+
+        metrics = monitoring_config.metrics
+        if metrics is not None:
+            # Sampled when a snapshot is taken.
+            if isinstance(self._batcher, Batcher):
+                metrics.queue_depth.set_function(self._batcher.pending,
+                                                 ('batch',))
+            if transporter.spool is not None:
+                metrics.spool_bytes.set_function(transporter.spool.size)
 
 
     @staticmethod
@@ -97,12 +145,123 @@ class Client(object):
     def connect_with_config(config):
         # type: (MonitoringConfig) -> Client
 
-        requester = Requester()
+        requester = Requester(config.pool_size, config.pool_idle_timeout,
+                              config.metrics)
         transporter = Transporter(requester, config)
         client = Client(transporter, config)
 
         return client
         
+    def cache_stats(self):
+        """
+        Read cache counters (hits, misses, coalesced, evictions,
+        invalidations, size), None when the cache is disabled.
+        """
+        # type: () -> Optional[dict]
+
+        cache = self._transporter.read_cache
+
+        return None if cache is None else cache.stats()
+
+    def pool_stats(self):
+        """
+        Connection pool reuse counters (requests, hits, misses, pools).
+        """
+        # type: () -> dict
+
+        return self._transporter.pool_stats()
+
+    def submit(self, function, *args, **kwargs):
+        """
+        Run `function(*args, **kwargs)` on the worker pool of the client,
+        and return a `concurrent.futures.Future` of its result:
+        >>> future = client.submit(session.stop)
+        Blocks while `submit_queue_size` calls are already waiting for a
+        thread, and raises RuntimeError once the client is closed.
+        """
+        # type: (Callable[..., Any], *Any, **Any) -> futures.Future
+
+        self._submit_slots.acquire()
+
+        try:
+            future = self._submit_pool().submit(function, *args, **kwargs)
+        except BaseException:
+            self._submit_slots.release()
+            raise
+
+        future.add_done_callback(self._release_submit_slot)
+
+        return future
+
+    def _submit_pool(self):
+        # type: () -> futures.Executor
+
+        with self._submit_lock:
+            if self._closed:
+                raise RuntimeError('cannot submit calls after close')
+
+            if self._submit_executor is None:
+                self._submit_executor = futures.ThreadPoolExecutor(
+                    max_workers=self._config.submit_workers)
+
+            return self._submit_executor
+
+    def _release_submit_slot(self, future):
+        # type: (futures.Future) -> None
+
+        self._submit_slots.release()
+
+    def _after_fork_child(self):
+        # type: () -> None
+
+        # The worker threads only exist in the parent.
+        self._submit_executor = None
+        self._submit_lock = threading.Lock()
+        self._submit_slots = threading.BoundedSemaphore(
+            self._config.submit_workers + self._config.submit_queue_size)
+
+    def flush(self, timeout=None):
+        """
+        Send the session records buffered so far (buffered mode only).
+        Return False if the timeout expired before the buffer was drained.
+        @param timeout maximum time to wait, in seconds
+        """
+        # type: (Optional[float]) -> bool
+
+        if self._aggregator is not None:
+            self._aggregator.flush()
+
+        if self._batcher is None:
+            return True
+
+        return self._batcher.flush(timeout)
+
+    def close(self):
+        """
+        Wait for the submitted calls, drain the buffered session records,
+        then close the pooled connections held by this client.
+        """
+        # type: () -> None
+
+        with self._submit_lock:
+            self._closed = True
+            executor, self._submit_executor = self._submit_executor, None
+
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+        if self._aggregator is not None:
+            self._aggregator.close()
+
+        if self._batcher is not None:
+            self._batcher.close()
+
+        if self._spool_replayer is not None:
+            self._spool_replayer.stop()
+            self._transporter.spool.close()
+
+        self._transporter.close()
+
     def init_application(self, application_name): 
         # type: (str) -> Application
 
@@ -124,6 +283,8 @@ class Client(object):
         """
         # type: (Transporter, MonitoringConfig, str, str, str, str, list, dict, list, dict) -> Application
         
+        self._register_schema(application_name, data_input, data_output, metadata)
+
         return Application.create(self._transporter, self._config, application_name, application_label, description, prediction_type, data_input, data_output, metadata, params)
         
 
@@ -135,12 +296,16 @@ class Client(object):
         """
         # type: (str, Optional[RequestOptions]) -> dict
         
-        raw_response = self._transporter.write(
-            Verb.DELETE,
-            endpoint('/{}/delete', application_name),
-            application_name,
-            request_options
-        )
+        try:
+            raw_response = self._transporter.write(
+                Verb.DELETE,
+                endpoint('/{}/delete', application_name),
+                application_name,
+                request_options
+            )
+        finally:
+            self._transporter.invalidate(application_name, ReadCache.APPLICATIONS)
+
         return raw_response
 
         
@@ -153,27 +318,64 @@ class Client(object):
         """
         # type: (str, str, Optional[RequestOptions]) -> dict
         
-        raw_response = self._transporter.write(
-            Verb.POST,
-            endpoint('/{}/move', src_application_name),
-            dst_application_name,
-            request_options
-        )
-               
+        try:
+            raw_response = self._transporter.write(
+                Verb.POST,
+                endpoint('/{}/move', src_application_name),
+                dst_application_name,
+                request_options
+            )
+        finally:
+            self._transporter.invalidate(src_application_name, dst_application_name, ReadCache.APPLICATIONS)
+
         return raw_response
 
 
-    def monitoring_session(self, application_name, model_name):        
+    def monitoring_session(self, application_name, model_name, sampler=None):        
         """
         Create a new monitoring sesion.
         @param application_name name of application concerned.
         @param model_name name of model selected.
+        @param sampler optional `monitoring.sampling.Sampler` deciding which
+            sessions are sent, `MonitoringConfig.sampler` by default.
         """
-        # type: (str, str) -> Session
+        # type: (str, str, Optional[Sampler]) -> Session
         
-        return Session(self._transporter, self._config, application_name, model_name)
+        sampler = self._config.sampler if sampler is None else sampler
+
+        return Session(self._transporter, self._config, application_name, model_name, self._batcher, sampler, self._aggregator, self._encoder(application_name))
         
 
+    def register_schema(self, application_name, data_input, data_output, metadata):
+        # type: (str, list, list, list) -> None
+        """
+        Declare the fields of an application created elsewhere, as given to
+        `create_application`. They drive the aggregation mode and the
+        positional records, see `MonitoringConfig.positional_records`.
+        """
+
+        self._register_schema(application_name, data_input, data_output, metadata)
+
+    def _register_schema(self, application_name, data_input, data_output, metadata):
+        # type: (str, list, list, list) -> None
+
+        self._schemas[application_name] = {
+            'data_input': data_input,
+            'data_output': data_output,
+            'metadata': metadata
+        }
+
+        if self._encoders is not None:
+            self._encoders.invalidate(application_name)
+
+    def _encoder(self, application_name):
+        # type: (str) -> Optional[RecordEncoder]
+
+        if self._encoders is None:
+            return None
+
+        return self._encoders.get(application_name)
+
     def get_application(self, application_name, request_options=None):
         """
         Get the application information
@@ -185,7 +387,8 @@ class Client(object):
             Verb.GET,
             endpoint('/{}/get', application_name),
             application_name,
-            request_options
+            request_options,
+            (application_name,)
         )
         
         return raw_response
@@ -202,9 +405,28 @@ class Client(object):
             Verb.GET,
             endpoint('/applications',),
             filters,
-            request_options
+            request_options,
+            (ReadCache.APPLICATIONS,)
         )
         
         return raw_response
-       
- 
\ No newline at end of file
+
+    def iter_applications(self, filters=None, page_size=100, prefetch=True, request_options=None):
+        """
+        Iterate over the applications of the user, fetched page by page.
+        @param filters optional filters list
+        @param page_size applications per page
+        @param prefetch read the next page while the current one is consumed
+        """
+        # type: (Optional[list[dict]], int, bool, Optional[RequestOptions]) -> Iterator[dict]
+
+        def fetch(params):
+            return self._transporter.read(
+                Verb.GET,
+                endpoint('/applications',),
+                filters,
+                page_options(request_options, params),
+                (ReadCache.APPLICATIONS,)
+            )
+
+        return paginate(fetch, 'applications', page_size, prefetch)
@@ -27,19 +27,77 @@ class Config(object):
         self.read_timeout = 5
         self.write_timeout = 30
         self.connect_timeout = 2
+        # In seconds, total time of a call over all its attempts, backoff
+        # included, None to only bound each attempt. The attempts share
+        # what is left of it. Per call with the 'deadline' request option
+        self.deadline = None
+
+        # In seconds, a retry first waits a random time up to
+        # min(retry_backoff_max, retry_backoff * 2 ** (retry - 1))
+        self.retry_backoff = 0.05
+        self.retry_backoff_max = 1.0
+        # Retries allowed over the last 10 seconds: `retry_budget_minimum`
+        # plus this share of the calls. None to always retry
+        self.retry_budget_ratio = 0.2
+        self.retry_budget_minimum = 10
+
+        # Circuit breakers. A host is skipped after failing
+        # `host_failure_threshold` calls in a row, for a backoff doubled on
+        # every further failure, then probed by one call at a time
+        self.host_failure_threshold = 1
+        # After `circuit_failure_threshold` calls in a row found no host,
+        # the calls to an endpoint fail fast, writes going to the spool
+        # when enabled, then one call probes it. None to disable
+        self.circuit_failure_threshold = 5
+        # In seconds, doubled on every failed probe
+        self.circuit_reset_timeout = 1.0
+        self.circuit_reset_timeout_max = 60.0
 
         # In microseconds
         self.wait_task_time_before_retry = 100000
 
         self.hosts = self.build_hosts()
 
+        # 'least_latency' or 'power_of_two'. Hosts are ranked by their
+        # latency and error rate, discounted by priority: see `Host.score`
+        self.host_selection = 'least_latency'
+
+        # Hedged reads: a read still unanswered after the `hedge_percentile`
+        # of recent read latencies is also sent to the next host
+        self.hedge_reads = False
+        self.hedge_percentile = 95
+        # In seconds, until enough reads have been measured
+        self.hedge_delay = 0.5
+        self.hedge_workers = 8
+
         self.headers = {
             'X-Validandgo-Application-Id': app_id,
             'X-Validandgo-API-Key': api_key,
             'User-Agent': UserAgent.get(),
-            'Content-Type': 'application/json',
         }
 
+        # Entries of the cache of get_application, get_model and browse_*
+        # responses, 0 to disable
+        self.read_cache_size = 0
+        # In seconds
+        self.read_cache_ttl = 30.0
+
+        # `monitoring.metrics.MetricsRegistry` instrumenting requests, None
+        # to disable
+        self.metrics = None
+
+        # Body format, 'json' or 'msgpack'. Content-Type and Accept headers
+        # are set per request from it
+        self.wire_format = 'json'
+        # Request body compression, None or a codec registered with
+        # `monitoring.http.wire.Compression`: 'gzip', 'deflate' or 'zstd'
+        self.compression = 'gzip'
+        # In bytes, smaller bodies are sent uncompressed
+        self.compression_threshold = 64 * 1024
+        # In bytes, larger JSON bodies are encoded while being sent, with
+        # chunked transfer encoding. None to always send them whole
+        self.stream_threshold = 1024 * 1024
+
     @abc.abstractmethod
     def build_hosts(self):
         # type: () -> HostsCollection
@@ -56,6 +114,70 @@ class MonitoringConfig(Config):
         
         self.batch_size = 1000
 
+        # How NumPy arrays and pandas objects are sent: 'list' for typed
+        # JSON arrays, 'base64' for raw buffers with their dtype and shape
+        self.array_encoding = 'list'
+
+        # Default `monitoring.sampling.Sampler` of new sessions, None to
+        # send every session
+        self.sampler = None
+
+        # Aggregation mode: sessions only update in-memory feature summaries
+        # (moments, quantile sketches, heavy hitters), whose snapshots are
+        # sent every `aggregation_interval` seconds
+        self.aggregate = False
+        self.aggregation_interval = 60.0
+        # Relative accuracy of the quantile sketches
+        self.sketch_accuracy = 0.01
+        # Values tracked per categorical feature
+        self.heavy_hitters = 64
+
+        # Send the dict rows of the applications whose fields are known,
+        # see `Client.register_schema`, as lists in field order, checked
+        # against the field types. The backend must accept positional
+        # records
+        self.positional_records = False
+
+        # Send each session as one record on `stop()` instead of a
+        # `session_start` and a `session_stop` request
+        self.single_round_trip = False
+
+        # Buffered mode: session records are queued and sent in bulk
+        self.buffered = False
+        # In seconds
+        self.batch_max_latency = 1.0
+        # In bytes
+        self.batch_max_bytes = 5 * 1024 * 1024
+        # Records waiting to be sent before `Session.stop()` blocks
+        self.batch_queue_size = 100000
+
+        # Directory of the disk spool keeping writes that no host accepted,
+        # None to disable
+        self.spool_directory = None
+        # In bytes
+        self.spool_segment_size = 16 * 1024 * 1024
+        self.spool_max_size = 1024 * 1024 * 1024
+        # 'always', 'interval' or 'never'
+        self.spool_fsync = 'interval'
+        # In seconds
+        self.spool_fsync_interval = 1.0
+        self.spool_replay_interval = 5.0
+
+        # Path of the Unix socket of a local `monitoring.forwarder` process
+        # batching the records of every worker of a pre-fork server, None
+        # to send them from each process
+        self.forwarder_socket = None
+
+        # Threads running the calls of `Client.submit()`
+        self.submit_workers = 8
+        # Calls waiting for a thread before `Client.submit()` blocks
+        self.submit_queue_size = 1000
+
+        # Keep-alive connections kept open per host
+        self.pool_size = 10
+        # In seconds
+        self.pool_idle_timeout = 60
+
     def build_hosts(self):
         # type: () -> HostsCollection
 
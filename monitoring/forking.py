@@ -0,0 +1,66 @@
+import os
+import threading
+import weakref
+
+from typing import Any, List
+
+# Objects owning threads, locks, sockets or open files, reset on fork in
+# registration order.
+_instances = []  # type: List[weakref.ref]
+_lock = threading.Lock()
+
+
+def register(instance):
+    # type: (Any) -> None
+    """
+    Have `instance` reset in the child process after `os.fork()`, as
+    pre-fork servers (gunicorn, uWSGI) do when starting their workers.
+    It can define `_before_fork()`, `_after_fork_parent()` and
+    `_after_fork_child()`, called around every fork.
+    """
+
+    with _lock:
+        _instances[:] = [ref for ref in _instances if ref() is not None]
+        _instances.append(weakref.ref(instance))
+
+
+def _call(method):
+    # type: (str) -> None
+
+    # Hooks run outside the lock, they may register new instances.
+    with _lock:
+        instances = list(_instances)
+
+    for ref in instances:
+        hook = getattr(ref(), method, None)
+        if hook is not None:
+            hook()
+
+
+def _before_fork():
+    # type: () -> None
+
+    _call('_before_fork')
+
+
+def _after_fork_parent():
+    # type: () -> None
+
+    _call('_after_fork_parent')
+
+
+def _after_fork_child():
+    # type: () -> None
+
+    # Another thread of the parent may have held it while forking.
+    global _lock
+    _lock = threading.Lock()
+
+    _call('_after_fork_child')
+
+
+# Python 3.7+; forked workers of older versions must create their own client.
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(before=_before_fork,
+                        after_in_parent=_after_fork_parent,
+                        after_in_child=_after_fork_child)
@@ -0,0 +1,239 @@
+import copy
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+
+from typing import Any, Dict, Optional
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver  # type: ignore  # pragma: no cover
+
+from monitoring import forking
+from monitoring.helpers import endpoint
+from monitoring.http.serializer import DataSerializer
+from monitoring.http.verb import Verb
+
+# Every record is `length` (uint32) + its JSON payload.
+_LENGTH = struct.Struct('>I')
+
+
+class ForwarderChannel(object):
+    """
+    Worker side of the forwarder: session records are written to the Unix
+    socket of a local `Forwarder` process, which batches the records of
+    every worker together. Records are sent directly while the forwarder
+    cannot be reached.
+    """
+
+    def __init__(self, transporter, config):
+        # type: (Transporter, MonitoringConfig) -> None
+
+        self._transporter = transporter
+        self._path = config.forwarder_socket
+        self._timeout = config.write_timeout
+        self._socket = None  # type: Optional[socket.socket]
+        self._lock = threading.Lock()
+
+        self.forwarded = 0
+        self.fallbacks = 0
+
+        forking.register(self)
+
+    def push(self, record):
+        # type: (Dict[str, Any]) -> None
+
+        payload = DataSerializer.serialize_bytes(record)
+        frame = _LENGTH.pack(len(payload)) + payload
+
+        with self._lock:
+            try:
+                if self._socket is None:
+                    self._socket = self._connect()
+
+                self._socket.sendall(frame)
+            except (IOError, OSError, socket.error):
+                self._disconnect()
+                self.fallbacks += 1
+            else:
+                self.forwarded += 1
+                return
+
+        self._transporter.write(
+            Verb.PUT,
+            endpoint('applications/{}/{}/{}', record['application_name'],
+                     record['model_name'], record['action']),
+            record,
+            None
+        )
+
+    def flush(self, timeout=None):
+        # type: (Optional[float]) -> bool
+
+        # Records are handed over on push, the forwarder batches them.
+        return True
+
+    def close(self, timeout=None):
+        # type: (Optional[float]) -> None
+
+        with self._lock:
+            self._disconnect()
+
+    def _connect(self):
+        # type: () -> socket.socket
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self._timeout)
+
+        try:
+            sock.connect(self._path)
+        except Exception:
+            sock.close()
+            raise
+
+        return sock
+
+    def _disconnect(self):
+        # type: () -> None
+
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            except (IOError, OSError, socket.error):
+                pass
+
+            self._socket = None
+
+    def _after_fork_child(self):
+        # type: () -> None
+
+        # Each worker gets its own connection.
+        self._lock = threading.Lock()
+        self._disconnect()
+
+        self.forwarded = 0
+        self.fallbacks = 0
+
+
+class Forwarder(object):
+    """
+    Local aggregator process for pre-fork servers: workers configured with
+    `forwarder_socket` send their session records here, and the records of
+    all workers go out together through one buffered client, as a few
+    large `sessions/batch` uploads per host.
+    >>> Forwarder(config).serve_forever()
+    or, from a shell:
+    $ python -m monitoring.forwarder /run/monitoring.sock
+    """
+
+    def __init__(self, config, path=None):
+        # type: (MonitoringConfig, Optional[str]) -> None
+
+        from monitoring.client import Client
+
+        self.path = path or config.forwarder_socket
+        if not self.path:
+            raise ValueError('The forwarder needs a socket path')
+
+        config = copy.copy(config)
+        config.buffered = True
+        config.forwarder_socket = None
+
+        self._client = Client.connect_with_config(config)
+        self._batcher = self._client._batcher
+
+        if os.path.exists(self.path):
+            # Left over by a previous forwarder.
+            os.remove(self.path)
+
+        self._server = _Server(self.path, _Handler)
+        self._server.forwarder = self
+
+        self.received = 0
+        self.invalid = 0
+
+    def push(self, payload):
+        # type: (bytes) -> None
+
+        try:
+            record = json.loads(payload.decode('utf-8'))
+        except ValueError:
+            self.invalid += 1
+            return
+
+        self.received += 1
+        self._batcher.push(record)
+
+    def serve_forever(self):
+        # type: () -> None
+
+        try:
+            self._server.serve_forever()
+        finally:
+            self.close()
+
+    def start(self):
+        # type: () -> threading.Thread
+        """
+        Serve from a background thread of this process.
+        """
+
+        thread = threading.Thread(target=self._server.serve_forever,
+                                  name='monitoring-forwarder')
+        thread.daemon = True
+        thread.start()
+
+        return thread
+
+    def shutdown(self):
+        # type: () -> None
+
+        self._server.shutdown()
+        self.close()
+
+    def close(self):
+        # type: () -> None
+
+        self._server.server_close()
+        self._client.close()
+
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # type: () -> None
+
+        while True:
+            header = self.rfile.read(_LENGTH.size)
+            if len(header) < _LENGTH.size:
+                return
+
+            length, = _LENGTH.unpack(header)
+            payload = self.rfile.read(length)
+            if len(payload) < length:
+                return
+
+            self.server.forwarder.push(payload)
+
+
+if __name__ == '__main__':
+    from monitoring.configs import MonitoringConfig
+
+    if len(sys.argv) != 2:
+        sys.exit('usage: python -m monitoring.forwarder SOCKET_PATH')
+
+    # Application id and API key come from VALIDANDGO_APP_ID and
+    # VALIDANDGO_API_KEY.
+    Forwarder(MonitoringConfig(), sys.argv[1]).serve_forever()
@@ -19,9 +19,7 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
-import calendar
 import datetime
-import decimal
 import json
 import sys
 import warnings
@@ -120,20 +118,22 @@ def get_items(dictionary=None):
     
     
 class CustomJSONEncoder(json.JSONEncoder):
+    """
+    Encodes like monitoring.http.serializer.DataSerializer, but never
+    fails: dates that cannot be converted give 0, and any other object its
+    string.
+    """
     def default(self, obj):
-        if isinstance(obj, decimal.Decimal):
-            return float(obj)
-        elif isinstance(obj, datetime.datetime):
-            try:
-                return int(calendar.timegm(obj.utctimetuple()))
-            except:
-                return 0
+        # Imported here, the serializer module depends on this one.
+        from monitoring.http.serializer import encode_default
 
         try:
-            return json.JSONEncoder.default(self, obj)
-        except TypeError:
+            return encode_default(obj)
+        except (TypeError, ValueError, OverflowError):
+            if isinstance(obj, datetime.datetime):
+                return 0
             if PY2:
-                return unicode(obj)
+                return unicode(obj)  # noqa: F821
             else:
                 return str(obj)
 
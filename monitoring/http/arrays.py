@@ -0,0 +1,179 @@
+import base64
+import sys
+
+from typing import Any, Callable, Dict, Optional
+
+
+def numpy_module():
+    # type: () -> Any
+    """
+    The numpy module once the application imported it, None before. A
+    payload cannot hold arrays until then, and the client never pays for
+    importing numpy or pandas itself.
+    """
+
+    return sys.modules.get('numpy')
+
+
+def pandas_module():
+    # type: () -> Any
+
+    return sys.modules.get('pandas')
+
+
+class ArrayEncoding(object):
+    # Typed JSON array, serialized natively by orjson.
+    LIST = 'list'
+    # Raw little-endian buffer, base64 encoded.
+    BASE64 = 'base64'
+
+
+def is_array(obj):
+    # type: (Any) -> bool
+
+    numpy = numpy_module()
+    pandas = pandas_module()
+
+    return (numpy is not None and isinstance(obj, numpy.ndarray)) or (
+        pandas is not None and isinstance(obj, (pandas.DataFrame,
+                                                pandas.Series)))
+
+
+def encoder(obj):
+    # type: (Any) -> Optional[Callable[[Any], Any]]
+    """
+    JSON encoder of a NumPy or pandas object, None for other objects.
+    """
+
+    numpy = numpy_module()
+    if numpy is not None:
+        if isinstance(obj, numpy.generic):
+            return _item
+        if isinstance(obj, numpy.ndarray):
+            return _tolist
+
+    pandas = pandas_module()
+    if pandas is not None:
+        if isinstance(obj, pandas.DataFrame):
+            return encode_frame
+        if isinstance(obj, pandas.Series):
+            return encode_series
+
+    return None
+
+
+def _item(obj):
+    # type: (Any) -> Any
+
+    return obj.item()
+
+
+def _tolist(obj):
+    # type: (Any) -> Any
+
+    return obj.tolist()
+
+
+def encode_payload(data, encoding=ArrayEncoding.LIST):
+    # type: (Any, str) -> Any
+    """
+    Encode the NumPy arrays and pandas objects of a payload column-wise,
+    whether it is one of them or a dict of them. Anything else, dicts
+    without arrays included, is returned as is.
+    """
+
+    numpy = numpy_module()
+    pandas = pandas_module()
+    if numpy is None and pandas is None:
+        return data
+
+    if isinstance(data, dict):
+        encoded = None
+        for key, value in data.items():
+            value_encoded = encode_payload(value, encoding)
+            if value_encoded is not value:
+                if encoded is None:
+                    encoded = dict(data)
+                encoded[key] = value_encoded
+
+        return data if encoded is None else encoded
+
+    if pandas is not None:
+        if isinstance(data, pandas.DataFrame):
+            return encode_frame(data, encoding)
+        if isinstance(data, pandas.Series):
+            return encode_series(data, encoding)
+
+    if numpy is not None and isinstance(data, numpy.ndarray):
+        return encode_array(data, encoding)
+
+    return data
+
+
+def encode_array(array, encoding=ArrayEncoding.LIST):
+    # type: (numpy.ndarray, str) -> Dict[str, Any]
+
+    numpy = numpy_module()
+
+    encoded = {
+        'dtype': array.dtype.str,
+        'shape': list(array.shape),
+    }  # type: Dict[str, Any]
+
+    if encoding == ArrayEncoding.BASE64 and array.dtype.kind in 'biufc':
+        if array.dtype.byteorder == '>':
+            array = array.astype(array.dtype.newbyteorder('<'))
+
+        encoded['dtype'] = array.dtype.str
+        encoded['encoding'] = ArrayEncoding.BASE64
+        encoded['data'] = base64.b64encode(
+            numpy.ascontiguousarray(array).tobytes()).decode('ascii')
+    elif array.dtype.kind in 'biuf':
+        if not array.dtype.isnative:
+            # orjson would read the bytes in the native order.
+            array = array.astype(array.dtype.newbyteorder('='))
+            encoded['dtype'] = array.dtype.str
+
+        # Left as an array: orjson writes it in one native call, the json
+        # backend falls back to `tolist()`.
+        encoded['data'] = array
+    else:
+        encoded['data'] = array.tolist()
+
+    return encoded
+
+
+def encode_series(series, encoding=ArrayEncoding.LIST):
+    # type: (pandas.Series, str) -> Dict[str, Any]
+
+    encoded = encode_array(_values(series), encoding)
+    encoded['name'] = None if series.name is None else str(series.name)
+
+    return encoded
+
+
+def encode_frame(frame, encoding=ArrayEncoding.LIST):
+    # type: (pandas.DataFrame, str) -> Dict[str, Any]
+
+    encoded = {
+        'columns': [str(column) for column in frame.columns],
+        'data': [encode_array(_values(frame.iloc[:, i]), encoding)
+                 for i in range(frame.shape[1])],
+    }  # type: Dict[str, Any]
+
+    if not isinstance(frame.index, pandas_module().RangeIndex):
+        encoded['index'] = encode_array(numpy_module().asarray(frame.index),
+                                        encoding)
+
+    return encoded
+
+
+def _values(series):
+    # type: (pandas.Series) -> numpy.ndarray
+
+    values = series.to_numpy()
+    if values.dtype.kind == 'M':
+        # Same semantics as datetimes elsewhere: seconds since the epoch.
+        values = values.astype('datetime64[s]').astype('int64')
+
+    return values
@@ -0,0 +1,282 @@
+import asyncio
+import ssl
+import time
+
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+from monitoring.http.transporter import Response, Request
+from monitoring.http.wire import ChunkedBody, Compression, WireFormat
+
+
+class AsyncRequester(object):
+    """
+    Non-blocking HTTP/1.1 requester built on asyncio streams.
+    Connections are kept alive and reused per host, so many requests can be
+    in flight at once without one thread per request.
+    """
+
+    def __init__(self, pool_size=10, pool_idle_timeout=60.0, metrics=None):
+        # type: (int, float, Optional[MetricsRegistry]) -> None
+
+        self._pool_size = pool_size
+        self._metrics = metrics
+        self._pool_idle_timeout = pool_idle_timeout
+        self._idle = {}  # type: Dict[Tuple[str, str, int], List[_Connection]]
+        self._ssl_context = ssl.create_default_context()
+
+        self._requests = 0
+        self._new_connections = 0
+
+    async def send(self, request):
+        # type: (Request) -> Response
+
+        parts = urlsplit(request.url)
+        key = (parts.scheme, parts.hostname,
+               parts.port or (443 if parts.scheme == 'https' else 80))
+
+        target = parts.path or '/'
+        if parts.query:
+            target = '{}?{}'.format(target, parts.query)
+
+        body = request.body
+        head = self._head(request, parts.netloc, target,
+                          None if isinstance(body, ChunkedBody) else len(body))
+
+        self._requests += 1
+
+        try:
+            connection = self._reuse(key)
+            if connection is not None:
+                try:
+                    return await self._exchange(connection, key, head, body,
+                                                request.verb, request.timeout)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    # The server closed the keep-alive connection while it
+                    # was idle, retry once on a fresh one.
+                    connection.close()
+
+            connection = await asyncio.wait_for(self._open(key),
+                                                request.connect_timeout)
+
+            return await self._exchange(connection, key, head, body,
+                                        request.verb, request.timeout)
+        except asyncio.TimeoutError as e:
+            return Response(error_message=str(e) or 'Request timed out',
+                            is_timed_out_error=True)
+        except (OSError, ValueError, asyncio.IncompleteReadError) as e:
+            return Response(error_message=str(e), is_network_error=True)
+
+    def stats(self):
+        # type: () -> Dict[str, int]
+
+        return {
+            'requests': self._requests,
+            'hits': max(self._requests - self._new_connections, 0),
+            'misses': self._new_connections,
+            'pools': len(self._idle),
+        }
+
+    def close(self):
+        # type: () -> None
+
+        for connections in self._idle.values():
+            for connection in connections:
+                connection.close()
+
+        self._idle = {}
+
+    def _head(self, request, netloc, target, length):
+        # type: (Request, str, str, Optional[int]) -> bytes
+
+        lines = ['{} {} HTTP/1.1'.format(request.verb, target),
+                 'Host: {}'.format(netloc)]
+
+        for name, value in request.headers.items():
+            lines.append('{}: {}'.format(name, value))
+
+        if length is None:
+            lines.append('Transfer-Encoding: chunked')
+        else:
+            lines.append('Content-Length: {}'.format(length))
+        lines.append('Connection: keep-alive')
+        if 'Accept-Encoding' not in request.headers:
+            lines.append('Accept-Encoding: identity')
+
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('utf-8')
+
+    def _reuse(self, key):
+        # type: (Tuple[str, str, int]) -> Optional[_Connection]
+
+        connections = self._idle.get(key)
+        now = time.time()
+
+        while connections:
+            connection = connections.pop()
+            if (now - connection.last_use <= self._pool_idle_timeout
+                    and not connection.reader.at_eof()):
+                return connection
+
+            connection.close()
+
+        return None
+
+    def _release(self, key, connection):
+        # type: (Tuple[str, str, int], _Connection) -> None
+
+        connections = self._idle.setdefault(key, [])
+        if len(connections) >= self._pool_size:
+            connection.close()
+            return
+
+        connection.last_use = time.time()
+        connections.append(connection)
+
+    async def _open(self, key):
+        # type: (Tuple[str, str, int]) -> _Connection
+
+        scheme, host, port = key
+        reader, writer = await asyncio.open_connection(
+            host, port, ssl=self._ssl_context if scheme == 'https' else None
+        )
+
+        self._new_connections += 1
+
+        return _Connection(reader, writer)
+
+    async def _exchange(self, connection, key, head, body, verb, timeout):
+        # type: (_Connection, Tuple[str, str, int], bytes, Union[bytes, ChunkedBody], str, float) -> Response  # noqa: E501
+
+        try:
+            sent, (status, reason, keep_alive, content_type, encoding,
+                   content) = await asyncio.wait_for(
+                self._round_trip(connection, head, body, verb), timeout)
+        except BaseException:
+            connection.close()
+            raise
+
+        if keep_alive:
+            self._release(key, connection)
+        else:
+            connection.close()
+
+        if self._metrics is not None:
+            netloc = '{}:{}'.format(key[1], key[2])
+            self._metrics.sent_bytes.inc((netloc,), sent)
+            self._metrics.received_bytes.inc((netloc,), len(content))
+
+        if content and encoding and encoding != 'identity':
+            content = Compression.decompress(content, encoding)
+
+        return Response(status, WireFormat.decode(content, content_type),
+                        reason)
+
+    async def _round_trip(self, connection, head, body, verb):
+        # type: (_Connection, bytes, Union[bytes, ChunkedBody], str) -> Tuple[int, Tuple[int, str, bool, str, str, bytes]]  # noqa: E501
+
+        writer = connection.writer
+
+        if isinstance(body, ChunkedBody):
+            sent = 0
+            writer.write(head)
+            for piece in body:
+                # Drained after every piece, so that the pieces are not
+                # all buffered in the transport.
+                writer.write(b'%x\r\n' % len(piece) + piece + b'\r\n')
+                await writer.drain()
+                sent += len(piece)
+
+            writer.write(b'0\r\n\r\n')
+        else:
+            sent = len(body)
+            writer.write(head + body)
+
+        await writer.drain()
+
+        return sent, await self._read_response(connection.reader, verb)
+
+    async def _read_response(self, reader, verb):
+        # type: (asyncio.StreamReader, str) -> Tuple[int, str, bool, str, str, bytes]  # noqa: E501
+
+        while True:
+            status_line = await reader.readline()
+            if not status_line:
+                raise ConnectionError('Connection closed by server')
+
+            version, status, reason = (
+                status_line.decode('latin-1').rstrip('\r\n').split(' ', 2) +
+                ['']
+            )[:3]
+            headers = await _read_headers(reader)
+
+            # Interim answers (100 Continue, 103 Early Hints) come before
+            # the final one, on the same connection.
+            if not 100 <= int(status) < 200:
+                break
+
+        keep_alive = headers.get('connection', '').lower() != 'close' and (
+            version != 'HTTP/1.0' or
+            headers.get('connection', '').lower() == 'keep-alive'
+        )
+
+        if verb == 'HEAD' or int(status) in _NO_BODY:
+            # No body whatever the headers say, and no end of stream to
+            # wait for on a keep-alive connection.
+            content = b''
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    # Trailers, up to the blank line.
+                    await _read_headers(reader)
+                    break
+
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+
+            content = b''.join(chunks)
+        elif 'content-length' in headers:
+            content = await reader.readexactly(int(headers['content-length']))
+        else:
+            content = await reader.read()
+            keep_alive = False
+
+        return (int(status), reason, keep_alive,
+                headers.get('content-type', ''),
+                headers.get('content-encoding', '').lower(), content)
+
+
+# Final statuses answered without a body
+_NO_BODY = frozenset((204, 304))
+
+
+async def _read_headers(reader):
+    # type: (asyncio.StreamReader) -> Dict[str, str]
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            return headers
+
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+
+class _Connection(object):
+    def __init__(self, reader, writer):
+        # type: (asyncio.StreamReader, asyncio.StreamWriter) -> None
+
+        self.reader = reader
+        self.writer = writer
+        self.last_use = 0.0
+
+    def close(self):
+        # type: () -> None
+
+        try:
+            self.writer.close()
+        except RuntimeError:
+            # Its event loop is already closed, and so is the socket.
+            pass
@@ -0,0 +1,164 @@
+import asyncio
+import copy
+import logging
+import time
+
+from typing import List
+
+from monitoring.http.hosts import Host
+from monitoring.http.transporter import (
+    CIRCUIT_OPEN,
+    Transporter,
+    Request,
+    RetryOutcome
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncTransporter(Transporter):
+    """
+    Transporter whose `read`, `write` and `request` return awaitables.
+    Hosts and retry decisions are shared with the blocking `Transporter`,
+    only the round-trip to each host is awaited.
+    """
+
+    async def retry(self, hosts, request, relative_url):
+        # type: (List[Host], Request, str) -> dict
+
+        started_request = time.time()
+        hosts = self._retry_strategy.valid_hosts(hosts)
+        timeouts = (request.connect_timeout, request.timeout)
+        if self._retry_budget is not None and hosts:
+            self._retry_budget.call()
+
+        reason = 'no host could be reached' if hosts else CIRCUIT_OPEN
+        for attempt, host in enumerate(hosts):
+            if attempt:
+                if not self._may_retry():
+                    reason = 'retry budget exhausted'
+                    break
+
+                delay = self._backoff(request, attempt, started_request)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            if not self._fit_deadline(request, timeouts, started_request,
+                                      len(hosts) - attempt):
+                reason = 'deadline exceeded'
+                break
+
+            request.url = '{}/{}'.format(host.base_url, relative_url)
+
+            started = time.time()
+            response = await self._requester.send(request)
+
+            latency = time.time() - started
+            decision = self._retry_strategy.decide(host, response, latency)
+
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('%s %s on %s: %s in %.3fs', request.verb,
+                             relative_url, host.url,
+                             response.status_code or response.error_message,
+                             latency)
+
+            if self.metrics is not None:
+                self._observe_attempt(host, response, decision, latency)
+
+            if decision != RetryOutcome.RETRY:
+                if self.metrics is not None:
+                    self._observe_request(request, relative_url, decision,
+                                          started_request)
+
+                return self._result(relative_url, response, decision)
+
+        return self._unreachable(request, relative_url, reason,
+                                 started_request)
+
+    async def hedged_retry(self, hosts, request, relative_url):
+        # type: (List[Host], Request, str) -> dict
+
+        started_request = time.time()
+        hosts = self._retry_strategy.valid_hosts(hosts)
+        delay = self._hedge_delay()
+        pending = set()  # type: set
+        # Encode once, before the attempts copy the request.
+        request.encode()
+        timeouts = (request.connect_timeout, request.timeout)
+        if self._retry_budget is not None and hosts:
+            self._retry_budget.call()
+
+        def launch(host):
+            attempt = copy.copy(request)
+            attempt.url = '{}/{}'.format(host.base_url, relative_url)
+            self._fit_deadline(attempt, timeouts, started_request, 1)
+            pending.add(asyncio.ensure_future(self._attempt(host, attempt)))
+
+        remaining = list(hosts)
+        reason = 'no host could be reached' if hosts else CIRCUIT_OPEN
+        try:
+            while remaining or pending:
+                left = self._remaining(request, started_request)
+                if left is not None and left <= 0:
+                    reason = 'deadline exceeded'
+                    break
+
+                if remaining and not pending:
+                    if len(remaining) < len(hosts) and not self._may_retry():
+                        reason = 'retry budget exhausted'
+                        break
+
+                    launch(remaining.pop(0))
+
+                timeout = delay if remaining else None
+                if left is not None:
+                    timeout = left if timeout is None else min(timeout, left)
+
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout,
+                    return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    left = self._remaining(request, started_request)
+                    if left is not None and left <= 0:
+                        continue
+
+                    if delay is not None and remaining:
+                        if self._may_retry():
+                            launch(remaining.pop(0))
+                        else:
+                            delay = None
+                    continue
+
+                for task in done:
+                    pending.discard(task)
+                    response, decision, latency = task.result()
+
+                    if decision == RetryOutcome.SUCCESS:
+                        self._read_latencies.append(latency)
+
+                    if decision != RetryOutcome.RETRY:
+                        if self.metrics is not None:
+                            self._observe_request(request, relative_url,
+                                                  decision, started_request)
+
+                        return self._result(relative_url, response, decision)
+        finally:
+            for task in pending:
+                task.cancel()
+
+        return self._unreachable(request, relative_url, reason,
+                                 started_request)
+
+    async def _attempt(self, host, request):
+        # type: (Host, Request) -> tuple
+
+        started = time.time()
+        response = await self._requester.send(request)
+        latency = time.time() - started
+        decision = self._retry_strategy.decide(host, response, latency)
+
+        if self.metrics is not None:
+            self._observe_attempt(host, response, decision, latency)
+
+        return response, decision, latency
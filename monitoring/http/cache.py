@@ -0,0 +1,153 @@
+import collections
+import copy
+import threading
+import time
+
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from monitoring import forking
+
+
+class ReadCache(object):
+    """
+    LRU cache of read responses, expiring after `ttl` seconds.
+    Concurrent reads of the same key share one in-flight request. Entries
+    are tagged with the applications they describe, and writes invalidate
+    the entries of the applications they touch.
+    """
+
+    # Tag of the application listing
+    APPLICATIONS = '*applications'
+
+    def __init__(self, max_entries=1024, ttl=30.0):
+        # type: (int, float) -> None
+
+        self._max_entries = max_entries
+        self._ttl = ttl
+
+        self._entries = collections.OrderedDict()  # type: collections.OrderedDict  # noqa: E501
+        self._flights = {}  # type: Dict[Hashable, _Flight]
+        # Bumped by every invalidation, a read started before one is not
+        # cached since it may describe the state before the write.
+        self._generation = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        forking.register(self)
+
+    def get(self, key, tags, load):
+        # type: (Hashable, Tuple[str, ...], Callable[[], Any]) -> Any
+        """
+        Cached value of `key`, from `load()` on a miss. Every caller gets
+        its own copy of the value.
+        """
+
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    # Most recently used last.
+                    self._entries[key] = self._entries.pop(key)
+                    self.hits += 1
+
+                    return copy.deepcopy(entry[2])
+
+                del self._entries[key]
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight(self._generation)
+                self._flights[key] = flight
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+
+            return copy.deepcopy(flight.value)
+
+        try:
+            flight.value = load()
+        except BaseException as e:
+            flight.error = e
+            raise
+        else:
+            with self._lock:
+                if flight.generation == self._generation:
+                    self._store(key, tags, flight.value, now + self._ttl)
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+
+            flight.done.set()
+
+        return copy.deepcopy(flight.value)
+
+    def invalidate(self, tags):
+        # type: (Iterable[str]) -> None
+
+        tags = set(tags)
+
+        with self._lock:
+            self._generation += 1
+
+            for key in [key for key, entry in self._entries.items()
+                        if tags.intersection(entry[1])]:
+                del self._entries[key]
+                self.invalidations += 1
+
+    def clear(self):
+        # type: () -> None
+
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        # type: () -> Dict[str, int]
+
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'size': len(self._entries),
+        }
+
+    def _store(self, key, tags, value, expires):
+        # type: (Hashable, Tuple[str, ...], Any, float) -> None
+
+        self._entries[key] = (expires, tags, value)
+
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _after_fork_child(self):
+        # type: () -> None
+
+        # The parent's in-flight reads never complete in the child.
+        self._lock = threading.Lock()
+        self._flights = {}
+
+
+class _Flight(object):
+    def __init__(self, generation):
+        # type: (int) -> None
+
+        self.generation = generation
+        self.done = threading.Event()
+        self.value = None  # type: Any
+        self.error = None  # type: Optional[BaseException]
@@ -1,22 +1,40 @@
+import threading
+
 from random import shuffle
 
 from typing import List, Optional
 
+from monitoring import forking
+
 
 class Host(object):
     TTL = 300.0
-
-    def __init__(self, url, priority=0, accept=None):
-        # type: (str, Optional[int], Optional[int]) -> None
+    # First down period after a failure, doubled on each consecutive one
+    # and capped at TTL.
+    BACKOFF = 1.0
+    # Weight of the newest sample in the latency and error rate averages.
+    DECAY = 0.2
+    # Cost discount per priority level: a priority 10 host is preferred
+    # until it is twice as slow as a priority 0 one.
+    PRIORITY_WEIGHT = 0.1
+
+    def __init__(self, url, priority=0, accept=None, scheme='https'):
+        # type: (str, Optional[int], Optional[int], str) -> None
 
         self.url = url
+        # 'http' only makes sense for a local stand-in server.
+        self.scheme = scheme
+        self.base_url = '{}://{}'.format(scheme, url)
         self.priority = priority
         self.accept = ((CallType.WRITE | CallType.READ) if accept is None
                        else accept)
 
-        self.last_use = 0.0
-        self.retry_count = 0
-        self.up = True
+        # Guards the health state below, hosts are shared by every thread
+        # of the client.
+        self.lock = threading.Lock()
+        self.reset()
+
+        forking.register(self)
 
     def reset(self):
         # type: () -> None
@@ -25,6 +43,69 @@ class Host(object):
         self.retry_count = 0
         self.up = True
 
+        self.latency = None  # type: Optional[float]
+        self.error_rate = 0.0
+        self.failures = 0
+        self.down_until = 0.0
+
+    def observe(self, latency, failed):
+        # type: (float, bool) -> None
+        """
+        Fold one response into the exponentially weighted averages.
+        """
+
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += Host.DECAY * (latency - self.latency)
+
+        self.error_rate += Host.DECAY * ((1.0 if failed else 0.0) -
+                                         self.error_rate)
+
+    def mark_down(self, now, threshold=1):
+        # type: (float, int) -> None
+        """
+        Count a failure. The host is marked down after `threshold`
+        consecutive ones, or at once when it was down and being probed.
+        """
+
+        self.failures += 1
+        if self.up and self.failures < threshold:
+            return
+
+        self.up = False
+        self.down_until = now + self.backoff(threshold)
+
+    def backoff(self, threshold=1):
+        # type: (int) -> float
+
+        return min(Host.BACKOFF * 2 ** min(max(self.failures - threshold, 0),
+                                           32), Host.TTL)
+
+    def mark_up(self):
+        # type: () -> None
+
+        self.failures = 0
+        self.up = True
+
+    def _after_fork_child(self):
+        # type: () -> None
+
+        self.lock = threading.Lock()
+
+    def score(self, default_latency):
+        # type: (float) -> float
+        """
+        Expected cost of a call, lower is better. Errors weigh as if each
+        one cost ten times the average latency, and the cost is discounted
+        by the priority of the host.
+        """
+
+        latency = default_latency if self.latency is None else self.latency
+        discount = 1.0 + Host.PRIORITY_WEIGHT * max(self.priority or 0, 0)
+
+        return latency * (1.0 + 10.0 * self.error_rate) / discount
+
 
 class HostsCollection(object):
     def __init__(self, hosts):
@@ -6,7 +6,7 @@ from monitoring.helpers import get_items
 
 class RequestOptions(object):
     def __init__(self, headers, query_parameters, timeouts, data):
-        # type: (Dict[str, str], Dict[str, Any], Dict[str, int], Dict[str, Any]) -> None  # noqa: E501
+        # type: (Dict[str, str], Dict[str, Any], Dict[str, Optional[float]], Dict[str, Any]) -> None  # noqa: E501
 
         self.headers = headers
         self.query_parameters = query_parameters
@@ -21,7 +21,8 @@ class RequestOptions(object):
         elif option in Params.QUERY_PARAMETERS:
             self.query_parameters[option] = value
         elif option in Params.TIMEOUTS:
-            self.timeouts[option] = value
+            # In seconds, as `create` sets them.
+            self.timeouts[option] = None if value is None else float(value)
         else:
             self.data[option] = value
 
@@ -32,9 +33,11 @@ class RequestOptions(object):
         headers = dict(config.headers)
 
         timeouts = {
-            'readTimeout': int(config.read_timeout),
-            'writeTimeout': int(config.write_timeout),
-            'connectTimeout': int(config.connect_timeout),
+            'readTimeout': float(config.read_timeout),
+            'writeTimeout': float(config.write_timeout),
+            'connectTimeout': float(config.connect_timeout),
+            'deadline': None if config.deadline is None else float(
+                config.deadline),
         }
 
         request_options = RequestOptions(headers, {}, timeouts, {})
@@ -64,4 +67,5 @@ class Params(object):
         'readTimeout',
         'writeTimeout',
         'connectTimeout',
+        'deadline',
     )
\ No newline at end of file
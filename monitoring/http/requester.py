@@ -1,35 +1,220 @@
+import threading
+import time
+
 import requests
 
 from requests import Timeout, RequestException
+from requests.adapters import HTTPAdapter
+from urllib3.response import HTTPResponse
+from typing import Dict, Optional
+
+try:
+    from urllib.parse import urlsplit
+except ImportError:
+    from urlparse import urlsplit  # pragma: no cover
 
+from monitoring import forking
 from monitoring.http.transporter import Response, Request
+from monitoring.http.wire import ChunkedBody, Compression, WireFormat
+
+# Content codings urllib3 decodes by itself, the others are decoded with
+# the codecs registered with `Compression`.
+_DECODED = frozenset(getattr(HTTPResponse, 'CONTENT_DECODERS',
+                             ('gzip', 'deflate')))
 
 
 class Requester(object):
+    """
+    Sends requests through long-lived, keep-alive connection pools.
+    One pool is kept per host, and pools idle for longer than
+    `pool_idle_timeout` seconds are replaced on next use. A replaced pool
+    is closed once the requests still using it are done.
+    """
+
+    def __init__(self, pool_size=10, pool_idle_timeout=60.0, metrics=None):
+        # type: (int, float, Optional[MetricsRegistry]) -> None
+
+        self._pool_size = pool_size
+        self._metrics = metrics
+        self._pool_idle_timeout = pool_idle_timeout
+        self._pools = {}  # type: Dict[str, _HostPool]
+        self._lock = threading.Lock()
+
+        self._requests = 0
+        self._retired_connections = 0
+
+        forking.register(self)
 
     def send(self, request):
         # type: (Request) -> Response
 
+        body = request.body
+        sent = [0]
+
+        if isinstance(body, ChunkedBody):
+            def pieces():
+                for piece in body:
+                    sent[0] += len(piece)
+                    yield piece
+
+            # A generator is sent with chunked transfer encoding.
+            data = pieces()
+        else:
+            sent[0] = len(body or b'')
+            data = body
+
         req = requests.Request(method=request.verb, url=request.url,
                                headers=request.headers,
-                               data=request.data_as_string)
+                               data=data)
 
         r = req.prepare()  # type: ignore
-        s = requests.Session()  # type: ignore
+        pool = self._checkout(request.url)
 
         requests_timeout = (request.connect_timeout, request.timeout)
 
         try:
-            response = s.send(r, timeout=requests_timeout)  # type: ignore
+            response = pool.session.send(r, timeout=requests_timeout)  # type: ignore  # noqa: E501
+            content = response.content
         except Timeout as e:
             return Response(error_message=str(e), is_timed_out_error=True)
         except RequestException as e:
             return Response(error_message=str(e), is_network_error=True)
         finally:
-            s.close()
+            self._release(pool)
+
+        if self._metrics is not None:
+            self._metrics.sent_bytes.inc((pool.netloc,), sent[0])
+            self._metrics.received_bytes.inc((pool.netloc,), len(content))
+
+        encoding = response.headers.get('Content-Encoding', '').lower()
+        if encoding and encoding != 'identity' and encoding not in _DECODED:
+            content = Compression.decompress(content, encoding)
 
         return Response(
             response.status_code,
-            response.json(),
+            WireFormat.decode(content, response.headers.get('Content-Type')),
             response.reason
-        )
\ No newline at end of file
+        )
+
+    def stats(self):
+        # type: () -> Dict[str, int]
+        """
+        Connection reuse counters: a hit is a request served on an already
+        open connection, a miss is a request that had to open a new one.
+        """
+
+        with self._lock:
+            misses = self._retired_connections + sum(
+                pool.connections() for pool in self._pools.values()
+            )
+            requests_count = self._requests
+
+        return {
+            'requests': requests_count,
+            'hits': max(requests_count - misses, 0),
+            'misses': misses,
+            'pools': len(self._pools),
+        }
+
+    def close(self):
+        # type: () -> None
+
+        with self._lock:
+            for pool in self._pools.values():
+                self._retired_connections += pool.connections()
+                pool.close()
+
+            self._pools = {}
+
+    def _after_fork_child(self):
+        # type: () -> None
+
+        # The parent's sockets are left to it: dropping the pools only
+        # closes the child's copies of their file descriptors.
+        self._lock = threading.Lock()
+        self._pools = {}
+        self._requests = 0
+        self._retired_connections = 0
+
+    def _checkout(self, url):
+        # type: (str) -> _HostPool
+
+        parts = urlsplit(url)
+        key = '{}://{}'.format(parts.scheme, parts.netloc)
+        now = time.time()
+
+        with self._lock:
+            self._requests += 1
+
+            pool = self._pools.get(key)
+            if pool is not None and now - pool.last_use > self._pool_idle_timeout:
+                # Idle keep-alive sockets are usually dropped by the load
+                # balancer already, start over rather than failing on them.
+                # A request still running on the old pool closes it when
+                # it is done.
+                del self._pools[key]
+                pool.retired = True
+                if not pool.in_use:
+                    self._retire(pool)
+                pool = None
+
+            if pool is None:
+                pool = _HostPool(key, self._pool_size)
+                self._pools[key] = pool
+
+            pool.last_use = now
+            pool.in_use += 1
+
+        return pool
+
+    def _release(self, pool):
+        # type: (_HostPool) -> None
+
+        with self._lock:
+            pool.in_use -= 1
+            pool.last_use = time.time()
+
+            if pool.retired and not pool.in_use:
+                self._retire(pool)
+
+    def _retire(self, pool):
+        # type: (_HostPool) -> None
+
+        self._retired_connections += pool.connections()
+        pool.close()
+
+
+class _HostPool(object):
+    def __init__(self, base_url, size):
+        # type: (str, int) -> None
+
+        self.base_url = base_url
+        self.netloc = urlsplit(base_url).netloc
+        self.last_use = 0.0
+        # Requests running on the pool, and whether it was replaced.
+        self.in_use = 0
+        self.retired = False
+
+        # Pool is per host, retries are handled by the `RetryStrategy`.
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size,
+                                   max_retries=0)
+
+        self.session = requests.Session()  # type: ignore
+        self.session.mount(base_url, self.adapter)
+
+    def connections(self):
+        # type: () -> int
+
+        pools = self.adapter.poolmanager.pools
+        total = 0
+        for key in list(pools.keys()):
+            pool = pools.get(key)  # type: Optional[object]
+            if pool is not None:
+                total += getattr(pool, 'num_connections', 0)
+
+        return total
+
+    def close(self):
+        # type: () -> None
+
+        self.session.close()
@@ -2,11 +2,15 @@ import json
 import calendar
 import datetime
 import decimal
+import itertools
 import sys
 
-from typing import Union, Any, Dict
+from typing import (
+    Union, Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+)
 
-from monitoring.helpers import get_items
+from monitoring.helpers import PY2, get_items
+from monitoring.http import arrays
 
 # Python 3
 if sys.version_info >= (3, 0):
@@ -14,6 +18,11 @@ if sys.version_info >= (3, 0):
 else:
     from urllib import urlencode  # pragma: no cover
 
+if PY2:
+    _STRINGS = (str, unicode)  # noqa: F821  # pragma: no cover
+else:
+    _STRINGS = (str,)
+
 
 class QueryParametersSerializer(object):
     @staticmethod
@@ -51,23 +60,299 @@ class SettingsDeserializer(object):
         return data
 
 
+def _timestamp(obj):
+    # type: (datetime.datetime) -> int
+
+    return int(calendar.timegm(obj.utctimetuple()))
+
+
+# Encoders for the types JSON does not know, looked up by exact type.
+_ENCODERS = {
+    decimal.Decimal: float,
+    datetime.datetime: _timestamp,
+}  # type: Dict[type, Callable[[Any], Any]]
+
+_ENCODERS_BY_BASE = dict(_ENCODERS)
+
+
+def encode_default(obj):
+    # type: (object) -> object
+    """
+    JSON fallback for a non native object. One dict lookup on its type in
+    the common case; subclasses are resolved through their MRO once and
+    cached.
+    """
+
+    encoder = _ENCODERS.get(type(obj))
+    if encoder is None:
+        for base in type(obj).__mro__:
+            encoder = _ENCODERS_BY_BASE.get(base)
+            if encoder is not None:
+                _ENCODERS[type(obj)] = encoder
+                break
+        else:
+            # Looked up once numpy or pandas is imported, not registered
+            # at import time.
+            encoder = arrays.encoder(obj)
+            if encoder is not None:
+                _ENCODERS[type(obj)] = encoder
+            elif type(obj).__str__ is not object.__str__:
+                return str(obj)
+            else:
+                raise TypeError('Object of type {} is not JSON serializable'
+                                .format(type(obj).__name__))
+
+    return encoder(obj)
+
+
+def _json_dumps(data):
+    # type: (Any) -> bytes
+
+    return json.dumps(data, cls=JSONEncoder,
+                      separators=(',', ':')).encode('utf-8')
+
+
+try:
+    import orjson
+
+    _ORJSON_OPTIONS = (orjson.OPT_SERIALIZE_NUMPY |
+                       orjson.OPT_PASSTHROUGH_DATETIME |
+                       orjson.OPT_NON_STR_KEYS)
+
+    def _orjson_dumps(data):
+        # type: (Any) -> bytes
+
+        return orjson.dumps(data, default=encode_default,
+                            option=_ORJSON_OPTIONS)
+except ImportError:
+    orjson = None
+
+
+
 class DataSerializer(object):
+    """
+    Serializes request payloads with the configured backend: orjson when it
+    is installed, the standard library json module otherwise.
+    >>> DataSerializer.use('json')
+    """
+
+    _backends = {
+        'json': _json_dumps,
+    }  # type: Dict[str, Callable[[Any], bytes]]
+
+    if orjson is not None:
+        _backends['orjson'] = _orjson_dumps
+
+    _dumps = staticmethod(_backends.get('orjson', _json_dumps))
+
     @staticmethod
     def serialize(data):
         # type: (Union[Dict[str, Any], list]) -> str
 
-        return json.dumps(data, cls=JSONEncoder)
+        return DataSerializer._dumps(data).decode('utf-8')
+
+    @staticmethod
+    def serialize_bytes(data):
+        # type: (Union[Dict[str, Any], list]) -> bytes
+
+        return DataSerializer._dumps(data)
+
+    @staticmethod
+    def serialize_chunks(data):
+        # type: (Any) -> Iterator[bytes]
+        """
+        Serialize `data` as a sequence of byte strings, whose concatenation
+        is the JSON document. Large dicts and lists are encoded by slices
+        of members, and large NumPy arrays by slices of rows, so that a
+        large payload is never held as one string; each slice is still
+        encoded by the backend in one call.
+        """
+
+        return _chunks(DataSerializer._dumps, data, _CHUNK_DEPTH)
+
+    @staticmethod
+    def use(backend):
+        # type: (str) -> None
+
+        if backend not in DataSerializer._backends:
+            raise ValueError('Unknown serializer backend: {}'.format(backend))
+
+        DataSerializer._dumps = staticmethod(DataSerializer._backends[backend])
+
+    @staticmethod
+    def register_backend(name, dumps):
+        # type: (str, Callable[[Any], bytes]) -> None
+
+        DataSerializer._backends[name] = dumps
+
+    @staticmethod
+    def register(cls, encoder):
+        # type: (type, Callable[[Any], Any]) -> None
+        """
+        Teach every backend how to encode `cls` and its subclasses.
+        """
+
+        _ENCODERS[cls] = encoder
+        _ENCODERS_BY_BASE[cls] = encoder
+
+
+# Members encoded per backend call, and nesting levels split in slices
+_CHUNK_SIZE = 1024
+_CHUNK_DEPTH = 2
+
+# Types of the members skipped when looking for arrays
+_SCALARS = frozenset((str, bytes, int, float, bool, type(None)))
+
+
+def _chunks(dumps, data, depth, holders=None):
+    # type: (Callable[[Any], bytes], Any, int, Optional[Set[int]]) -> Iterator[bytes]  # noqa: E501
+
+    if holders is None:
+        holders = _array_holders(data)
+
+    # Large arrays and the containers holding them are split at any depth.
+    split = depth > 0 or id(data) in holders
+
+    if split and isinstance(data, dict):
+        yield b'{'
+
+        separator = b''
+        if depth == 1 and id(data) not in holders:
+            items = iter(get_items(data))
+            for _ in range(0, len(data), _CHUNK_SIZE):
+                # Without the braces of the slice.
+                yield separator + dumps(
+                    dict(itertools.islice(items, _CHUNK_SIZE)))[1:-1]
+                separator = b','
+        else:
+            for batch, nested in _batches(get_items(data), depth, holders):
+                if nested:
+                    yield separator + dumps(batch[0]) + b':'
+                    for chunk in _chunks(dumps, batch[1], max(depth - 1, 0),
+                                         holders):
+                        yield chunk
+                else:
+                    yield separator + dumps(dict(batch))[1:-1]
+
+                separator = b','
+
+        yield b'}'
+    elif split and isinstance(data, list):
+        yield b'['
+
+        separator = b''
+        if depth == 1 and id(data) not in holders:
+            for start in range(0, len(data), _CHUNK_SIZE):
+                yield separator + dumps(data[start:start + _CHUNK_SIZE])[1:-1]
+                separator = b','
+        else:
+            for batch, nested in _batches(enumerate(data), depth, holders,
+                                          False):
+                if nested:
+                    yield separator
+                    for chunk in _chunks(dumps, batch[1], max(depth - 1, 0),
+                                         holders):
+                        yield chunk
+                else:
+                    yield separator + \
+                        dumps([value for _, value in batch])[1:-1]
+
+                separator = b','
+
+        yield b']'
+    elif id(data) in holders:
+        # A NumPy array, by slices of rows.
+        rows = max(_CHUNK_SIZE * len(data) // data.size, 1)
+
+        yield b'['
+
+        separator = b''
+        for start in range(0, len(data), rows):
+            yield separator + dumps(data[start:start + rows])[1:-1]
+            separator = b','
+
+        yield b']'
+    else:
+        yield dumps(data)
+
+
+def _array_holders(data):
+    # type: (Any) -> Set[int]
+    """
+    ids of the NumPy arrays of `data` too large to be encoded at once, and
+    of the dicts and lists holding them at any depth. Empty, without a
+    walk, while numpy is not imported.
+    """
+
+    numpy = arrays.numpy_module()
+    holders = set()  # type: Set[int]
+    if numpy is None:
+        return holders
+
+    def walk(value):
+        # type: (Any) -> bool
+
+        if isinstance(value, dict):
+            members = value.values()
+        elif isinstance(value, list):
+            members = value
+        else:
+            if isinstance(value, numpy.ndarray) and value.ndim and \
+                    value.size > _CHUNK_SIZE:
+                holders.add(id(value))
+                return True
+
+            return False
+
+        held = False
+        for member in members:
+            if type(member) not in _SCALARS and walk(member):
+                held = True
+
+        if held:
+            holders.add(id(value))
+
+        return held
+
+    walk(data)
+
+    return holders
+
+
+def _batches(members, depth, holders, keyed=True):
+    # type: (Any, int, Set[int], bool) -> Iterator[Tuple[Any, bool]]
+    """
+    Slices of up to `_CHUNK_SIZE` (key, value) members, and the members
+    too large to be encoded at once, alone and flagged as nested.
+    """
+
+    batch = []  # type: List[Tuple[Any, Any]]
+    for member in members:
+        key, value = member
+        # A key encoded on its own has to be a string, and other keys are
+        # left to the backend within a slice.
+        if (id(value) in holders or depth > 1 and
+                isinstance(value, (dict, list)) and
+                len(value) > _CHUNK_SIZE) and \
+                (not keyed or isinstance(key, _STRINGS)):
+            if batch:
+                yield batch, False
+                batch = []
+
+            yield member, True
+            continue
+
+        batch.append(member)
+        if len(batch) >= _CHUNK_SIZE:
+            yield batch, False
+            batch = []
+
+    if batch:
+        yield batch, False
 
 
 class JSONEncoder(json.JSONEncoder):
     def default(self, obj):
         # type: (object) -> object
 
-        if isinstance(obj, decimal.Decimal):
-            return float(obj)
-        elif isinstance(obj, datetime.datetime):
-            return int(calendar.timegm(obj.utctimetuple()))
-        elif type(obj).__str__ is not object.__str__:
-            return str(obj)
-
-        return json.JSONEncoder.default(self, obj)
\ No newline at end of file
+        return encode_default(obj)
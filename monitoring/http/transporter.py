@@ -1,10 +1,19 @@
+import collections
+import copy
+import logging
+import random
+import threading
 import time
 
-from typing import Optional, Union, Dict, Any, List
+from concurrent import futures
+
+from typing import Optional, Union, Dict, Any, List, Tuple
+from monitoring import forking
 from monitoring.exceptions import (
     MonitoringUnreachableHostException,
     RequestException
 )
+from monitoring.http.cache import ReadCache
 from monitoring.http.hosts import Host
 from monitoring.http.request_options import RequestOptions
 from monitoring.configs import Config
@@ -13,6 +22,18 @@ from monitoring.http.serializer import (
     DataSerializer
 )
 from monitoring.http.verb import Verb
+from monitoring.http.wire import (
+    ChunkedBody,
+    Compression,
+    WireFormat,
+    encode_body
+)
+from monitoring.log import redact, truncate
+
+logger = logging.getLogger(__name__)
+
+# Reason of the calls failed fast, without touching the network
+CIRCUIT_OPEN = 'circuit open'
 
 try:
     from monitoring.http.requester import Requester
@@ -26,11 +47,50 @@ class Transporter(object):
 
         self._requester = requester
         self._config = config
-        self._retry_strategy = RetryStrategy()
+        self._retry_strategy = RetryStrategy(config.host_selection,
+                                             config.metrics,
+                                             config.host_failure_threshold)
+        self._retry_budget = (RetryBudget(config.retry_budget_ratio,
+                                          config.retry_budget_minimum)
+                              if config.retry_budget_ratio is not None
+                              else None)
+        self.metrics = config.metrics  # type: Optional[MetricsRegistry]
+        self.circuits = (CircuitBreakers(config.circuit_failure_threshold,
+                                         config.circuit_reset_timeout,
+                                         config.circuit_reset_timeout_max,
+                                         config.metrics)
+                         if config.circuit_failure_threshold is not None
+                         else None)
+        self.spool = None  # type: Optional[Spool]
+        self.read_cache = (ReadCache(config.read_cache_size,
+                                     config.read_cache_ttl)
+                           if config.read_cache_size else None)
+
+        self._hedge_executor = None  # type: Optional[futures.Executor]
+        self._hedge_lock = threading.Lock()
+        # Hedge workers running or reserved for an attempt
+        self._hedge_busy = 0
+        self._read_latencies = collections.deque(maxlen=256)
+
+        forking.register(self)
 
     def write(self, verb, path, data, request_options):
         # type: (str, str, Optional[Union[dict, list]], Optional[Union[dict, RequestOptions]]) -> dict # noqa: E501
 
+        try:
+            return self._write(verb, path, data, request_options)
+        except MonitoringUnreachableHostException:
+            if self.spool is None:
+                raise
+
+            # Kept on disk, the spool replayer delivers it later.
+            self.spool.append({'verb': verb, 'path': path, 'data': data})
+
+            return None
+
+    def _write(self, verb, path, data, request_options):
+        # type: (str, str, Optional[Union[dict, list]], Optional[Union[dict, RequestOptions]]) -> dict # noqa: E501
+
         if request_options is None or isinstance(request_options, dict):
             request_options = RequestOptions.create(self._config,
                                                     request_options)
@@ -41,7 +101,36 @@ class Transporter(object):
 
         return self.request(verb, hosts, path, data, request_options, timeout)
 
-    def read(self, verb, path, data, request_options):
+    def read(self, verb, path, data, request_options, cache_tags=None):
+        # type: (str, str, Optional[Union[dict, list]], Optional[Union[dict, RequestOptions]], Optional[Tuple[str, ...]]) -> dict # noqa: E501
+        """
+        Reads given `cache_tags`, the applications their response
+        describes, go through the read cache when it is enabled.
+        """
+
+        if cache_tags is None or self.read_cache is None or \
+                isinstance(request_options, RequestOptions):
+            return self._read(verb, path, data, request_options)
+
+        key = (verb, path,
+               None if data is None else DataSerializer.serialize(data),
+               None if request_options is None else
+               DataSerializer.serialize(request_options))
+
+        return self.read_cache.get(
+            key, cache_tags,
+            lambda: self._read(verb, path, data, request_options))
+
+    def invalidate(self, *tags):
+        # type: (*str) -> None
+        """
+        Drop the cached reads of the given applications.
+        """
+
+        if self.read_cache is not None:
+            self.read_cache.invalidate(tags)
+
+    def _read(self, verb, path, data, request_options):
         # type: (str, str, Optional[Union[dict, list]], Optional[Union[dict, RequestOptions]]) -> dict # noqa: E501
 
         if request_options is None or isinstance(request_options, dict):
@@ -52,10 +141,39 @@ class Transporter(object):
 
         hosts = self._config.hosts.read()
 
-        return self.request(verb, hosts, path, data, request_options, timeout)
+        return self.request(verb, hosts, path, data, request_options, timeout,
+                            self._config.hedge_reads)
+
+    def pool_stats(self):
+        # type: () -> dict
+
+        return self._requester.stats()
+
+    def close(self):
+        # type: () -> None
 
-    def request(self, verb, hosts, path, data, request_options, timeout):
-        # type: (str, List[Host], str, Optional[Union[dict, list]], RequestOptions, int) -> dict # noqa: E501
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown(wait=False)
+            self._hedge_executor = None
+
+        self._requester.close()
+
+    def _after_fork_child(self):
+        # type: () -> None
+
+        # The hedge threads only exist in the parent.
+        self._hedge_executor = None
+        self._hedge_lock = threading.Lock()
+        self._hedge_busy = 0
+
+    def request(self, verb, hosts, path, data, request_options, timeout,
+                hedged=False):
+        # type: (str, List[Host], str, Optional[Union[dict, list]], RequestOptions, int, bool) -> dict # noqa: E501
+
+        if self.circuits is not None:
+            endpoint = '{}/{}'.format(self._config.app_id, path)
+            if not self.circuits.allow(endpoint):
+                return self._fail_fast(endpoint)
 
         if isinstance(data, dict):
             data.update(request_options.data)
@@ -69,60 +187,451 @@ class Transporter(object):
                                           query_parameters
                                       ))
 
-        request = Request(verb.upper(), request_options.headers, data,
-                          self._config.connect_timeout, timeout)
+        # Copied, the body headers of this request must not leak into the
+        # next ones sent with the same options.
+        headers = dict(request_options.headers)
+        headers.setdefault('Accept',
+                           WireFormat.accept(self._config.wire_format))
+        headers.setdefault('Accept-Encoding', Compression.accept_encoding())
+
+        request = Request(verb.upper(), headers, data,
+                          self._config.connect_timeout, timeout,
+                          self._config.wire_format, self._config.compression,
+                          self._config.compression_threshold, self.metrics,
+                          self._config.stream_threshold,
+                          request_options.timeouts.get('deadline'))
+
+        if hedged:
+            return self.hedged_retry(hosts, request, relative_url)
 
         return self.retry(hosts, request, relative_url)
 
     def retry(self, hosts, request, relative_url):
         # type: (List[Host], Request, str) -> dict
-        print('----- REQUEST -----')
-        print('ENDPOINT: ', relative_url)
-        print('ACTION: ', request.verb)        
-        print('DATA: ', request.data)
-        print('------------------')
-        print(' ')
-        return request # TODO a supprimer quand y aura un serveur
+        """
+        Try the hosts in turn until one answers. Retries wait a jittered
+        exponential backoff, and are given up past the deadline of the
+        request or when the retry budget is spent.
+        """
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('%s %s data=%s headers=%s', request.verb,
+                         relative_url, truncate(request.data),
+                         redact(request.headers))
+
+        started_request = time.time()
+        hosts = self._retry_strategy.valid_hosts(hosts)
+        timeouts = (request.connect_timeout, request.timeout)
+        if self._retry_budget is not None and hosts:
+            self._retry_budget.call()
+
+        reason = 'no host could be reached' if hosts else CIRCUIT_OPEN
+        for attempt, host in enumerate(hosts):
+            if attempt:
+                if not self._may_retry():
+                    reason = 'retry budget exhausted'
+                    break
+
+                delay = self._backoff(request, attempt, started_request)
+                if delay > 0:
+                    time.sleep(delay)
+
+            if not self._fit_deadline(request, timeouts, started_request,
+                                      len(hosts) - attempt):
+                reason = 'deadline exceeded'
+                break
+
+            request.url = '{}/{}'.format(host.base_url, relative_url)
+
+            started = time.time()
+            response = self._requester.send(request)
 
-        for host in self._retry_strategy.valid_hosts(hosts):
+            latency = time.time() - started
+            decision = self._retry_strategy.decide(host, response, latency)
 
-            request.url = 'https://{}/{}'.format(
-                host.url, relative_url)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('%s %s on %s: %s in %.3fs', request.verb,
+                             relative_url, host.url,
+                             response.status_code or response.error_message,
+                             latency)
 
-            response = self._requester.send(request)
+            if self.metrics is not None:
+                self._observe_attempt(host, response, decision, latency)
+
+            if decision != RetryOutcome.RETRY:
+                if self.metrics is not None:
+                    self._observe_request(request, relative_url, decision,
+                                          started_request)
+
+                return self._result(relative_url, response, decision)
+
+        return self._unreachable(request, relative_url, reason,
+                                 started_request)
+
+    def _unreachable(self, request, relative_url, reason, started_request):
+        # type: (Request, str, str, float) -> None
+
+        endpoint = relative_url.partition('?')[0]
+        if reason == CIRCUIT_OPEN:
+            # Every host is down, nothing was sent.
+            return self._fail_fast(endpoint)
+
+        if self.circuits is not None:
+            self.circuits.record(endpoint, True)
+
+        if self.metrics is not None:
+            self._observe_request(request, relative_url, 'UNREACHABLE',
+                                  started_request)
+
+        logger.warning('%s %s: %s', request.verb, relative_url, reason)
+        raise MonitoringUnreachableHostException(
+            'Unreachable hosts: {}'.format(reason))
+
+    def _fail_fast(self, endpoint):
+        # type: (str) -> None
+
+        if self.metrics is not None:
+            self.metrics.fast_failures.inc((endpoint,))
+
+        raise MonitoringUnreachableHostException(
+            'Unreachable hosts: {}'.format(CIRCUIT_OPEN))
+
+    def _may_retry(self):
+        # type: () -> bool
+
+        return self._retry_budget is None or self._retry_budget.retry()
+
+    def _remaining(self, request, started):
+        # type: (Request, float) -> Optional[float]
+        """
+        Seconds left before the deadline of the request, None without one.
+        """
+
+        if request.deadline is None:
+            return None
+
+        return started + request.deadline - time.time()
+
+    def _backoff(self, request, attempt, started):
+        # type: (Request, int, float) -> float
+        """
+        Seconds to wait before the `attempt`th attempt (full jitter),
+        within the deadline of the request.
+        """
+
+        delay = random.uniform(0, min(
+            self._config.retry_backoff_max,
+            self._config.retry_backoff * 2 ** (attempt - 1)))
+
+        left = self._remaining(request, started)
+
+        return delay if left is None else min(delay, left)
+
+    def _fit_deadline(self, request, timeouts, started, attempts):
+        # type: (Request, Tuple[float, float], float, int) -> bool
+        """
+        Fit the timeouts of the next attempt in what is left of the
+        deadline of the request, shared equally by the `attempts` left.
+        False once the deadline has passed.
+        """
+
+        left = self._remaining(request, started)
+        if left is None:
+            return True
+
+        if left <= 0:
+            return False
+
+        share = left / max(attempts, 1)
+        request.connect_timeout = min(timeouts[0], share)
+        request.timeout = min(timeouts[1], share)
+
+        return True
+
+    def hedged_retry(self, hosts, request, relative_url):
+        # type: (List[Host], Request, str) -> dict
+        """
+        Like `retry`, but when a host has not answered within the hedge
+        delay the request is also sent to the next host, and the first
+        answer wins. The slower attempts are cancelled if not started yet,
+        or left to finish in the background with their answer discarded.
+        Hedges are retries for the retry budget, and every attempt may use
+        what is left of the deadline.
+        Attempts never queue for a hedge worker: while they are all busy,
+        typically with slower attempts waiting out their timeout, an
+        attempt is sent from the calling thread and a hedge is not sent.
+        """
+
+        started_request = time.time()
+        hosts = self._retry_strategy.valid_hosts(hosts)
+        delay = self._hedge_delay()
+        executor = self._hedge_pool()
+        # Encode once, before the attempts copy the request.
+        request.encode()
+        timeouts = (request.connect_timeout, request.timeout)
+        if self._retry_budget is not None and hosts:
+            self._retry_budget.call()
+        pending = set()  # type: set
+
+        def prepare(host):
+            attempt = copy.copy(request)
+            attempt.url = '{}/{}'.format(host.base_url, relative_url)
+            self._fit_deadline(attempt, timeouts, started_request, 1)
+
+            return attempt
+
+        def launch(host, hedge=False):
+            if self._hedge_acquire():
+                future = executor.submit(self._attempt, host, prepare(host))
+                # Also called when the attempt is cancelled.
+                future.add_done_callback(self._hedge_release)
+            elif hedge:
+                self._hedge_saturated('hedge_skipped')
+                return False
+            else:
+                self._hedge_saturated('sent_inline')
+                future = futures.Future()
+                future.set_result(self._attempt(host, prepare(host)))
+
+            pending.add(future)
+
+            return True
+
+        remaining = list(hosts)
+        reason = 'no host could be reached' if hosts else CIRCUIT_OPEN
+        try:
+            while remaining or pending:
+                left = self._remaining(request, started_request)
+                if left is not None and left <= 0:
+                    reason = 'deadline exceeded'
+                    break
+
+                if remaining and not pending:
+                    if len(remaining) < len(hosts) and not self._may_retry():
+                        reason = 'retry budget exhausted'
+                        break
+
+                    launch(remaining.pop(0))
+
+                timeout = delay if remaining else None
+                if left is not None:
+                    timeout = left if timeout is None else min(timeout, left)
+
+                done, _ = futures.wait(pending, timeout=timeout,
+                                       return_when=futures.FIRST_COMPLETED)
+
+                if not done:
+                    left = self._remaining(request, started_request)
+                    if left is not None and left <= 0:
+                        continue
+
+                    if delay is not None and remaining:
+                        if self._may_retry() and launch(remaining[0], True):
+                            # Nobody answered in time, hedged on the next
+                            # host.
+                            remaining.pop(0)
+                        else:
+                            # Out of budget or of workers, wait for the
+                            # attempts in flight.
+                            delay = None
+                    continue
+
+                for future in done:
+                    pending.discard(future)
+                    response, decision, latency = future.result()
+
+                    if decision == RetryOutcome.SUCCESS:
+                        self._read_latencies.append(latency)
+
+                    if decision != RetryOutcome.RETRY:
+                        if self.metrics is not None:
+                            self._observe_request(request, relative_url,
+                                                  decision, started_request)
+
+                        return self._result(relative_url, response, decision)
+        finally:
+            for future in pending:
+                future.cancel()
+
+        return self._unreachable(request, relative_url, reason,
+                                 started_request)
+
+    def _attempt(self, host, request):
+        # type: (Host, Request) -> tuple
+
+        started = time.time()
+        response = self._requester.send(request)
+        latency = time.time() - started
+        decision = self._retry_strategy.decide(host, response, latency)
+
+        if self.metrics is not None:
+            self._observe_attempt(host, response, decision, latency)
+
+        return response, decision, latency
+
+    def _observe_attempt(self, host, response, decision, latency):
+        # type: (Host, Response, str, float) -> None
+
+        metrics = self.metrics
+        metrics.attempt_duration.observe(latency, (host.url,))
+        if decision == RetryOutcome.RETRY:
+            metrics.retries.inc((host.url,))
+
+        if metrics.hooks:
+            metrics.emit('attempt', host=host.url,
+                         status=response.status_code, outcome=decision,
+                         latency=latency)
+
+    def _observe_request(self, request, relative_url, outcome, started):
+        # type: (Request, str, str, float) -> None
+
+        metrics = self.metrics
+        latency = time.time() - started
+        # The query string is not part of the endpoint.
+        endpoint = relative_url.partition('?')[0]
+
+        metrics.request_duration.observe(latency,
+                                         (request.verb, endpoint, outcome))
+
+        if metrics.hooks:
+            metrics.emit('request', verb=request.verb, endpoint=endpoint,
+                         outcome=outcome, latency=latency)
+
+    def _hedge_delay(self):
+        # type: () -> float
+
+        latencies = sorted(self._read_latencies)
+        if len(latencies) < 20:
+            return self._config.hedge_delay
+
+        index = int(len(latencies) * self._config.hedge_percentile / 100.0)
+
+        return latencies[min(index, len(latencies) - 1)]
+
+    def _hedge_acquire(self):
+        # type: () -> bool
+        """
+        Reserve a hedge worker, False when they are all busy.
+        """
+
+        with self._hedge_lock:
+            if self._hedge_busy >= self._config.hedge_workers:
+                return False
+
+            self._hedge_busy += 1
+
+            return True
+
+    def _hedge_release(self, future=None):
+        # type: (Optional[futures.Future]) -> None
+
+        with self._hedge_lock:
+            self._hedge_busy -= 1
+
+    def _hedge_saturated(self, action):
+        # type: (str) -> None
+
+        if self.metrics is not None:
+            self.metrics.hedge_saturated.inc((action,))
+
+    def _hedge_pool(self):
+        # type: () -> futures.Executor
+
+        with self._hedge_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = futures.ThreadPoolExecutor(
+                    max_workers=self._config.hedge_workers)
+
+            return self._hedge_executor
 
-            decision = self._retry_strategy.decide(host, response)
+    def _result(self, relative_url, response, decision):
+        # type: (str, Response, str) -> dict
 
-            if decision == RetryOutcome.SUCCESS:
-                return response.content if response.content is not None else {}
-            elif decision == RetryOutcome.FAIL:
-                content = response.error_message
-                if response.content and 'message' in response.content:
-                    content = response.content['message']
+        if self.circuits is not None:
+            # A host answered, the endpoint is reachable.
+            self.circuits.record(relative_url.partition('?')[0], False)
 
-                raise RequestException(content, response.status_code)
+        if decision == RetryOutcome.SUCCESS:
+            return response.content if response.content is not None else {}
 
-        raise MonitoringUnreachableHostException('Unreachable hosts')
+        content = response.error_message
+        if response.content and 'message' in response.content:
+            content = response.content['message']
+
+        raise RequestException(content, response.status_code)
 
 
 class Request(object):
-    def __init__(self, verb, headers, data, connect_timeout, timeout):
-        # type: (str, dict, Optional[Union[dict, list]], int, int) -> None
+    def __init__(self, verb, headers, data, connect_timeout, timeout,
+                 wire_format=WireFormat.JSON, compression=None,
+                 compression_threshold=0, metrics=None, stream_threshold=None,
+                 deadline=None):
+        # type: (str, dict, Optional[Union[dict, list]], int, int, str, Optional[str], int, Optional[MetricsRegistry], Optional[int], Optional[float]) -> None  # noqa: E501
 
         self.verb = verb
         self.data = data
-        self.data_as_string = '' if data is None else DataSerializer.serialize(
-            data
-        )
+        self._data_as_string = None  # type: Optional[str]
+        self._body = None  # type: Optional[Union[bytes, ChunkedBody]]
+        self.wire_format = wire_format
+        self.compression = compression
+        self.compression_threshold = compression_threshold
+        self.stream_threshold = stream_threshold
         self.headers = headers
         self.connect_timeout = connect_timeout
         self.timeout = timeout
+        # In seconds, over all the attempts
+        self.deadline = deadline
         self.url = ''
+        self.metrics = metrics
+
+    @property
+    def data_as_string(self):
+        # type: () -> str
+
+        # Serialized on first use, a request dropped before being sent
+        # never pays for it.
+        if self._data_as_string is None:
+            self._data_as_string = '' if self.data is None else \
+                DataSerializer.serialize(self.data)
+
+        return self._data_as_string
+
+    @property
+    def body(self):
+        # type: () -> Union[bytes, ChunkedBody]
+
+        # Encoded on first use, like `data_as_string`; also sets the
+        # Content-Type and Content-Encoding headers of the body. Bodies
+        # past the stream threshold are a `ChunkedBody`, encoded while
+        # sent.
+        if self._body is None:
+            started = time.time()
+            if self.data is None:
+                self._body = b''
+            else:
+                self._body, headers = encode_body(
+                    self.data, self.wire_format, self.compression,
+                    self.compression_threshold, self.stream_threshold)
+                self.headers.update(headers)
+
+            if self.metrics is not None:
+                self.metrics.serialization_duration.observe(
+                    time.time() - started, (self.wire_format,))
+
+        return self._body
+
+    def encode(self):
+        # type: () -> Union[bytes, ChunkedBody]
+        """
+        Encode the body now rather than on first send, see `body`.
+        """
+
+        return self.body
 
     def __eq__(self, other):
         # type: (object) -> bool
 
-        return self.__dict__ == other.__dict__
+        return self.data_as_string == other.data_as_string and \
+            self.__dict__ == other.__dict__
 
 
 class Response(object):
@@ -139,40 +648,112 @@ class Response(object):
 
 
 class RetryStrategy(object):
+    LEAST_LATENCY = 'least_latency'
+    POWER_OF_TWO = 'power_of_two'
+
+    def __init__(self, selection=LEAST_LATENCY, metrics=None,
+                 failure_threshold=1):
+        # type: (str, Optional[MetricsRegistry], int) -> None
+
+        self._selection = selection
+        self._metrics = metrics
+        self._failure_threshold = failure_threshold
 
     def valid_hosts(self, hosts):
         # type: (list) -> list
-
+        """
+        Hosts to try, in order. A host marked down is skipped until its
+        backoff has passed, then half-open: the next call probes it first,
+        and the others keep skipping it until the probe answers, or for
+        another backoff when the probe is never sent.
+        """
+
+        now = self._now()
+        probes = []
         for host in hosts:
-            if not host.up and self._now() - host.last_use > Host.TTL:
-                host.up = True
-
-        return [host for host in hosts if host.up]
+            if not host.up and now >= host.down_until:
+                with host.lock:
+                    # Checked again, another thread may be probing it.
+                    probe = not host.up and now >= host.down_until
+                    if probe:
+                        host.down_until = now + host.backoff(
+                            self._failure_threshold)
+                        # Its averages describe the outage, measure it
+                        # afresh.
+                        host.latency = None
+                        host.error_rate = 0.0
+
+                if probe:
+                    probes.append(host)
+                    if self._metrics is not None:
+                        self._transition(host, 'half_open')
+
+        return probes + self._order([host for host in hosts if host.up])
+
+    def _order(self, hosts):
+        # type: (List[Host]) -> List[Host]
+
+        if len(hosts) < 2:
+            return hosts
+
+        # Unmeasured hosts score as the best one, so that they get probed
+        # and priority decides between equals.
+        measured = [host.latency for host in hosts if host.latency is not None]
+        default = min(measured) if measured else 0.0
+
+        ordered = sorted(hosts,
+                         key=lambda h: (h.score(default), -(h.priority or 0)))
+
+        if self._selection == self.POWER_OF_TWO:
+            first, second = random.sample(range(len(ordered)), 2)
+            best = ordered.pop(min(first, second))
+            ordered.insert(0, best)
+
+        return ordered
 
     def _now(self):
         # type: () -> float
 
         return time.time()
 
-    def decide(self, host, response):
-        # type: (Host, Response) -> str
+    def decide(self, host, response, latency=0.0):
+        # type: (Host, Response, float) -> str
 
-        host.last_use = time.time()
+        failed = response.is_timed_out_error or self._is_retryable(response)
 
-        if response.is_timed_out_error:
-            host.retry_count += 1
+        with host.lock:
+            host.last_use = self._now()
+            was_up = host.up
 
-            return RetryOutcome.RETRY
-        elif self._is_retryable(response):
-            host.up = False
+            if response.is_timed_out_error:
+                host.retry_count += 1
+
+            host.observe(latency, failed)
+            if failed:
+                host.mark_down(host.last_use, self._failure_threshold)
+            else:
+                host.mark_up()
+            is_up = host.up
+
+        if was_up != is_up and self._metrics is not None:
+            self._transition(host, 'down' if failed else 'up')
 
+        if failed:
             return RetryOutcome.RETRY
-        elif response.status_code is not None and self._is_success(response):
+
+        if response.status_code is not None and self._is_success(response):
 
             return RetryOutcome.SUCCESS
 
         return RetryOutcome.FAIL
 
+    def _transition(self, host, state):
+        # type: (Host, str) -> None
+
+        self._metrics.host_transitions.inc((host.url, state))
+        if self._metrics.hooks:
+            self._metrics.emit('host_' + state, host=host.url)
+
     def _is_success(self, response):
         # type: (Response) -> bool
 
@@ -190,6 +771,221 @@ class RetryStrategy(object):
                        response.status_code // 100) != 4
 
 
+class RetryBudget(object):
+    """
+    Bounds retries to `minimum` plus a share `ratio` of the calls made
+    over the last `WINDOW` seconds, so that retries do not multiply the
+    load of an overloaded backend. Counted in one-second buckets.
+    """
+
+    WINDOW = 10
+
+    def __init__(self, ratio=0.2, minimum=10):
+        # type: (float, int) -> None
+
+        self._ratio = ratio
+        self._minimum = minimum
+        self._calls = [0] * self.WINDOW
+        self._retries = [0] * self.WINDOW
+        self._second = int(self._now())
+        self._lock = threading.Lock()
+
+        forking.register(self)
+
+    def call(self):
+        # type: () -> None
+
+        with self._lock:
+            self._calls[self._advance()] += 1
+
+    def retry(self):
+        # type: () -> bool
+        """
+        Whether a retry is allowed, which is then counted.
+        """
+
+        with self._lock:
+            bucket = self._advance()
+            if sum(self._retries) >= \
+                    self._minimum + self._ratio * sum(self._calls):
+                return False
+
+            self._retries[bucket] += 1
+
+            return True
+
+    def _advance(self):
+        # type: () -> int
+
+        second = int(self._now())
+        if second != self._second:
+            # Empty the buckets of the seconds gone by.
+            for passed in range(max(self._second + 1,
+                                    second - self.WINDOW + 1), second + 1):
+                self._calls[passed % self.WINDOW] = 0
+                self._retries[passed % self.WINDOW] = 0
+
+            self._second = second
+
+        return second % self.WINDOW
+
+    def _now(self):
+        # type: () -> float
+
+        return time.time()
+
+    def _after_fork_child(self):
+        # type: () -> None
+
+        self._lock = threading.Lock()
+
+
+class CircuitBreakers(object):
+    """
+    Circuit breakers of the endpoints, closed while their calls reach a
+    host. After `failure_threshold` calls in a row found no host, an
+    endpoint is open: its calls fail fast, without touching the network,
+    for `reset_timeout` seconds. It is then half-open: one call probes
+    it, and the others keep failing fast until the probe answers, or for
+    another `reset_timeout` when the probe never does. A probe that finds
+    no host opens it again, for twice as long up to `reset_timeout_max`.
+    Only the endpoints that are failing are tracked.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=1.0,
+                 reset_timeout_max=60.0, metrics=None):
+        # type: (int, float, float, Optional[MetricsRegistry]) -> None
+
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._reset_timeout_max = reset_timeout_max
+        self._metrics = metrics
+
+        self._circuits = {}  # type: Dict[str, _Circuit]
+        self._lock = threading.Lock()
+
+        forking.register(self)
+
+    def allow(self, endpoint):
+        # type: (str) -> bool
+        """
+        Whether a call to `endpoint` may be sent.
+        """
+
+        # Read without lock: closed circuits are not in the dict.
+        if endpoint not in self._circuits:
+            return True
+
+        now = self._now()
+        with self._lock:
+            circuit = self._circuits.get(endpoint)
+            if circuit is None or circuit.state == self.CLOSED:
+                return True
+
+            if now < circuit.retry_at:
+                allowed = False
+            else:
+                circuit.state = self.HALF_OPEN
+                circuit.retry_at = now + circuit.open_for
+                allowed = True
+
+        if allowed:
+            self._transition(endpoint, self.HALF_OPEN)
+
+        return allowed
+
+    def record(self, endpoint, failed):
+        # type: (str, bool) -> None
+        """
+        Outcome of a call to `endpoint`: `failed` when it found no host.
+        """
+
+        if not failed and endpoint not in self._circuits:
+            return
+
+        state = None
+        with self._lock:
+            circuit = self._circuits.get(endpoint)
+
+            if not failed:
+                if circuit is not None:
+                    del self._circuits[endpoint]
+                    if circuit.state != self.CLOSED:
+                        state = self.CLOSED
+            elif circuit is None or circuit.state == self.CLOSED:
+                if circuit is None:
+                    circuit = self._circuits[endpoint] = _Circuit()
+
+                circuit.failures += 1
+                if circuit.failures >= self._failure_threshold:
+                    state = self._open(circuit, self._reset_timeout)
+            elif circuit.state == self.HALF_OPEN:
+                state = self._open(circuit, min(circuit.open_for * 2,
+                                                self._reset_timeout_max))
+            # Failures of calls sent before it opened leave it open.
+
+        if state is not None:
+            if state == self.OPEN:
+                logger.warning('Circuit of %s open', endpoint)
+            elif state == self.CLOSED:
+                logger.info('Circuit of %s closed', endpoint)
+
+            self._transition(endpoint, state)
+
+    def state(self, endpoint):
+        # type: (str) -> str
+
+        circuit = self._circuits.get(endpoint)
+
+        return self.CLOSED if circuit is None else circuit.state
+
+    def _open(self, circuit, open_for):
+        # type: (_Circuit, float) -> str
+
+        circuit.state = self.OPEN
+        circuit.open_for = open_for
+        circuit.retry_at = self._now() + open_for
+
+        return self.OPEN
+
+    def _transition(self, endpoint, state):
+        # type: (str, str) -> None
+
+        metrics = self._metrics
+        if metrics is None:
+            return
+
+        metrics.circuit_transitions.inc((endpoint, state))
+        if metrics.hooks:
+            metrics.emit('circuit_' + state, endpoint=endpoint)
+
+    def _now(self):
+        # type: () -> float
+
+        return time.time()
+
+    def _after_fork_child(self):
+        # type: () -> None
+
+        self._lock = threading.Lock()
+
+
+class _Circuit(object):
+    def __init__(self):
+        # type: () -> None
+
+        self.state = CircuitBreakers.CLOSED
+        # Consecutive calls that found no host, while closed
+        self.failures = 0
+        # In seconds
+        self.open_for = 0.0
+        self.retry_at = 0.0
+
+
 class RetryOutcome(object):
     SUCCESS = 'SUCCESS'
     RETRY = 'RETRY'
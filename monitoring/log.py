@@ -0,0 +1,106 @@
+import logging
+
+try:
+    import reprlib
+except ImportError:  # Python 2
+    import repr as reprlib  # type: ignore
+
+from typing import Any, Dict, Optional
+
+# Parent logger of every module of the client, silent unless the
+# application configures logging.
+logger = logging.getLogger('monitoring')
+logger.addHandler(logging.NullHandler())
+
+# Characters of a payload kept in log messages
+MAX_PAYLOAD = 1024
+
+REDACTED_HEADERS = ('x-validandgo-api-key',)
+
+
+class truncate(object):
+    """
+    Payload argument of a log call, only converted to text, and cut to
+    `limit` characters, if the message is actually emitted. Containers
+    and strings are cut while the text is built, a large payload is never
+    converted whole.
+    >>> logger.debug('data=%s', truncate(data))
+    """
+
+    __slots__ = ('value', 'limit')
+
+    def __init__(self, value, limit=MAX_PAYLOAD):
+        # type: (Any, int) -> None
+
+        self.value = value
+        self.limit = limit
+
+    def __str__(self):
+        # type: () -> str
+
+        if isinstance(self.value, str):
+            text = self.value
+        else:
+            text = _CappedRepr(self.limit).repr(self.value)
+
+        if len(text) <= self.limit:
+            return text
+
+        return '{}...'.format(text[:self.limit])
+
+
+class _CappedRepr(reprlib.Repr):
+    """
+    `repr` of about `limit` characters: once they are spent, the items
+    left are written as '...' without being converted.
+    """
+
+    def __init__(self, limit):
+        # type: (int) -> None
+
+        reprlib.Repr.__init__(self)
+
+        # Items of a container take 3 characters at least, as in '1, '.
+        items = max(limit // 3, 1)
+
+        self.maxlevel = 8
+        self.maxstring = self.maxother = self.maxlong = limit
+        self.maxdict = self.maxlist = self.maxtuple = items
+        self.maxset = self.maxfrozenset = self.maxdeque = items
+        self.maxarray = items
+        self.budget = limit
+
+    def repr1(self, x, level):
+        # type: (Any, int) -> str
+
+        if self.budget <= 0:
+            return '...'
+
+        text = reprlib.Repr.repr1(self, x, level)
+        self.budget -= len(text)
+
+        return text
+
+
+class redact(object):
+    """
+    Headers argument of a log call, with the API key masked.
+    """
+
+    __slots__ = ('headers',)
+
+    def __init__(self, headers):
+        # type: (Optional[Dict[str, str]]) -> None
+
+        self.headers = headers
+
+    def __str__(self):
+        # type: () -> str
+
+        if not self.headers:
+            return '{}'
+
+        return repr(dict(
+            (name, '***' if name.lower() in REDACTED_HEADERS else value)
+            for name, value in self.headers.items()
+        ))
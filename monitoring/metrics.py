@@ -0,0 +1,401 @@
+import bisect
+import collections
+import threading
+
+from typing import Any, Callable, Dict, List, Tuple
+
+from monitoring import forking
+
+# Label values, in the order of the metric's label names
+Labels = Tuple[str, ...]
+
+
+class Metric(object):
+    """
+    Updates are appended to a deque, which is atomic and lock-free, and
+    folded into the series values at snapshot time, or every `FOLD_SIZE`
+    updates.
+    """
+
+    TYPE = 'untyped'
+    FOLD_SIZE = 4096
+
+    def __init__(self, name, documentation, labelnames=()):
+        # type: (str, str, Tuple[str, ...]) -> None
+
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+        self._lock = threading.Lock()
+        self._values = {}  # type: Dict[Labels, Any]
+        self._pending = collections.deque()  # type: collections.deque
+
+    def samples(self):
+        # type: () -> List[Tuple[str, Dict[str, str], float]]
+        """
+        (name, labels, value) of every series of the metric.
+        """
+
+        with self._lock:
+            self._fold()
+            values = list(self._values.items())
+
+        return [(self.name, self._labels(labels), float(value))
+                for labels, value in values]
+
+    def _fold_pending(self):
+        # type: () -> None
+
+        with self._lock:
+            self._fold()
+
+    def _fold(self):
+        # type: () -> None
+
+        # Appends racing with the fold are left for the next one.
+        popleft = self._pending.popleft
+        values = self._values
+
+        for _ in range(len(self._pending)):
+            labels, value = popleft()
+            values[labels] = values.get(labels, 0) + value
+
+    def _after_fork_child(self):
+        # type: () -> None
+
+        # Called by the registry; the lock may have been held by another
+        # thread of the parent.
+        self._lock = threading.Lock()
+
+    def _labels(self, labels):
+        # type: (Labels) -> Dict[str, str]
+
+        return dict(zip(self.labelnames, labels))
+
+
+class Counter(Metric):
+    TYPE = 'counter'
+
+    def inc(self, labels=(), amount=1):
+        # type: (Labels, float) -> None
+
+        pending = self._pending
+        pending.append((labels, amount))
+        if len(pending) >= self.FOLD_SIZE:
+            self._fold_pending()
+
+
+class Gauge(Metric):
+    TYPE = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        # type: (str, str, Tuple[str, ...]) -> None
+
+        super(Gauge, self).__init__(name, documentation, labelnames)
+        self._functions = {}  # type: Dict[Labels, Callable[[], float]]
+
+    def set(self, value, labels=()):
+        # type: (float, Labels) -> None
+
+        pending = self._pending
+        pending.append((labels, value))
+        if len(pending) >= self.FOLD_SIZE:
+            self._fold_pending()
+
+    def set_function(self, function, labels=()):
+        # type: (Callable[[], float], Labels) -> None
+        """
+        Read the value from `function` at snapshot time, as for queue
+        depths, which would cost a call per record otherwise.
+        """
+
+        with self._lock:
+            self._functions[labels] = function
+
+    def samples(self):
+        # type: () -> List[Tuple[str, Dict[str, str], float]]
+
+        with self._lock:
+            functions = list(self._functions.items())
+
+        samples = super(Gauge, self).samples()
+        for labels, function in functions:
+            try:
+                value = float(function())
+            except Exception:
+                continue
+
+            samples.append((self.name, self._labels(labels), value))
+
+        return samples
+
+    def _fold(self):
+        # type: () -> None
+
+        popleft = self._pending.popleft
+        for _ in range(len(self._pending)):
+            labels, value = popleft()
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    TYPE = 'histogram'
+
+    # In seconds
+    DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                       0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        # type: (str, str, Tuple[str, ...], Tuple[float, ...]) -> None
+
+        super(Histogram, self).__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, labels=()):
+        # type: (float, Labels) -> None
+
+        pending = self._pending
+        pending.append((labels, value))
+        if len(pending) >= self.FOLD_SIZE:
+            self._fold_pending()
+
+    def samples(self):
+        # type: () -> List[Tuple[str, Dict[str, str], float]]
+
+        with self._lock:
+            self._fold()
+            values = [(labels, list(counts), total)
+                      for labels, (counts, total) in self._values.items()]
+
+        samples = []
+        for labels, counts, total in values:
+            names = self._labels(labels)
+            cumulative = 0
+
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                bucket = dict(names)
+                bucket['le'] = _format_value(bound)
+                samples.append((self.name + '_bucket', bucket, cumulative))
+
+            samples.append((self.name + '_sum', names, total))
+            samples.append((self.name + '_count', names, cumulative))
+
+        return samples
+
+    def _fold(self):
+        # type: () -> None
+
+        popleft = self._pending.popleft
+        values = self._values
+        buckets = self.buckets
+        bisect_left = bisect.bisect_left
+
+        for _ in range(len(self._pending)):
+            labels, value = popleft()
+
+            state = values.get(labels)
+            if state is None:
+                # Per-bucket counts (the last one is +Inf), then the sum.
+                state = values[labels] = [[0] * (len(buckets) + 1), 0.0]
+
+            state[0][bisect_left(buckets, value)] += 1
+            state[1] += value
+
+
+class MetricsRegistry(object):
+    """
+    In-process metrics of the client, and hooks called on its events.
+    Set it on the configuration to instrument the transport layer:
+    >>> config.metrics = MetricsRegistry()
+    >>> config.metrics.add_hook(lambda event, fields: ...)
+    >>> print(config.metrics.prometheus())
+    Events are 'request' (verb, endpoint, outcome, latency), 'attempt'
+    (host, status, outcome, latency), 'host_down' / 'host_half_open' /
+    'host_up' (host) and 'circuit_open' / 'circuit_half_open' /
+    'circuit_closed' (endpoint).
+    """
+
+    # In seconds
+    SERIALIZATION_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005,
+                             0.01, 0.05, 0.1)
+
+    def __init__(self):
+        # type: () -> None
+
+        self._metrics = []  # type: List[Metric]
+        self._lock = threading.Lock()
+        # Replaced, never mutated: read without lock, and empty when no
+        # hook is set, which the instrumented code checks before building
+        # event fields.
+        self.hooks = []  # type: List[Callable[[str, Dict[str, Any]], None]]
+
+        self.request_duration = self.histogram(
+            'monitoring_request_duration_seconds',
+            'Duration of client requests by outcome, retries included',
+            ('verb', 'endpoint', 'outcome'))
+        self.attempt_duration = self.histogram(
+            'monitoring_attempt_duration_seconds',
+            'Duration of single attempts on a host', ('host',))
+        self.retries = self.counter(
+            'monitoring_retries_total',
+            'Attempts failed over to the next host', ('host',))
+        self.sent_bytes = self.counter(
+            'monitoring_sent_bytes_total', 'Request body bytes sent',
+            ('host',))
+        self.received_bytes = self.counter(
+            'monitoring_received_bytes_total',
+            'Response body bytes received', ('host',))
+        self.serialization_duration = self.histogram(
+            'monitoring_serialization_seconds',
+            'Time spent encoding request bodies', ('wire_format',),
+            self.SERIALIZATION_BUCKETS)
+        self.host_transitions = self.counter(
+            'monitoring_host_transitions_total',
+            'Hosts marked down, probed or back up', ('host', 'state'))
+        self.circuit_transitions = self.counter(
+            'monitoring_circuit_transitions_total',
+            'Circuit breaker state changes of the endpoints',
+            ('endpoint', 'state'))
+        self.fast_failures = self.counter(
+            'monitoring_fast_failures_total',
+            'Calls failed fast by an open circuit, without a request',
+            ('endpoint',))
+        self.hedge_saturated = self.counter(
+            'monitoring_hedge_saturated_total',
+            'Hedged read attempts sent inline, or hedges not sent, while '
+            'every hedge worker was busy', ('action',))
+        self.queue_depth = self.gauge(
+            'monitoring_queue_depth', 'Records waiting to be sent',
+            ('queue',))
+        self.spool_bytes = self.gauge(
+            'monitoring_spool_bytes', 'Bytes waiting in the disk spool')
+
+        forking.register(self)
+
+    def counter(self, name, documentation, labelnames=()):
+        # type: (str, str, Tuple[str, ...]) -> Counter
+
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        # type: (str, str, Tuple[str, ...]) -> Gauge
+
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(),
+                  buckets=Histogram.DEFAULT_BUCKETS):
+        # type: (str, str, Tuple[str, ...], Tuple[float, ...]) -> Histogram
+
+        return self._register(
+            Histogram(name, documentation, labelnames, buckets))
+
+    def add_hook(self, hook):
+        # type: (Callable[[str, Dict[str, Any]], None]) -> None
+
+        with self._lock:
+            self.hooks = self.hooks + [hook]
+
+    def remove_hook(self, hook):
+        # type: (Callable[[str, Dict[str, Any]], None]) -> None
+
+        with self._lock:
+            self.hooks = [h for h in self.hooks if h is not hook]
+
+    def emit(self, event, **fields):
+        # type: (str, **Any) -> None
+
+        for hook in self.hooks:
+            try:
+                hook(event, fields)
+            except Exception:
+                pass
+
+    def snapshot(self):
+        # type: () -> Dict[str, List[Tuple[Dict[str, str], float]]]
+        """
+        Current value of every series, by sample name.
+        """
+
+        snapshot = {}  # type: Dict[str, List[Tuple[Dict[str, str], float]]]
+        for metric in self._all():
+            for name, labels, value in metric.samples():
+                snapshot.setdefault(name, []).append((labels, value))
+
+        return snapshot
+
+    def prometheus(self):
+        # type: () -> str
+        """
+        Snapshot in the Prometheus text exposition format.
+        """
+
+        lines = []
+        for metric in self._all():
+            lines.append('# HELP {} {}'.format(
+                metric.name, metric.documentation.replace('\n', ' ')))
+            lines.append('# TYPE {} {}'.format(metric.name, metric.TYPE))
+
+            for name, labels, value in metric.samples():
+                lines.append('{}{} {}'.format(name, _format_labels(labels),
+                                              _format_value(value)))
+
+        return '\n'.join(lines) + '\n'
+
+    def _after_fork_child(self):
+        # type: () -> None
+
+        self._lock = threading.Lock()
+        for metric in self._metrics:
+            metric._after_fork_child()
+
+    def _all(self):
+        # type: () -> List[Metric]
+
+        with self._lock:
+            return list(self._metrics)
+
+    def _register(self, metric):
+        # type: (Any) -> Any
+
+        with self._lock:
+            for existing in self._metrics:
+                if existing.name == metric.name:
+                    return existing
+
+            self._metrics.append(metric)
+
+        return metric
+
+
+def _format_labels(labels):
+    # type: (Dict[str, str]) -> str
+
+    if not labels:
+        return ''
+
+    return '{' + ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\')
+                         .replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in sorted(labels.items())
+    ) + '}'
+
+
+def _format_value(value):
+    # type: (float) -> str
+
+    if value != value:
+        return 'NaN'
+
+    if value == float('inf'):
+        return '+Inf'
+
+    if value == float('-inf'):
+        return '-Inf'
+
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+
+    return repr(float(value))
@@ -0,0 +1,135 @@
+import copy
+
+from concurrent import futures
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+from monitoring.http.request_options import RequestOptions
+
+
+def paginate(fetch, items_key, page_size=100, prefetch=True):
+    # type: (Callable[[Dict[str, Any]], Any], str, int, bool) -> Iterator[Any]
+    """
+    Iterate over the items of a paginated read, one page in memory at a
+    time. `fetch(params)` reads the page given its paging parameters:
+    `page` and `hitsPerPage`, or the `cursor` of the previous page when the
+    API returns one. With `prefetch`, the next page is read in the
+    background while the current one is consumed. Iteration stops on a
+    page that repeats the previous one, from an endpoint ignoring the
+    paging parameters.
+    """
+
+    executor = futures.ThreadPoolExecutor(max_workers=1) if prefetch \
+        else None
+    pending = None  # type: Optional[futures.Future]
+    previous = None  # type: Optional[tuple]
+
+    try:
+        params = {'page': 0, 'hitsPerPage': page_size}  # type: Optional[Dict[str, Any]]  # noqa: E501
+        response = fetch(params)
+
+        while True:
+            items = page_items(response, items_key)
+            key = page_key(items)
+            if previous is not None and key == previous:
+                return
+            previous = key
+
+            params = next_page(response, params, len(items), page_size)
+
+            if params is not None and executor is not None:
+                pending = executor.submit(fetch, params)
+
+            for item in items:
+                yield item
+
+            # Released before the next page arrives.
+            items = response = None
+
+            if params is None:
+                return
+
+            if pending is not None:
+                response, pending = pending.result(), None
+            else:
+                response = fetch(params)
+    finally:
+        if pending is not None:
+            pending.cancel()
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+def page_items(response, items_key):
+    # type: (Any, str) -> List[Any]
+
+    if isinstance(response, list):
+        return response
+
+    if not isinstance(response, dict):
+        return []
+
+    items = response.get(items_key)
+    if items is None:
+        items = response.get('hits')
+
+    return items or []
+
+
+def page_key(items):
+    # type: (List[Any]) -> Optional[tuple]
+    """
+    First and last items of a page, equal for a repeated page.
+    """
+
+    return (items[0], items[-1]) if items else None
+
+
+def next_page(response, params, count, page_size):
+    # type: (Any, Dict[str, Any], int, int) -> Optional[Dict[str, Any]]
+    """
+    Paging parameters of the page after `response`, None after the last.
+    """
+
+    if count > page_size:
+        # Everything came at once, the endpoint does not paginate.
+        return None
+
+    if isinstance(response, dict) and response.get('cursor'):
+        if response['cursor'] == params.get('cursor'):
+            return None
+
+        return {'cursor': response['cursor'], 'hitsPerPage': page_size}
+
+    if 'cursor' in params:
+        return None
+
+    page = params.get('page', 0)
+
+    if isinstance(response, dict) and 'nbPages' in response:
+        page = response.get('page', page)
+        return {'page': page + 1, 'hitsPerPage': page_size} \
+            if page + 1 < response['nbPages'] else None
+
+    if count < page_size:
+        return None
+
+    return {'page': page + 1, 'hitsPerPage': page_size}
+
+
+def page_options(request_options, params):
+    # type: (Optional[Union[dict, RequestOptions]], Dict[str, Any]) -> Union[dict, RequestOptions]  # noqa: E501
+    """
+    `request_options` with the paging parameters added, as query
+    parameters of the GET.
+    """
+
+    if isinstance(request_options, RequestOptions):
+        options = copy.copy(request_options)
+        options.data = dict(request_options.data, **params)
+
+        return options
+
+    options = dict(request_options or {})
+    options.update(params)
+
+    return options
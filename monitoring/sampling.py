@@ -0,0 +1,172 @@
+import abc
+import random
+import threading
+import time
+import zlib
+
+from typing import Dict, Optional, Union
+
+from monitoring import forking
+
+# `abc.ABC`, which Python 2 lacks; a `__metaclass__` attribute is ignored
+# by Python 3.
+_ABC = abc.ABCMeta('ABC', (object,), {})
+
+
+class Sampler(_ABC):
+    """
+    Decides which monitoring sessions are sent. Dropped sessions skip
+    serialization and I/O; the counters and the sampling rate travel with
+    the sent records so that the server can re-weight its statistics.
+    A sampler can be shared by any number of sessions and threads.
+    """
+
+    def __init__(self):
+        # type: () -> None
+
+        self._lock = threading.Lock()
+        self.sampled = 0
+        self.dropped = 0
+
+        forking.register(self)
+
+    def sample(self, key=None):
+        # type: (Optional[Union[str, bytes]]) -> bool
+
+        with self._lock:
+            keep = self._decide(key)
+            if keep:
+                self.sampled += 1
+            else:
+                self.dropped += 1
+
+        return keep
+
+    def rate(self):
+        # type: () -> float
+        """
+        Probability for a session to be sent.
+        """
+
+        with self._lock:
+            return self._rate_locked()
+
+    def stats(self):
+        # type: () -> Dict[str, float]
+
+        # Read at once, the rate matches the counts.
+        with self._lock:
+            return {
+                'rate': self._rate_locked(),
+                'sampled': self.sampled,
+                'dropped': self.dropped,
+            }
+
+    def _after_fork_child(self):
+        # type: () -> None
+
+        self._lock = threading.Lock()
+
+    def _rate_locked(self):
+        # type: () -> float
+        """
+        Probability for a session to be sent, called under the lock.
+        """
+
+        total = self.sampled + self.dropped
+
+        return float(self.sampled) / total if total else 1.0
+
+    @abc.abstractmethod
+    def _decide(self, key):
+        # type: (Optional[Union[str, bytes]]) -> bool
+        """
+        Whether to send the session, called under the lock.
+        """
+
+        pass  # pragma: no cover
+
+
+class FixedRateSampler(Sampler):
+    """
+    Sends each session with probability `rate`.
+    >>> client.monitoring_session('app', 'model', FixedRateSampler(0.01))
+    """
+
+    def __init__(self, rate):
+        # type: (float) -> None
+
+        super(FixedRateSampler, self).__init__()
+        self._rate = float(rate)
+        self._random = random.Random()
+
+    def _rate_locked(self):
+        # type: () -> float
+
+        return self._rate
+
+    def _decide(self, key):
+        # type: (Optional[Union[str, bytes]]) -> bool
+
+        return self._random.random() < self._rate
+
+
+class TokenBucketSampler(Sampler):
+    """
+    Sends at most `per_second` sessions per second on average, with bursts
+    of up to `burst` sessions.
+    """
+
+    def __init__(self, per_second, burst=None):
+        # type: (float, Optional[float]) -> None
+
+        super(TokenBucketSampler, self).__init__()
+        self._per_second = float(per_second)
+        self._burst = float(per_second if burst is None else burst)
+        self._tokens = self._burst
+        self._last = time.time()
+
+    def _decide(self, key):
+        # type: (Optional[Union[str, bytes]]) -> bool
+
+        now = time.time()
+        self._tokens = min(self._burst,
+                           self._tokens + (now - self._last) * self._per_second)
+        self._last = now
+
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return True
+
+        return False
+
+
+class HashSampler(Sampler):
+    """
+    Deterministic sampling: the same key is always kept or always dropped,
+    in this process and any other. The key is the session `query_id`
+    unless a user key is given to `Session.start()`.
+    """
+
+    def __init__(self, rate):
+        # type: (float) -> None
+
+        super(HashSampler, self).__init__()
+        self._rate = float(rate)
+        self._threshold = int(self._rate * 0x100000000)
+
+    def _rate_locked(self):
+        # type: () -> float
+
+        return self._rate
+
+    def _decide(self, key):
+        # type: (Optional[Union[str, bytes]]) -> bool
+
+        if key is None:
+            return True
+
+        if not isinstance(key, bytes):
+            key = str(key).encode('utf-8')
+
+        return (zlib.crc32(key) & 0xffffffff) < self._threshold
@@ -0,0 +1,324 @@
+import decimal
+import itertools
+import operator
+import threading
+import zlib
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from monitoring import forking
+from monitoring.exceptions import MonitoringException
+from monitoring.http import arrays
+from monitoring.sketches import NUMERIC_TYPES
+
+try:
+    _STRINGS = (str, unicode)  # type: Tuple[type, ...]  # noqa: F821
+    _INTEGERS = (int, long)  # type: Tuple[type, ...]  # noqa: F821
+except NameError:
+    _STRINGS = (str,)
+    _INTEGERS = (int,)
+
+STRING_TYPES = ('str', 'string', 'text', 'category', 'categorical')
+BOOLEAN_TYPES = ('bool', 'boolean')
+
+# Python types accepted per declared type, bool being an int
+_NUMBERS = _INTEGERS + (float, decimal.Decimal)
+_BOOLEANS = (bool,)  # type: Tuple[type, ...]
+
+# NumPy dtype kinds of the arrays and pandas columns accepted per declared
+# type, pandas strings and categories being objects
+_KINDS = {
+    _NUMBERS: frozenset('biuf'),
+    _STRINGS: frozenset('OSU'),
+    _BOOLEANS: frozenset('b'),
+}
+
+SECTIONS = ('data_input', 'data_output', 'metadata')
+
+
+class FieldsEncoder(object):
+    """
+    Encoder of one section of a record, compiled from its field
+    definitions as given to `Application.create`:
+    [{name, label, type, description}]. Rows are dicts of values by field
+    name, or NumPy arrays of the values in field order, sent as lists in
+    the order of the definitions.
+    """
+
+    def __init__(self, fields):
+        # type: (List[Dict[str, Any]]) -> None
+
+        self.names = [str(field['name']) for field in fields]
+        self._known = frozenset(self.names)
+
+        groups = {}  # type: Dict[Tuple[type, ...], List[int]]
+        for index, field in enumerate(fields):
+            declared = str(field.get('type')).lower()
+            if declared in NUMERIC_TYPES:
+                groups.setdefault(_NUMBERS, []).append(index)
+            elif declared in STRING_TYPES:
+                groups.setdefault(_STRINGS, []).append(index)
+            elif declared in BOOLEAN_TYPES:
+                groups.setdefault(_BOOLEANS, []).append(index)
+
+        # (getter of the values, base types, indices) per declared type.
+        self._checks = [
+            (_getter(indices), types, indices)
+            for types, indices in groups.items()
+        ]  # type: List[Tuple[Callable[[List[Any]], Any], Tuple[type, ...], List[int]]]  # noqa: E501
+        # The exact types are checked first, in one set operation per
+        # declared type; subclasses and NumPy scalars go through
+        # `isinstance`.
+        self._exact = [frozenset(types + (type(None),))
+                       for _, types, _ in self._checks]
+        self._types = [field.get('type') for field in fields]
+
+    def row(self, data):
+        # type: (Dict[str, Any]) -> List[Any]
+
+        if not self._known.issuperset(data):
+            raise MonitoringException('Undeclared fields: {}'.format(
+                ', '.join(sorted(str(name) for name in data
+                                 if name not in self._known))))
+
+        values = list(map(data.get, self.names))
+
+        for (getter, types, indices), exact in zip(self._checks, self._exact):
+            checked = getter(values)
+            if exact.issuperset(map(type, checked)):
+                continue
+
+            kinds = _KINDS[types]
+            types = _accepted(types)
+            if not all(map(isinstance, checked, itertools.repeat(types))):
+                for index in indices:
+                    value = values[index]
+                    if not isinstance(value, types) and \
+                            not _array_of(value, kinds):
+                        raise MonitoringException(
+                            'Field {} is declared {}, got {}'.format(
+                                self.names[index], self._types[index],
+                                type(value).__name__))
+
+        return values
+
+    def columns(self, data):
+        # type: (Dict[str, Any]) -> List[Any]
+        """
+        Columns of a batch, in field order. Their values are not checked,
+        which would cost a call per cell.
+        """
+
+        unknown = [name for name in data if name not in self._known]
+        if unknown:
+            raise MonitoringException('Undeclared fields: {}'.format(
+                ', '.join(sorted(str(name) for name in unknown))))
+
+        get = data.get
+
+        return [get(name) for name in self.names]
+
+    def array_row(self, array):
+        # type: (Any) -> List[Any]
+        """
+        Row of a 1-D NumPy array of the values in field order, checked as
+        a dict of them would be.
+        """
+
+        self._check_shape(array, 1)
+
+        return self.row(dict(zip(self.names, array.tolist())))
+
+    def array_columns(self, array):
+        # type: (Any) -> List[Any]
+        """
+        Columns of a batch given as a 2-D NumPy array, one row per
+        prediction and one column per field, in field order.
+        """
+
+        self._check_shape(array, 2)
+
+        return [array[:, index] for index in range(len(self.names))]
+
+    def _check_shape(self, array, ndim):
+        # type: (Any, int) -> None
+
+        if array.ndim != ndim or array.shape[-1] != len(self.names):
+            raise MonitoringException(
+                'Expected {} fields, got an array of shape {}'.format(
+                    len(self.names), array.shape))
+
+
+def _array_of(value, kinds):
+    # type: (Any, frozenset) -> bool
+    """
+    Whether `value` is a NumPy array or a pandas column of one of the
+    dtype `kinds`.
+    """
+
+    dtype = getattr(value, 'dtype', None)
+
+    return dtype is not None and arrays.is_array(value) and \
+        dtype.kind in kinds
+
+
+def _frame_columns(frame):
+    # type: (Any) -> Dict[str, Any]
+
+    return dict((str(name), frame.iloc[:, index])
+                for index, name in enumerate(frame.columns))
+
+
+def _accepted(types):
+    # type: (Tuple[type, ...]) -> Tuple[type, ...]
+    """
+    Types accepted for a declared type of base `types`: None, and the
+    NumPy scalars once the application imported numpy.
+    """
+
+    numpy = arrays.numpy_module()
+    if numpy is not None:
+        if types is _NUMBERS:
+            types += (numpy.number, numpy.bool_)
+        elif types is _BOOLEANS:
+            types += (numpy.bool_,)
+
+    return types + (type(None),)
+
+
+def _getter(indices):
+    # type: (List[int]) -> Callable[[List[Any]], Any]
+
+    if len(indices) == 1:
+        index = indices[0]
+        # itemgetter of one index returns the value, not a tuple.
+        return lambda values: (values[index],)
+
+    return operator.itemgetter(*indices)
+
+
+class RecordEncoder(object):
+    """
+    Encoders of the sections of the records of one application. Sections
+    without definitions are sent as given.
+    """
+
+    def __init__(self, schema):
+        # type: (Dict[str, Optional[List[Dict[str, Any]]]]) -> None
+
+        self._sections = {}  # type: Dict[str, FieldsEncoder]
+        names = []  # type: List[str]
+
+        for section in SECTIONS:
+            fields = schema.get(section)
+            if isinstance(fields, (list, tuple)) and fields and all(
+                    isinstance(field, dict) and 'name' in field
+                    for field in fields):
+                encoder = FieldsEncoder(fields)
+                self._sections[section] = encoder
+                names.append(section + ':' + ','.join(encoder.names))
+
+        # Identifies the field order the rows were encoded with.
+        self.fingerprint = '{:08x}'.format(
+            zlib.crc32('\n'.join(names).encode('utf-8')) & 0xffffffff)
+
+    def row(self, section, data):
+        # type: (str, Any) -> Any
+        """
+        Values of `data` in field order: a dict of values by field name, a
+        pandas DataFrame or a 1-D NumPy array. Arrays and frames are
+        encoded field by field afterwards, see `encode_payload`.
+        """
+
+        encoder = self._sections.get(section)
+        if encoder is None:
+            return data
+
+        if isinstance(data, dict):
+            return encoder.row(data)
+
+        kind = _array_kind(data)
+        if kind == 'frame':
+            return encoder.row(_frame_columns(data))
+        if kind == 'array':
+            return encoder.array_row(data)
+
+        return data
+
+    def columns(self, section, data):
+        # type: (str, Any) -> Any
+        """
+        Columns of a batch in field order: a dict of columns by field
+        name, a pandas DataFrame or a 2-D NumPy array.
+        """
+
+        encoder = self._sections.get(section)
+        if encoder is None:
+            return data
+
+        if isinstance(data, dict):
+            return encoder.columns(data)
+
+        kind = _array_kind(data)
+        if kind == 'frame':
+            return encoder.columns(_frame_columns(data))
+        if kind == 'array':
+            return encoder.array_columns(data)
+
+        return data
+
+
+def _array_kind(data):
+    # type: (Any) -> Optional[str]
+
+    pandas = arrays.pandas_module()
+    if pandas is not None and isinstance(data, pandas.DataFrame):
+        return 'frame'
+
+    numpy = arrays.numpy_module()
+    if numpy is not None and isinstance(data, numpy.ndarray):
+        return 'array'
+
+    return None
+
+
+class EncoderCache(object):
+    """
+    Record encoders of the applications, compiled on first use from the
+    field definitions in `schemas` and kept until the definitions change.
+    """
+
+    def __init__(self, schemas):
+        # type: (Dict[str, Dict[str, Any]]) -> None
+
+        self._schemas = schemas
+        self._encoders = {}  # type: Dict[str, RecordEncoder]
+        self._lock = threading.Lock()
+
+        forking.register(self)
+
+    def get(self, application_name):
+        # type: (str) -> Optional[RecordEncoder]
+
+        encoder = self._encoders.get(application_name)
+        if encoder is not None:
+            return encoder
+
+        schema = self._schemas.get(application_name)
+        if schema is None:
+            return None
+
+        encoder = RecordEncoder(schema)
+        with self._lock:
+            return self._encoders.setdefault(application_name, encoder)
+
+    def invalidate(self, application_name):
+        # type: (str) -> None
+
+        with self._lock:
+            self._encoders.pop(application_name, None)
+
+    def _after_fork_child(self):
+        # type: () -> None
+
+        self._lock = threading.Lock()
@@ -19,39 +19,68 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 """
 
+import os
+import time
 import uuid
 
 from .helpers import safe
 from .helpers import endpoint
+from .helpers import MonitoringException
+from monitoring.http.arrays import encode_payload
 from monitoring.http.verb import Verb
 
+# Monotonic clock for latency measurement when available (Python 3).
+_clock = getattr(time, 'perf_counter', time.time)
+
 class Session(object):
     """
     Contains all the functions related to one monitoring session.
     >>> session = client.monitoring_session(self,'application_name', 'model_name')
     """
     
-    def __init__(self, transporter, config, application_name, model_name):
+    def __init__(self, transporter, config, application_name, model_name, batcher=None, sampler=None, aggregator=None, encoder=None):
         self._transporter = transporter
         self._config = config
+        self._batcher = batcher
+        self._sampler = sampler
+        self._aggregator = aggregator
+        self._encoder = encoder
+        self.sampled = True
         self.application_name = application_name
         self.model_name = model_name
         self.data_input = None
         self.data_output = None
         self.metadata = None
+        self.start_time = None
+        self.stop_time = None
+        self._started = None
 
 
     def __repr__(self):
         return u'<Session: %r>' % self.application_name
         
-    def start(self, request_options=None):
+    def start(self, request_options=None, sampling_key=None):
         """
         Start a new session to record logs from model.
+        In single round-trip mode nothing is sent, the session is only
+        timestamped and sent as a whole by `stop()`.
+        @param sampling_key key of a `HashSampler`, the query_id by default
         """
         self.query_id = str(uuid.uuid4())
-        raw_response = self._transporter.write(
-            Verb.PUT,
-            endpoint('applications/{}/{}/session_start', self.application_name, self.model_name),
+        self.start_time = time.time()
+        self._started = _clock()
+
+        if self._sampler is not None:
+            self.sampled = self._sampler.sample(
+                self.query_id if sampling_key is None else sampling_key)
+
+        if self._config.single_round_trip or self._aggregator is not None or not self.sampled:
+            self.id = None
+
+            return None
+
+        raw_response = self._send(
+            'session_start',
             {
                 'type':'session',
                 'query_id':self.query_id,
@@ -68,6 +97,8 @@ class Session(object):
     def set_data_input(self, data):
         """
         Set explicative features
+        NumPy arrays, pandas DataFrames and Series (or dicts of them) are
+        sent column-wise, see `MonitoringConfig.array_encoding`.
         """
         self.data_input = data
 
@@ -86,24 +117,189 @@ class Session(object):
     def stop(self, request_options=None):
         """
         Stop session
+        Nothing is sent when the session was dropped by the sampler, nor in
+        aggregation mode where the data only updates the feature summaries.
         """
-        
-        raw_response = self._transporter.write(
-            Verb.PUT,
-            endpoint('applications/{}/{}/session_stop', self.application_name, self.model_name),
+        self.stop_time = time.time()
+
+        if not self.sampled:
+            return None
+
+        if self._aggregator is not None:
+            self._aggregator.add(self.application_name, self.model_name, self.data_input, self.data_output, self.metadata)
+
+            return None
+
+        if self._config.single_round_trip:
+            return self._send(
+                'session',
+                {
+                    'type':'session',
+                    'query_id':self.query_id,
+                    'application_name': self.application_name,
+                    'model_name': self.model_name,
+                    'start_time': self.start_time,
+                    'stop_time': self.stop_time,
+                    'latency': _clock() - self._started,
+                    'data_input': self._encode(self.data_input, 'data_input'),
+                    'data_output': self._encode(self.data_output, 'data_output'),
+                    'metadata':self._encode(self.metadata, 'metadata')
+                },
+                request_options
+            )
+
+        raw_response = self._send(
+            'session_stop',
             {
                 'type':'session',
                 'query_id':self.query_id,
-                'data_input': self.data_input,
-                'data_output': self.data_output,
-                'metadata':self.metadata
+                'data_input': self._encode(self.data_input, 'data_input'),
+                'data_output': self._encode(self.data_output, 'data_output'),
+                'metadata':self._encode(self.metadata, 'metadata')
             },
             request_options
         )
         return raw_response
+
+    def log_batch(self, inputs, outputs=None, metadata=None, request_options=None):
+        """
+        Log N predictions at once, sent in chunks of
+        `MonitoringConfig.batch_size` predictions.
+        Each argument holds the N rows column-wise: a dict of columns
+        (lists or arrays), a 2-D NumPy array or a pandas DataFrame.
+        The session sampler, if any, does not apply to batches.
+        @return the N query ids, in row order
+        """
+        query_ids, records = self._batch_records(inputs, outputs, metadata)
+
+        if self._aggregator is not None:
+            self._aggregator.add(self.application_name, self.model_name, inputs, outputs, metadata, len(query_ids))
+        else:
+            for record in records:
+                self._send('session_batch', record, request_options)
+
+        return query_ids
+
+    def _batch_records(self, inputs, outputs, metadata):
+        count = _length(inputs)
+        if count is None:
+            raise MonitoringException('inputs must hold the rows column-wise')
+
+        # Sliced by row below, columns of other lengths would misalign.
+        for name, data in (('inputs', inputs), ('outputs', outputs), ('metadata', metadata)):
+            if data is not None and any(length != count for length in _column_lengths(data)):
+                raise MonitoringException('Every column of {} must hold the {} rows of the batch'.format(name, count))
+
+        # One call to the random source for the whole batch.
+        raw = os.urandom(16 * count)
+        query_ids = [str(uuid.UUID(bytes=raw[i:i + 16], version=4))
+                     for i in range(0, 16 * count, 16)]
+
+        if self._aggregator is not None:
+            return query_ids, []
+
+        now = time.time()
+        size = max(int(self._config.batch_size), 1)
+        records = []
+        for start in range(0, count, size):
+            stop = min(start + size, count)
+            records.append({
+                'type':'session_batch',
+                'query_ids': query_ids[start:stop],
+                'time': now,
+                'data_input': self._encode_columns(_rows(inputs, start, stop), 'data_input'),
+                'data_output': self._encode_columns(_rows(outputs, start, stop), 'data_output'),
+                'metadata': self._encode_columns(_rows(metadata, start, stop), 'metadata')
+            })
+
+        return query_ids, records
+
+    def _encode(self, data, section):
+        if self._encoder is not None:
+            data = self._encoder.row(section, data)
+        return self._encode_arrays(data)
+
+    def _encode_columns(self, data, section):
+        if self._encoder is not None:
+            data = self._encoder.columns(section, data)
+        return self._encode_arrays(data)
+
+    def _encode_arrays(self, data):
+        """Arrays of the payload, or of its positional fields, encoded."""
+        encoding = self._config.array_encoding
+        if self._encoder is not None and isinstance(data, list):
+            return [encode_payload(value, encoding) for value in data]
+        return encode_payload(data, encoding)
+
+    def _send(self, action, record, request_options=None):
+        """
+        Write a session record, or queue it when the client is buffered.
+        Buffered records are sent in bulk, so they carry their own action,
+        application and model, and their response is None.
+        """
+        if self._sampler is not None and action != 'session_start':
+            record['sampling'] = self._sampler.stats()
+
+        if self._encoder is not None and action != 'session_start':
+            # Field order the positional rows were encoded with.
+            record['schema'] = self._encoder.fingerprint
+
+        if self._batcher is not None:
+            record['action'] = action
+            record['application_name'] = self.application_name
+            record['model_name'] = self.model_name
+            self._batcher.push(record)
+
+            return None
+
+        return self._transporter.write(
+            Verb.PUT,
+            endpoint('applications/{}/{}/{}', self.application_name, self.model_name, action),
+            record,
+            request_options
+        )
         
     def _req(self, is_search, path, meth, request_options=None, params=None, data=None):
         """Perform an HTTPS request with retry logic."""
         path = '%s%s' % (self._request_path, path)
         return self.client._req(is_search, path, meth, request_options, params, data)
         
+
+
+def _length(data):
+    """Number of rows of column-wise data."""
+    if isinstance(data, dict):
+        for column in data.values():
+            return _length(column)
+        return None
+
+    shape = getattr(data, 'shape', None)
+    if shape:
+        return shape[0]
+
+    if isinstance(data, (list, tuple)):
+        return len(data)
+
+    return None
+
+
+def _column_lengths(data):
+    """Number of rows of every column of column-wise data."""
+    if isinstance(data, dict):
+        return [_length(column) for column in data.values()]
+
+    return [_length(data)]
+
+
+def _rows(data, start, stop):
+    """Rows [start, stop) of column-wise data, without copying arrays."""
+    if data is None:
+        return None
+
+    if isinstance(data, dict):
+        return dict((name, _rows(column, start, stop)) for name, column in data.items())
+
+    if hasattr(data, 'iloc'):
+        return data.iloc[start:stop]
+
+    return data[start:stop]
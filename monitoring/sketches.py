@@ -0,0 +1,420 @@
+import math
+
+from typing import Any, Dict, Iterable, List, Optional
+
+from monitoring.http.arrays import numpy_module
+
+NUMERIC_TYPES = ('int', 'integer', 'float', 'double', 'number', 'numeric',
+                 'real', 'long', 'decimal')
+
+
+class RunningStats(object):
+    """
+    Count, mean, variance, min and max in one pass (Welford), mergeable
+    with Chan's parallel formula.
+    """
+
+    def __init__(self):
+        # type: () -> None
+
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None  # type: Optional[float]
+        self.max = None  # type: Optional[float]
+
+    def add(self, value):
+        # type: (float) -> None
+
+        if not _finite(value):
+            return
+
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def add_many(self, values):
+        # type: (Any) -> None
+
+        numpy = numpy_module()
+        if numpy is None or not isinstance(values, numpy.ndarray):
+            for value in values:
+                self.add(float(value))
+            return
+
+        values = values[numpy.isfinite(values)]
+        if not len(values):
+            return
+
+        other = RunningStats()
+        other.count = int(values.size)
+        other.mean = float(values.mean())
+        other.m2 = float(((values - other.mean) ** 2).sum())
+        other.min = float(values.min())
+        other.max = float(values.max())
+
+        self.merge(other)
+
+    def merge(self, other):
+        # type: (RunningStats) -> None
+
+        if not other.count:
+            return
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def variance(self):
+        # type: () -> float
+
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def snapshot(self):
+        # type: () -> Dict[str, Any]
+
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'variance': self.variance(),
+            'min': self.min,
+            'max': self.max,
+        }
+
+
+class QuantileSketch(object):
+    """
+    Mergeable quantile sketch with relative accuracy `alpha` (DDSketch):
+    values fall into logarithmic buckets, which also make up a histogram.
+    """
+
+    def __init__(self, alpha=0.01, max_buckets=2048):
+        # type: (float, int) -> None
+
+        self.alpha = alpha
+        self.max_buckets = max_buckets
+        self._gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self._gamma)
+
+        self.positive = {}  # type: Dict[int, int]
+        self.negative = {}  # type: Dict[int, int]
+        self.zero = 0
+        self.count = 0
+
+    def add(self, value):
+        # type: (float) -> None
+
+        # Infinities have no bucket, NaN no rank.
+        if not _finite(value):
+            return
+
+        self.count += 1
+
+        if value > 0:
+            index = int(math.ceil(math.log(value) / self._log_gamma))
+            self.positive[index] = self.positive.get(index, 0) + 1
+        elif value < 0:
+            index = int(math.ceil(math.log(-value) / self._log_gamma))
+            self.negative[index] = self.negative.get(index, 0) + 1
+        else:
+            self.zero += 1
+
+        self._collapse()
+
+    def add_many(self, values):
+        # type: (Any) -> None
+
+        numpy = numpy_module()
+        if numpy is None or not isinstance(values, numpy.ndarray):
+            for value in values:
+                self.add(float(value))
+            return
+
+        values = values[numpy.isfinite(values)]
+        self.count += int(values.size)
+        self.zero += int((values == 0).sum())
+
+        for store, part in ((self.positive, values[values > 0]),
+                            (self.negative, -values[values < 0])):
+            if part.size:
+                indexes, counts = numpy.unique(
+                    numpy.ceil(numpy.log(part) / self._log_gamma)
+                    .astype('int64'), return_counts=True)
+
+                for index, count in zip(indexes.tolist(), counts.tolist()):
+                    store[index] = store.get(index, 0) + count
+
+        self._collapse()
+
+    def merge(self, other):
+        # type: (QuantileSketch) -> None
+
+        for store, other_store in ((self.positive, other.positive),
+                                   (self.negative, other.negative)):
+            for index, count in other_store.items():
+                store[index] = store.get(index, 0) + count
+
+        self.zero += other.zero
+        self.count += other.count
+        self._collapse()
+
+    def quantile(self, q):
+        # type: (float) -> Optional[float]
+
+        if not self.count:
+            return None
+
+        rank = q * (self.count - 1)
+        seen = 0
+
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return -self._value(index)
+
+        seen += self.zero
+        if seen > rank:
+            return 0.0
+
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return self._value(index)
+
+        return self._value(max(self.positive)) if self.positive else 0.0
+
+    def snapshot(self):
+        # type: () -> Dict[str, Any]
+
+        return {
+            'alpha': self.alpha,
+            'zero': self.zero,
+            # [bucket index, count] pairs, bucket i holds values in
+            # (gamma ** (i - 1), gamma ** i].
+            'positive': sorted(self.positive.items()),
+            'negative': sorted(self.negative.items()),
+            'quantiles': dict(
+                ('p{}'.format(int(q * 100)), self.quantile(q))
+                for q in (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+            ),
+        }
+
+    def _value(self, index):
+        # type: (int) -> float
+
+        return 2 * self._gamma ** index / (self._gamma + 1)
+
+    def _collapse(self):
+        # type: () -> None
+
+        # Fold the lowest buckets together, accuracy is kept for the
+        # upper quantiles, which drift monitoring cares most about.
+        for store in (self.positive, self.negative):
+            while len(store) > self.max_buckets:
+                lowest, second = sorted(store)[:2]
+                store[second] += store.pop(lowest)
+
+
+class HeavyHitters(object):
+    """
+    Most frequent values of a categorical feature (Space-Saving): counts
+    are exact for the top values, and over-estimated by at most
+    count / capacity for the others.
+    """
+
+    def __init__(self, capacity=64):
+        # type: (int) -> None
+
+        self.capacity = capacity
+        self.counts = {}  # type: Dict[str, int]
+        self.count = 0
+
+    def add(self, value, count=1):
+        # type: (Any, int) -> None
+
+        key = value if isinstance(value, str) else str(value)
+        self.count += count
+
+        if key in self.counts or len(self.counts) < self.capacity:
+            self.counts[key] = self.counts.get(key, 0) + count
+            return
+
+        smallest = min(self.counts, key=self.counts.get)
+        self.counts[key] = self.counts.pop(smallest) + count
+
+    def add_many(self, values):
+        # type: (Iterable[Any]) -> None
+
+        numpy = numpy_module()
+        if numpy is not None and isinstance(values, numpy.ndarray):
+            keys, counts = numpy.unique(values.astype(str), return_counts=True)
+            for key, count in zip(keys.tolist(), counts.tolist()):
+                self.add(key, count)
+            return
+
+        for value in values:
+            self.add(value)
+
+    def merge(self, other):
+        # type: (HeavyHitters) -> None
+
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+
+        self.count += other.count
+
+        if len(self.counts) > self.capacity:
+            top = sorted(self.counts.items(), key=lambda item: -item[1])
+            self.counts = dict(top[:self.capacity])
+
+    def snapshot(self):
+        # type: () -> Dict[str, Any]
+
+        return {
+            'count': self.count,
+            'top': sorted(self.counts.items(), key=lambda item: -item[1]),
+        }
+
+
+class FeatureSummary(object):
+    """
+    Streaming summary of one feature: RunningStats and a QuantileSketch for
+    numeric features, HeavyHitters for categorical ones.
+    """
+
+    def __init__(self, numeric, accuracy=0.01, capacity=64):
+        # type: (bool, float, int) -> None
+
+        self.numeric = numeric
+        self.missing = 0
+        # Infinite values of a numeric feature, left out of its statistics
+        self.infinite = 0
+
+        if numeric:
+            self.stats = RunningStats()
+            self.sketch = QuantileSketch(accuracy)
+        else:
+            self.top = HeavyHitters(capacity)
+
+    def add(self, value):
+        # type: (Any) -> None
+
+        if value is None:
+            self.missing += 1
+        elif self.numeric:
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                value = float('nan')
+
+            if value != value:  # NaN
+                self.missing += 1
+            elif not _finite(value):
+                self.infinite += 1
+            else:
+                self.stats.add(value)
+                self.sketch.add(value)
+        else:
+            self.top.add(value)
+
+    def add_many(self, values):
+        # type: (Any) -> None
+
+        numpy = numpy_module()
+        if numpy is None or not isinstance(values, numpy.ndarray):
+            for value in values:
+                self.add(value)
+            return
+
+        if values.ndim != 1:
+            values = values.reshape(-1)
+
+        if self.numeric:
+            try:
+                values = values.astype('float64')
+            except (TypeError, ValueError):
+                # Strings or mixed objects, converted one by one.
+                for value in values.tolist():
+                    self.add(value)
+                return
+
+            finite = numpy.isfinite(values)
+            if not finite.all():
+                missing = int(numpy.isnan(values).sum())
+                self.missing += missing
+                self.infinite += int(values.size - finite.sum()) - missing
+                values = values[finite]
+
+            self.stats.add_many(values)
+            self.sketch.add_many(values)
+        else:
+            self.top.add_many(values)
+
+    def merge(self, other):
+        # type: (FeatureSummary) -> None
+
+        self.missing += other.missing
+        self.infinite += other.infinite
+
+        if self.numeric:
+            self.stats.merge(other.stats)
+            self.sketch.merge(other.sketch)
+        else:
+            self.top.merge(other.top)
+
+    def snapshot(self):
+        # type: () -> Dict[str, Any]
+
+        if self.numeric:
+            snapshot = self.stats.snapshot()
+            snapshot['sketch'] = self.sketch.snapshot()
+            snapshot['infinite'] = self.infinite
+        else:
+            snapshot = self.top.snapshot()
+
+        snapshot['type'] = 'numeric' if self.numeric else 'categorical'
+        snapshot['missing'] = self.missing
+
+        return snapshot
+
+
+def _finite(value):
+    # type: (float) -> bool
+
+    return not (math.isinf(value) or math.isnan(value))
+
+
+def is_numeric_type(field_type):
+    # type: (Optional[str]) -> bool
+
+    return str(field_type).lower() in NUMERIC_TYPES
+
+
+def schema_types(fields):
+    # type: (Any) -> Dict[str, bool]
+    """
+    Map feature names to "is numeric", from a field list as given to
+    `Application.create`: [{name, label, type, description}].
+    """
+
+    types = {}  # type: Dict[str, bool]
+    if not isinstance(fields, (list, tuple)):
+        return types
+
+    for field in fields:
+        if isinstance(field, dict) and 'name' in field:
+            types[str(field['name'])] = is_numeric_type(field.get('type'))
+
+    return types
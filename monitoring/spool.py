@@ -0,0 +1,534 @@
+import errno
+import json
+import os
+import shutil
+import struct
+import threading
+import time
+import zlib
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from monitoring import forking
+from monitoring.exceptions import (
+    MonitoringUnreachableHostException,
+    RequestException
+)
+from monitoring.http.serializer import DataSerializer
+from monitoring.log import logger
+
+# Every frame is `length` (uint32) + `crc32` (uint32) + JSON payload.
+_FRAME = struct.Struct('>II')
+_SEGMENT_SUFFIX = '.seg'
+_CHECKPOINT = 'checkpoint'
+# Directory of a dead process taken over by a live one: '<pid>.<adopter>'
+_CLAIM = '{}.{}'
+
+
+class Spool(object):
+    """
+    Append-only, segment-rotated disk spool for writes the Transporter could
+    not deliver. Records are framed with their length and CRC32, so a torn
+    write at crash time is detected and truncated away on restart.
+    Delivered records are tracked in a checkpoint file; replay is
+    at-least-once.
+    A forked child process spools to its own `<directory>/<pid>`
+    subdirectory, segments are never shared between processes. The
+    subdirectories of processes that no longer exist, workers that died
+    or were recycled, are adopted: their undelivered records are moved
+    into the spool of a live process.
+    """
+
+    FSYNC_ALWAYS = 'always'
+    FSYNC_INTERVAL = 'interval'
+    FSYNC_NEVER = 'never'
+
+    def __init__(self, directory, segment_size=16 * 1024 * 1024,
+                 max_size=1024 * 1024 * 1024, fsync=FSYNC_INTERVAL,
+                 fsync_interval=1.0):
+        # type: (str, int, int, str, float) -> None
+
+        self._root = directory
+        self._directory = directory
+        self._segment_size = segment_size
+        self._max_size = max_size
+        self._fsync = fsync
+        self._fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+
+        self._last_fsync = 0.0
+        self._active = None  # type: Optional[Any]
+        self._active_id = 0
+        self._sizes = {}  # type: Dict[int, int]
+
+        self.dropped = 0
+
+        self._open()
+
+        forking.register(self)
+
+    @staticmethod
+    def create(config):
+        # type: (MonitoringConfig) -> Spool
+
+        return Spool(config.spool_directory, config.spool_segment_size,
+                     config.spool_max_size, config.spool_fsync,
+                     config.spool_fsync_interval)
+
+    def append(self, record):
+        # type: (Dict[str, Any]) -> None
+
+        self._append_payload(DataSerializer.serialize_bytes(record))
+
+    def _append_payload(self, payload):
+        # type: (bytes) -> None
+
+        frame = _FRAME.pack(len(payload),
+                            zlib.crc32(payload) & 0xffffffff) + payload
+
+        with self._lock:
+            if self._active is None:
+                # Closed with its client, writes still failing over to it
+                # are lost.
+                self.dropped += 1
+                logger.warning('Spool %s is closed, record dropped',
+                               self._directory)
+                return
+
+            if self._sizes[self._active_id] >= self._segment_size:
+                self._rotate()
+
+            self._active.write(frame)
+            self._sizes[self._active_id] += len(frame)
+
+            self._sync()
+            self._enforce_max_size()
+
+    def read(self, max_records):
+        # type: (int) -> Tuple[List[Dict[str, Any]], Tuple[int, int]]
+        """
+        Return the oldest undelivered records, and the cursor to `commit()`
+        once they have been delivered.
+        """
+
+        with self._lock:
+            if self._active is not None:
+                self._active.flush()
+            segment_id, offset = self._read_checkpoint()
+
+            records = []  # type: List[Dict[str, Any]]
+            for current in sorted(self._sizes):
+                if current < segment_id:
+                    continue
+                if current > segment_id:
+                    offset = 0
+
+                with open(self._path(current), 'rb') as segment:
+                    segment.seek(offset)
+                    for payload, end in _frames(segment, offset):
+                        records.append(json.loads(payload.decode('utf-8')))
+                        offset = end
+
+                        if len(records) >= max_records:
+                            return records, (current, offset)
+
+                segment_id = current
+
+            return records, (segment_id, offset)
+
+    def commit(self, cursor):
+        # type: (Tuple[int, int]) -> None
+        """
+        Mark every record up to `cursor` as delivered, and delete the
+        segments that are fully delivered.
+        """
+
+        segment_id, offset = cursor
+
+        with self._lock:
+            for current in sorted(self._sizes):
+                if current >= segment_id or current == self._active_id:
+                    break
+
+                self._remove(current)
+
+            if segment_id in self._sizes and segment_id != self._active_id \
+                    and offset >= self._sizes[segment_id]:
+                self._remove(segment_id)
+                segment_id, offset = min(self._sizes), 0
+
+            self._write_checkpoint(segment_id, offset)
+
+    def size(self):
+        # type: () -> int
+
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def close(self):
+        # type: () -> None
+
+        with self._lock:
+            if self._active is not None:
+                self._active.flush()
+                os.fsync(self._active.fileno())
+                self._active.close()
+                self._active = None
+
+    def _open(self):
+        # type: () -> None
+
+        if not os.path.isdir(self._directory):
+            os.makedirs(self._directory)
+
+        self._recover()
+        self.adopt_orphans()
+
+    def adopt_orphans(self):
+        # type: () -> int
+        """
+        Move the undelivered records of the processes that no longer
+        exist into this spool. Returns the number of records adopted.
+        """
+
+        try:
+            names = os.listdir(self._root)
+        except OSError:
+            return 0
+
+        adopted = 0
+        pid = os.getpid()
+
+        for name in names:
+            orphan, _, adopter = name.partition('.')
+            if not orphan.isdigit() or int(orphan) == pid:
+                continue
+
+            path = os.path.join(self._root, name)
+            if path == self._directory or not os.path.isdir(path):
+                continue
+
+            # A claim whose adopter died is taken over like the orphan.
+            if adopter:
+                if not adopter.isdigit() or _alive(int(adopter)):
+                    continue
+            elif _alive(int(orphan)):
+                continue
+
+            claim = os.path.join(self._root, _CLAIM.format(orphan, pid))
+            try:
+                # Atomic, only one process takes a directory over.
+                os.rename(path, claim)
+            except OSError:
+                continue
+
+            for payload in _undelivered(claim):
+                self._append_payload(payload)
+                adopted += 1
+
+            shutil.rmtree(claim, ignore_errors=True)
+
+        return adopted
+
+    def _before_fork(self):
+        # type: () -> None
+
+        # Held across the fork and flushed, so that the child neither
+        # inherits a half-written frame nor writes the parent's buffer.
+        self._lock.acquire()
+        if self._active is not None:
+            self._active.flush()
+
+    def _after_fork_parent(self):
+        # type: () -> None
+
+        self._lock.release()
+
+    def _after_fork_child(self):
+        # type: () -> None
+
+        self._lock = threading.Lock()
+
+        if self._active is not None:
+            self._active.close()
+
+        self._directory = os.path.join(self._root, str(os.getpid()))
+        self._active = None
+        self._active_id = 0
+        self._sizes = {}
+        self.dropped = 0
+
+        self._open()
+
+    def _recover(self):
+        # type: () -> None
+
+        for name in os.listdir(self._directory):
+            segment_id = _segment_id(name)
+            if segment_id is not None:
+                self._sizes[segment_id] = self._truncate_torn(segment_id)
+
+        for segment_id in [key for key, size in self._sizes.items()
+                           if size == 0]:
+            self._remove(segment_id)
+
+        self._active_id = max(self._sizes) if self._sizes else 0
+        self._rotate()
+
+    def _truncate_torn(self, segment_id):
+        # type: (int) -> int
+
+        path = self._path(segment_id)
+        end = 0
+
+        with open(path, 'rb') as segment:
+            for _, end in _frames(segment, 0):
+                pass
+
+        if end != os.path.getsize(path):
+            with open(path, 'r+b') as segment:
+                segment.truncate(end)
+
+        return end
+
+    def _rotate(self):
+        # type: () -> None
+
+        if self._active is not None:
+            self._active.flush()
+            os.fsync(self._active.fileno())
+            self._active.close()
+
+        self._active_id += 1
+        self._active = open(self._path(self._active_id), 'ab')
+        self._sizes[self._active_id] = 0
+
+    def _sync(self):
+        # type: () -> None
+
+        if self._fsync == self.FSYNC_NEVER:
+            return
+
+        now = time.time()
+        if self._fsync == self.FSYNC_ALWAYS or \
+                now - self._last_fsync >= self._fsync_interval:
+            self._active.flush()
+            os.fsync(self._active.fileno())
+            self._last_fsync = now
+
+    def _enforce_max_size(self):
+        # type: () -> None
+
+        while sum(self._sizes.values()) > self._max_size and \
+                len(self._sizes) > 1:
+            oldest = min(self._sizes)
+            with open(self._path(oldest), 'rb') as segment:
+                self.dropped += sum(1 for _ in _frames(segment, 0))
+
+            self._remove(oldest)
+
+    def _remove(self, segment_id):
+        # type: (int) -> None
+
+        del self._sizes[segment_id]
+        try:
+            os.remove(self._path(segment_id))
+        except OSError:
+            pass
+
+    def _path(self, segment_id):
+        # type: (int) -> str
+
+        return os.path.join(self._directory,
+                            '{:020d}{}'.format(segment_id, _SEGMENT_SUFFIX))
+
+    def _read_checkpoint(self):
+        # type: () -> Tuple[int, int]
+
+        oldest = min(self._sizes)
+
+        try:
+            with open(os.path.join(self._directory, _CHECKPOINT)) as f:
+                segment_id, offset = [int(v) for v in f.read().split()]
+        except (IOError, OSError, ValueError):
+            return oldest, 0
+
+        if segment_id < oldest:
+            return oldest, 0
+
+        return segment_id, offset
+
+    def _write_checkpoint(self, segment_id, offset):
+        # type: (int, int) -> None
+
+        path = os.path.join(self._directory, _CHECKPOINT)
+        tmp = path + '.tmp'
+
+        with open(tmp, 'w') as f:
+            f.write('{} {}'.format(segment_id, offset))
+            f.flush()
+            os.fsync(f.fileno())
+
+        getattr(os, 'replace', os.rename)(tmp, path)
+
+
+class SpoolReplayer(object):
+    """
+    Background thread draining the spool in batches once a host accepts
+    writes again.
+    """
+
+    def __init__(self, spool, transporter, batch_size=100, interval=5.0):
+        # type: (Spool, Transporter, int, float) -> None
+
+        self._spool = spool
+        self._transporter = transporter
+        self._batch_size = batch_size
+        self._interval = interval
+        self._stopped = threading.Event()
+
+        self.replayed = 0
+        self.rejected = 0
+
+        self._start()
+
+        forking.register(self)
+
+    def replay(self):
+        # type: () -> int
+        """
+        Deliver spooled records until the spool is empty or hosts are
+        unreachable again. Returns the number of records delivered.
+        """
+
+        delivered = 0
+        self._spool.adopt_orphans()
+
+        while True:
+            records, cursor = self._spool.read(self._batch_size)
+            if not records:
+                return delivered
+
+            for i, record in enumerate(records):
+                try:
+                    self._transporter._write(record['verb'], record['path'],
+                                             record['data'], None)
+                except MonitoringUnreachableHostException:
+                    # Commit what went through, resume from here next time.
+                    if i:
+                        self._spool.commit(self._spool.read(i)[1])
+                    return delivered
+                except RequestException:
+                    # Rejected by the API, retrying would not help.
+                    self.rejected += 1
+                else:
+                    delivered += 1
+                    self.replayed += 1
+
+            self._spool.commit(cursor)
+
+    def stop(self, timeout=None):
+        # type: (Optional[float]) -> None
+
+        self._stopped.set()
+        self._thread.join(timeout)
+
+    def _start(self):
+        # type: () -> None
+
+        self._thread = threading.Thread(target=self._run,
+                                        name='monitoring-spool-replayer')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _after_fork_child(self):
+        # type: () -> None
+
+        # Registered after the spool, so the child's spool is open by now.
+        if not self._stopped.is_set():
+            self._stopped = threading.Event()
+            self._start()
+
+    def _run(self):
+        # type: () -> None
+
+        while not self._stopped.wait(self._interval):
+            try:
+                self.replay()
+            except Exception:
+                pass
+
+
+def _alive(pid):
+    # type: (int) -> bool
+
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        # EPERM: it exists, owned by another user.
+        return e.errno != errno.ESRCH
+
+    return True
+
+
+def _undelivered(directory):
+    # type: (str) -> Any
+    """
+    Payloads of the spool `directory` past its checkpoint.
+    """
+
+    try:
+        with open(os.path.join(directory, _CHECKPOINT)) as f:
+            first, offset = [int(v) for v in f.read().split()]
+    except (IOError, OSError, ValueError):
+        first, offset = 0, 0
+
+    ids = sorted(segment_id for segment_id in
+                 (_segment_id(name) for name in os.listdir(directory))
+                 if segment_id is not None)
+
+    for segment_id in ids:
+        if segment_id < first:
+            continue
+        if segment_id > first:
+            offset = 0
+
+        path = os.path.join(directory,
+                            '{:020d}{}'.format(segment_id, _SEGMENT_SUFFIX))
+
+        with open(path, 'rb') as segment:
+            segment.seek(offset)
+            for payload, _ in _frames(segment, offset):
+                yield payload
+
+
+def _segment_id(name):
+    # type: (str) -> Optional[int]
+    """
+    Id of the segment file `name`, None for any other file.
+    """
+
+    if not name.endswith(_SEGMENT_SUFFIX):
+        return None
+
+    digits = name[:-len(_SEGMENT_SUFFIX)]
+
+    return int(digits) if digits.isdigit() else None
+
+
+def _frames(segment, offset):
+    # type: (Any, int) -> Any
+
+    while True:
+        header = segment.read(_FRAME.size)
+        if len(header) < _FRAME.size:
+            return
+
+        length, crc = _FRAME.unpack(header)
+        payload = segment.read(length)
+        if len(payload) < length or zlib.crc32(payload) & 0xffffffff != crc:
+            return
+
+        offset += _FRAME.size + length
+
+        yield payload, offset
@@ -1,13 +1,17 @@
 import copy
 import json
+import logging
 import os
+import threading
 import time
 
 from requests import Session
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util import Retry
 
+from . import forking
 from .helpers import MonitoringException, CustomJSONEncoder, rotate, urlify
+from .log import redact, truncate
 
 try:
     from urllib import urlencode
@@ -33,9 +37,13 @@ if APPENGINE:
 if 'RES_OPTIONS' not in os.environ:
     os.environ['RES_OPTIONS'] = 'timeout:2 attempts:1'
 
+logger = logging.getLogger(__name__)
+
 
 class Transport(object):
     def __init__(self):
+        # Rotations from concurrent requests must not undo each other.
+        self._hosts_lock = threading.Lock()
         self.headers = {}
         self.read_hosts = []
         self.write_hosts = []
@@ -47,14 +55,17 @@ class Transport(object):
         # Ask urllib not to make retries on its own.
         self.session.mount('https://', HTTPAdapter(max_retries=Retry(connect=0)))
 
+        forking.register(self)
+
     @property
     def read_hosts(self):
         return self._read_hosts
 
     @read_hosts.setter
     def read_hosts(self, value):
-        self._read_hosts = value
-        self._original_read_hosts = value
+        with self._hosts_lock:
+            self._read_hosts = value
+            self._original_read_hosts = value
 
     @property
     def write_hosts(self):
@@ -62,8 +73,13 @@ class Transport(object):
 
     @write_hosts.setter
     def write_hosts(self, value):
-        self._write_hosts = value
-        self._original_write_hosts = value
+        with self._hosts_lock:
+            self._write_hosts = value
+            self._original_write_hosts = value
+
+    def _after_fork_child(self):
+        # Another thread of the parent may have held it while forking.
+        self._hosts_lock = threading.Lock()
 
     def _app_req(self, host, path, meth, timeout, params, data, headers):
         """
@@ -122,10 +138,11 @@ class Transport(object):
         res.raise_for_status()
 
     def _rotate_hosts(self, is_search):
-        if is_search:
-            self._read_hosts = rotate(self._read_hosts)
-        else:
-            self._write_hosts = rotate(self._write_hosts)
+        with self._hosts_lock:
+            if is_search:
+                self._read_hosts = rotate(self._read_hosts)
+            else:
+                self._write_hosts = rotate(self._write_hosts)
 
     def _get_hosts(self, is_search):
         secs_since_rotate = time.time() - self.dns_timer
@@ -161,17 +178,10 @@ class Transport(object):
 
         hosts = self._get_hosts(is_search)
         timeout = self.search_timeout if is_search else self.timeout
-        print(' ')
-        print('-- DEBUT REQ --')
-        print('hosts :', self._get_hosts(is_search))
-        print('chemin :', path)
-        print('type d\'action: ', meth)
-        print('timeout: ', timeout)
-        print('parametres: ', params)
-        print('Données envoyées: ', data)
-        print('headers de la requete: ', headers)
-        print('-- FIN REQ --')
-        print(' ')
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('%s %s hosts=%s timeout=%s params=%s data=%s headers=%s',
+                         meth, path, hosts, timeout, params, truncate(data),
+                         redact(headers))
         return (self._get_hosts(is_search), path, meth, timeout, params, data, headers)
         exceptions = {}
         for i, host in enumerate(hosts):
@@ -0,0 +1,164 @@
+"""
+Fakes and factories shared by the tests, imported with
+`from conftest import ...`.
+"""
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+from monitoring.configs import MonitoringConfig
+from monitoring.exceptions import (
+    MonitoringUnreachableHostException,
+    RequestException
+)
+from monitoring.http.hosts import Host, HostsCollection
+from monitoring.http.serializer import DataSerializer
+from monitoring.http.transporter import Response, Transporter
+
+
+def make_config(**options):
+    config = MonitoringConfig('app', 'key')
+    for name, value in options.items():
+        setattr(config, name, value)
+
+    return config
+
+
+class FakeTransporter(object):
+    """
+    Keeps the (path, data) of every write, serialized first as the
+    Transporter does. Writes raise `error` when it is set, are unreachable
+    while `unreachable` is, and are rejected for the `data['i']` values in
+    `rejected`.
+    """
+
+    def __init__(self, error=None):
+        self.writes = []
+        self.error = error
+        self.unreachable = False
+        self.rejected = set()
+        self.lock = threading.Lock()
+        self.spool = None
+
+    def write(self, verb, path, data, request_options=None):
+        if self.error is not None:
+            raise self.error
+
+        if self.unreachable:
+            raise MonitoringUnreachableHostException('down')
+
+        if isinstance(data, dict) and data.get('i') in self.rejected:
+            raise RequestException('rejected', 400)
+
+        DataSerializer.serialize_bytes(data)
+        with self.lock:
+            self.writes.append((path, data))
+
+        return {}
+
+    # The spool replays through the write that does not spool again.
+    _write = write
+
+    def close(self):
+        pass
+
+    @property
+    def batches(self):
+        return [list(data['records']) for _, data in self.writes]
+
+    @property
+    def written(self):
+        return [data['i'] for _, data in self.writes]
+
+
+class FakeRequester(object):
+    """
+    Answers with the responses scripted per host, or 200 by default. A
+    'hang' answer waits out the read timeout of the request.
+    """
+
+    def __init__(self, answers=None):
+        self.answers = answers or {}
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def send(self, request):
+        host = request.url.split('/')[2]
+        with self.lock:
+            self.sent.append((host, request.connect_timeout,
+                              request.timeout))
+
+        answer = self.answers.get(host, 200)
+        if answer == 'hang':
+            time.sleep(request.timeout)
+            return Response(error_message='timed out',
+                            is_timed_out_error=True)
+
+        if answer == 'down':
+            return Response(error_message='refused', is_network_error=True)
+
+        return Response(answer, {'status': answer})
+
+    def stats(self):
+        return {}
+
+    def close(self):
+        pass
+
+
+def make_transporter(answers=None, hosts=('a', 'b', 'c'), **options):
+    config = make_config(**options)
+    config.hosts = HostsCollection([
+        Host(name, len(hosts) - i, scheme='http')
+        for i, name in enumerate(hosts)])
+    if 'retry_backoff' not in options:
+        config.retry_backoff = 0.0
+
+    requester = FakeRequester(answers)
+
+    return Transporter(requester, config), requester
+
+
+class Clock(object):
+    """Stand-in for `_now`, moved forward by hand."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def fork(child, timeout=10):
+    """
+    Run `child` in a forked process, returning its exit status: 0 when it
+    returned True, minus the signal number when it was killed. A child
+    still running after `timeout` seconds is killed by SIGALRM.
+    """
+
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            signal.alarm(timeout)
+            code = 0 if child() else 2
+        finally:
+            os._exit(code)
+
+    _, status = os.waitpid(pid, 0)
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+
+    return os.WEXITSTATUS(status)
+
+
+@pytest.fixture
+def server():
+    from benchmarks.server import StandInServer
+
+    server = StandInServer().start()
+    yield server
+    server.stop()
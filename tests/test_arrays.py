@@ -0,0 +1,126 @@
+import base64
+import json
+import subprocess
+import sys
+
+import numpy
+import pandas
+import pytest
+
+from monitoring.http.arrays import ArrayEncoding, encode_payload
+from monitoring.http.serializer import DataSerializer
+
+
+def round_trip(data, encoding=ArrayEncoding.LIST):
+    return json.loads(DataSerializer.serialize(encode_payload(data,
+                                                              encoding)))
+
+
+def decode_array(encoded):
+    dtype = numpy.dtype(encoded['dtype'])
+    if encoded.get('encoding') == ArrayEncoding.BASE64:
+        values = numpy.frombuffer(base64.b64decode(encoded['data']), dtype)
+    else:
+        values = numpy.array(encoded['data'], dtype)
+
+    return values.reshape(encoded['shape'])
+
+
+@pytest.mark.parametrize('encoding', [ArrayEncoding.LIST,
+                                      ArrayEncoding.BASE64])
+@pytest.mark.parametrize('array', [
+    numpy.arange(6, dtype='int64').reshape(2, 3),
+    numpy.array([0.5, -1.25, 3.0], dtype='>f8'),
+    numpy.array([True, False]),
+    numpy.zeros((0, 2), dtype='float32'),
+])
+def test_ndarray(array, encoding):
+    decoded = decode_array(round_trip(array, encoding))
+
+    assert decoded.shape == array.shape
+    assert decoded.dtype.kind == array.dtype.kind
+    assert (decoded == array).all()
+
+
+def test_string_array_is_a_list():
+    encoded = round_trip(numpy.array(['a', 'b']), ArrayEncoding.BASE64)
+
+    assert encoded['data'] == ['a', 'b']
+    assert 'encoding' not in encoded
+
+
+@pytest.mark.parametrize('encoding', [ArrayEncoding.LIST,
+                                      ArrayEncoding.BASE64])
+def test_frame(encoding):
+    frame = pandas.DataFrame({'x': [1.0, 2.0], 'n': [3, 4],
+                              'c': ['a', 'b']})
+
+    encoded = round_trip(frame, encoding)
+
+    assert encoded['columns'] == ['x', 'n', 'c']
+    assert 'index' not in encoded
+    decoded = pandas.DataFrame(dict(
+        (name, decode_array(column))
+        for name, column in zip(encoded['columns'], encoded['data'])))
+    assert decoded.equals(frame)
+
+
+def test_frame_index_and_datetimes():
+    frame = pandas.DataFrame(
+        {'t': pandas.to_datetime(['1970-01-01 00:00:10',
+                                  '1970-01-01 00:01:00'])},
+        index=[10, 20])
+
+    encoded = round_trip(frame)
+
+    assert decode_array(encoded['index']).tolist() == [10, 20]
+    # Seconds since the epoch.
+    assert decode_array(encoded['data'][0]).tolist() == [10, 60]
+
+
+def test_series():
+    series = pandas.Series([1.5, 2.5], name='score')
+
+    encoded = round_trip(series)
+
+    assert encoded['name'] == 'score'
+    assert decode_array(encoded).tolist() == [1.5, 2.5]
+
+
+def test_dict_of_arrays():
+    encoded = round_trip({'x': numpy.array([1, 2]), 'y': 3})
+
+    assert decode_array(encoded['x']).tolist() == [1, 2]
+    assert encoded['y'] == 3
+
+
+def test_payload_without_arrays_is_returned_as_is():
+    data = {'x': 1.0, 'nested': {'y': [1, 2]}}
+
+    assert encode_payload(data) is data
+
+
+@pytest.mark.parametrize('backend', ['json', 'orjson'])
+def test_numpy_scalars_and_arrays_in_plain_payloads(backend):
+    if backend not in DataSerializer._backends:
+        pytest.skip('orjson is not installed')
+
+    dumps = DataSerializer._dumps
+    DataSerializer.use(backend)
+    try:
+        encoded = json.loads(DataSerializer.serialize(
+            {'i': numpy.int32(3), 'f': numpy.float64(0.5),
+             'a': numpy.array([1, 2])}))
+    finally:
+        DataSerializer._dumps = staticmethod(dumps)
+
+    assert encoded == {'i': 3, 'f': 0.5, 'a': [1, 2]}
+
+
+def test_client_import_leaves_numpy_and_pandas_alone():
+    code = ('import sys, monitoring.client; '
+            'print("numpy" in sys.modules, "pandas" in sys.modules)')
+
+    output = subprocess.check_output([sys.executable, '-c', code])
+
+    assert output.split() == [b'False', b'False']
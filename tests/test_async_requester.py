@@ -0,0 +1,178 @@
+import asyncio
+import gzip
+
+import pytest
+
+from monitoring.http.async_requester import AsyncRequester
+from monitoring.http.transporter import Request
+
+
+class ScriptedServer(object):
+    """
+    Answers each request with the next of `answers`, raw HTTP/1.1
+    responses, on keep-alive connections. An answer ending with
+    `CLOSE` closes the connection after it is written.
+    """
+
+    CLOSE = b'<close>'
+
+    def __init__(self, answers):
+        self.answers = list(answers)
+        self.requests = []
+        self.connections = 0
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, '127.0.0.1',
+                                                  0)
+
+        return self._server.sockets[0].getsockname()[1]
+
+    def close(self):
+        self._server.close()
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        while self.answers:
+            head = await reader.readuntil(b'\r\n\r\n')
+            length = 0
+            for line in head.split(b'\r\n'):
+                name, _, value = line.partition(b':')
+                if name.lower() == b'content-length':
+                    length = int(value)
+            self.requests.append(head.split(b' ', 2)[:2] +
+                                 [await reader.readexactly(length)])
+
+            answer = self.answers.pop(0)
+            closing = answer.endswith(self.CLOSE)
+            writer.write(answer[:-len(self.CLOSE)] if closing else answer)
+            await writer.drain()
+
+            if closing:
+                break
+
+        writer.close()
+
+
+def ok(body=b'{"status":"ok"}', *headers):
+    return b'\r\n'.join(
+        [b'HTTP/1.1 200 OK', b'Content-Type: application/json',
+         b'Content-Length: %d' % len(body)] + list(headers)) + \
+        b'\r\n\r\n' + body
+
+
+def exchange(answers, verbs=('GET',), timeout=2):
+    """
+    Send a request per verb to a `ScriptedServer` of `answers`; the
+    responses, the requester and the server.
+    """
+
+    server = ScriptedServer(answers)
+    requester = AsyncRequester()
+
+    async def run():
+        port = await server.start()
+        responses = []
+        try:
+            for verb in verbs:
+                request = Request(verb, {}, None, 1, timeout)
+                request.url = 'http://127.0.0.1:{}/1/status'.format(port)
+                responses.append(await requester.send(request))
+        finally:
+            requester.close()
+            server.close()
+
+        return responses
+
+    return asyncio.run(run()), requester, server
+
+
+def test_content_length():
+    (response,), _, server = exchange([ok()])
+
+    assert response.status_code == 200
+    assert response.content == {'status': 'ok'}
+    assert server.requests == [[b'GET', b'/1/status', b'']]
+
+
+def test_chunked_with_trailers():
+    answer = (b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+              b'Transfer-Encoding: chunked\r\n\r\n'
+              b'5;ext=1\r\n{"a":\r\n'
+              b'2\r\n1}\r\n'
+              b'0\r\nChecksum: x\r\n\r\n')
+
+    (first, second), requester, _ = exchange([answer, ok()],
+                                             ('GET', 'GET'))
+
+    assert first.content == {'a': 1}
+    # The trailers were read, the next answer starts clean.
+    assert second.content == {'status': 'ok'}
+    assert requester.stats()['hits'] == 1
+
+
+def test_compressed_response():
+    body = gzip.compress(b'{"a":1}')
+
+    (response,), _, _ = exchange([ok(body, b'Content-Encoding: gzip')])
+
+    assert response.content == {'a': 1}
+
+
+@pytest.mark.parametrize('answer, verb', [
+    (b'HTTP/1.1 204 No Content\r\n\r\n', 'PUT'),
+    (b'HTTP/1.1 304 Not Modified\r\nContent-Encoding: gzip\r\n\r\n', 'GET'),
+    (b'HTTP/1.1 200 OK\r\nContent-Length: 10\r\n\r\n', 'HEAD'),
+])
+def test_answers_without_a_body(answer, verb):
+    # Waiting for a body would time out, the connection stays open.
+    (response, after), requester, server = exchange([answer, ok()],
+                                                    (verb, 'GET'))
+
+    assert response.status_code == int(answer.split(b' ')[1])
+    assert not response.is_timed_out_error
+    assert response.content is None
+    assert after.content == {'status': 'ok'}
+    assert server.connections == 1
+
+
+def test_interim_answers_are_skipped():
+    answer = b'HTTP/1.1 100 Continue\r\n\r\n' + ok()
+
+    (response,), _, _ = exchange([answer])
+
+    assert response.status_code == 200
+    assert response.content == {'status': 'ok'}
+
+
+def test_connections_are_reused():
+    responses, requester, server = exchange([ok()] * 3, ('GET',) * 3)
+
+    assert [r.status_code for r in responses] == [200] * 3
+    assert server.connections == 1
+    stats = requester.stats()
+    assert (stats['requests'], stats['hits'], stats['misses']) == (3, 2, 1)
+
+
+def test_closed_connection_is_replaced():
+    responses, requester, server = exchange(
+        [ok(b'{}', b'Connection: close'), ok()], ('GET', 'GET'))
+
+    assert [r.status_code for r in responses] == [200, 200]
+    assert server.connections == 2
+
+
+def test_server_dropping_an_idle_connection_is_retried():
+    responses, _, server = exchange([ok() + ScriptedServer.CLOSE, ok()],
+                                    ('GET', 'GET'))
+
+    assert [r.status_code for r in responses] == [200, 200]
+    assert server.connections == 2
+
+
+def test_body_until_the_end_of_the_stream():
+    answer = b'HTTP/1.1 200 OK\r\n\r\n{"a":1}' + ScriptedServer.CLOSE
+
+    (response,), _, _ = exchange([answer])
+
+    assert response.content == {'a': 1}
@@ -0,0 +1,166 @@
+import threading
+import time
+
+import pytest
+
+from conftest import FakeTransporter, make_config
+from monitoring.batching import Batcher
+from monitoring.http.serializer import DataSerializer
+
+
+def make_batcher(transporter, **options):
+    options.setdefault('batch_max_latency', 60.0)
+
+    return Batcher(transporter, make_config(**options))
+
+
+def test_flush_sends_queued_records():
+    transporter = FakeTransporter()
+    batcher = make_batcher(transporter)
+
+    for i in range(3):
+        batcher.push({'i': i})
+
+    assert batcher.flush(5)
+    assert transporter.batches == [[{'i': 0}, {'i': 1}, {'i': 2}]]
+    assert batcher.sent == 3
+
+    batcher.close(5)
+
+
+def test_batches_are_cut_at_batch_size():
+    transporter = FakeTransporter()
+    batcher = make_batcher(transporter, batch_size=2)
+
+    for i in range(5):
+        batcher.push({'i': i})
+    batcher.close(5)
+
+    assert [len(batch) for batch in transporter.batches] == [2, 2, 1]
+
+
+def test_unserializable_record_is_dropped_alone():
+    transporter = FakeTransporter()
+    batcher = make_batcher(transporter)
+
+    circular = {}
+    circular['self'] = circular
+
+    batcher.push({'i': 0})
+    batcher.push(circular)
+    batcher.push({'i': 1})
+
+    assert batcher.flush(5)
+    assert sum(transporter.batches, []) == [{'i': 0}, {'i': 1}]
+    assert batcher.failed == 1
+    assert batcher.last_error is not None
+
+    # The thread is still serving the queue.
+    batcher.push({'i': 2})
+    assert batcher.flush(5)
+    assert transporter.batches[-1] == [{'i': 2}]
+
+    batcher.close(5)
+
+
+def test_failed_send_is_counted():
+    error = IOError('down')
+    batcher = make_batcher(FakeTransporter(error))
+
+    batcher.push({'i': 0})
+    batcher.push({'i': 1})
+
+    assert batcher.flush(5)
+    assert batcher.failed == 2
+    assert batcher.last_error is error
+
+    batcher.close(5)
+
+
+def test_close_drains_the_queue():
+    transporter = FakeTransporter()
+    batcher = make_batcher(transporter)
+
+    batcher.push({'i': 0})
+    batcher.close(5)
+
+    assert transporter.batches == [[{'i': 0}]]
+
+
+def test_flush_after_close_returns_at_once():
+    batcher = make_batcher(FakeTransporter())
+    batcher.push({'i': 0})
+    batcher.close(5)
+
+    result = []
+    thread = threading.Thread(target=lambda: result.append(batcher.flush()))
+    thread.start()
+    thread.join(5)
+
+    assert result == [True]
+
+
+def test_push_after_close_raises():
+    batcher = make_batcher(FakeTransporter())
+    batcher.close()
+
+    with pytest.raises(RuntimeError):
+        batcher.push({'i': 0})
+
+
+def test_flush_without_records_or_thread():
+    batcher = make_batcher(FakeTransporter())
+
+    assert batcher.flush()
+    assert batcher.pending() == 0
+
+
+def test_batches_are_cut_at_the_estimated_size():
+    transporter = FakeTransporter()
+    record = {'text': 'x' * 100}
+    size = len(DataSerializer.serialize_bytes(record))
+    batcher = make_batcher(transporter, batch_max_bytes=3 * size)
+
+    for _ in range(7):
+        batcher.push(dict(record))
+    batcher.close(5)
+
+    assert [len(batch) for batch in transporter.batches] == [3, 3, 1]
+
+
+class GatedTransporter(FakeTransporter):
+    """Holds every write until `gate` is set."""
+
+    def __init__(self):
+        FakeTransporter.__init__(self)
+        self.entered = threading.Event()
+        self.gate = threading.Event()
+
+    def write(self, verb, path, data, request_options=None):
+        self.entered.set()
+        self.gate.wait(5)
+
+        return FakeTransporter.write(self, verb, path, data, request_options)
+
+
+def test_record_pushed_during_close_is_sent():
+    transporter = GatedTransporter()
+    batcher = make_batcher(transporter, batch_size=1, batch_queue_size=1)
+
+    batcher.push({'i': 0})
+    assert transporter.entered.wait(5)
+    batcher.push({'i': 1})
+
+    # Blocked on the full queue while the batcher closes.
+    pusher = threading.Thread(target=batcher.push, args=({'i': 2},))
+    pusher.start()
+    while not batcher._pushing:
+        time.sleep(0.001)
+    closer = threading.Thread(target=batcher.close, args=(5,))
+    closer.start()
+
+    transporter.gate.set()
+    pusher.join(5)
+    closer.join(5)
+
+    assert sum(transporter.batches, []) == [{'i': 0}, {'i': 1}, {'i': 2}]
@@ -0,0 +1,113 @@
+import threading
+import time
+
+import pytest
+
+from monitoring.http.cache import ReadCache
+
+
+def test_hit_returns_a_copy():
+    cache = ReadCache()
+    calls = []
+
+    def load():
+        calls.append(1)
+        return {'models': []}
+
+    first = cache.get('key', ('app',), load)
+    first['models'].append('changed')
+    second = cache.get('key', ('app',), load)
+
+    assert second == {'models': []}
+    assert len(calls) == 1
+    assert cache.stats()['hits'] == 1
+
+
+def test_entries_expire():
+    cache = ReadCache(ttl=0.05)
+    cache.get('key', (), lambda: 1)
+    time.sleep(0.1)
+
+    assert cache.get('key', (), lambda: 2) == 2
+
+
+def test_least_recently_used_is_evicted():
+    cache = ReadCache(max_entries=2)
+    cache.get('a', (), lambda: 'a')
+    cache.get('b', (), lambda: 'b')
+    cache.get('a', (), lambda: 'unused')
+    cache.get('c', (), lambda: 'c')
+
+    assert cache.get('a', (), lambda: 'reloaded') == 'a'
+    assert cache.get('b', (), lambda: 'reloaded') == 'reloaded'
+    assert cache.stats()['evictions'] >= 1
+
+
+def test_concurrent_reads_share_one_load():
+    cache = ReadCache()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def load():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {'value': 1}
+
+    results = []
+    threads = [threading.Thread(
+        target=lambda: results.append(cache.get('key', (), load)))
+        for _ in range(5)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+
+    # Followers are waiting on the leader's flight.
+    deadline = time.time() + 5
+    while cache.stats()['coalesced'] < 4 and time.time() < deadline:
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == [{'value': 1}] * 5
+    assert cache.stats()['coalesced'] == 4
+
+
+def test_load_errors_reach_every_waiter_and_are_not_cached():
+    cache = ReadCache()
+
+    def fail():
+        raise IOError('down')
+
+    with pytest.raises(IOError):
+        cache.get('key', (), fail)
+
+    assert cache.get('key', (), lambda: 'ok') == 'ok'
+
+
+def test_invalidation_by_tag():
+    cache = ReadCache()
+    cache.get('app-a', ('a',), lambda: 1)
+    cache.get('app-b', ('b',), lambda: 1)
+
+    cache.invalidate(['a'])
+
+    assert cache.get('app-a', ('a',), lambda: 2) == 2
+    assert cache.get('app-b', ('b',), lambda: 2) == 1
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_read_racing_an_invalidation_is_not_cached():
+    cache = ReadCache()
+
+    def load():
+        # A write lands while the read is in flight.
+        cache.invalidate(['a'])
+        return 'stale'
+
+    assert cache.get('key', ('a',), load) == 'stale'
+    assert cache.get('key', ('a',), lambda: 'fresh') == 'fresh'
@@ -0,0 +1,46 @@
+import threading
+
+import pytest
+
+from conftest import FakeTransporter, make_config
+from monitoring.client import Client
+
+
+def make_client(**options):
+    return Client(FakeTransporter(), make_config(**options))
+
+
+def test_submit_blocks_while_the_queue_is_full():
+    client = make_client(submit_workers=1, submit_queue_size=1)
+    release = threading.Event()
+    running = client.submit(release.wait)
+    waiting = client.submit(lambda: 'queued')
+
+    submitted = threading.Event()
+
+    def submit():
+        client.submit(lambda: None)
+        submitted.set()
+
+    thread = threading.Thread(target=submit)
+    thread.start()
+
+    assert not submitted.wait(0.2)
+
+    release.set()
+    assert submitted.wait(5)
+    assert running.result(5) is True
+    assert waiting.result(5) == 'queued'
+    thread.join()
+    client.close()
+
+
+def test_submit_after_close_raises():
+    client = make_client()
+    assert client.submit(lambda: 1).result(5) == 1
+
+    client.close()
+
+    with pytest.raises(RuntimeError):
+        client.submit(lambda: 2)
+    assert client._submit_executor is None
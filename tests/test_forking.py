@@ -0,0 +1,117 @@
+import os
+import threading
+
+import pytest
+
+from conftest import FakeTransporter, fork, make_config
+from monitoring import forking
+from monitoring.batching import Batcher
+from monitoring.metrics import MetricsRegistry
+from monitoring.sampling import HashSampler
+from monitoring.schema import EncoderCache
+from monitoring.transport import Transport
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'register_at_fork'),
+                                reason='fork hooks need Python 3.7+')
+
+
+class Recorder(object):
+    def __init__(self, calls, name):
+        self.calls = calls
+        self.name = name
+        forking.register(self)
+
+    def _before_fork(self):
+        self.calls.append((self.name, 'before'))
+
+    def _after_fork_parent(self):
+        self.calls.append((self.name, 'parent'))
+
+    def _after_fork_child(self):
+        self.calls.append((self.name, 'child'))
+
+
+def test_hooks_run_in_registration_order():
+    calls = []
+    first, second = Recorder(calls, 'first'), Recorder(calls, 'second')
+
+    def child():
+        return calls == [('first', 'before'), ('second', 'before'),
+                         ('first', 'child'), ('second', 'child')]
+
+    assert fork(child) == 0
+    assert calls == [('first', 'before'), ('second', 'before'),
+                     ('first', 'parent'), ('second', 'parent')]
+
+
+def test_collected_instances_are_dropped():
+    calls = []
+    Recorder(calls, 'gone')
+    kept = Recorder(calls, 'kept')
+
+    assert fork(lambda: True) == 0
+    assert ('gone', 'before') not in calls
+    assert ('kept', 'before') in calls
+
+
+def test_batcher_restarts_its_thread_in_the_child():
+    transporter = FakeTransporter()
+    batcher = Batcher(transporter, make_config(batch_max_latency=60.0))
+
+    # The parent's thread is running when the worker is forked.
+    batcher.push({'i': 0})
+    assert batcher.flush(5)
+
+    def child():
+        batcher.push({'i': 1})
+        return (batcher.flush(5) and batcher.sent == 1
+                and transporter.batches[-1] == [{'i': 1}])
+
+    assert fork(child) == 0
+    assert transporter.batches == [[{'i': 0}]]
+    batcher.close(5)
+
+
+def test_locks_held_while_forking_are_reset_in_the_child():
+    registry = MetricsRegistry()
+    sampler = HashSampler(0.5)
+    encoders = EncoderCache({})
+    transport = Transport()
+    locks = [registry._lock, registry.retries._lock, sampler._lock,
+             encoders._lock, transport._hosts_lock]
+
+    # Held by another thread of the parent, they would never be released
+    # in the child.
+    for lock in locks:
+        lock.acquire()
+
+    def child():
+        registry.retries.inc(('a',))
+        transport.write_hosts = ['b']
+        encoders.invalidate('app')
+        return (sampler.sample('key') in (True, False)
+                and 'monitoring_retries_total' in registry.prometheus())
+
+    try:
+        assert fork(child, timeout=5) == 0
+    finally:
+        for lock in locks:
+            lock.release()
+
+
+def test_registration_is_safe_across_threads():
+    calls = []
+    recorders = []
+
+    def register():
+        for i in range(200):
+            recorders.append(Recorder(calls, i))
+
+    threads = [threading.Thread(target=register) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    registered = set(ref() for ref in forking._instances)
+    assert all(recorder in registered for recorder in recorders)
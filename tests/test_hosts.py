@@ -0,0 +1,108 @@
+import random
+
+import pytest
+
+from monitoring.http.hosts import Host
+from monitoring.http.transporter import RetryStrategy
+
+
+def make_hosts(*latencies):
+    hosts = []
+    for i, latency in enumerate(latencies):
+        host = Host(str(i), scheme='http')
+        if latency is not None:
+            host.observe(latency, False)
+        hosts.append(host)
+
+    return hosts
+
+
+def test_latency_average_decays():
+    host = Host('a')
+
+    host.observe(0.1, False)
+    assert host.latency == 0.1
+
+    host.observe(0.6, False)
+    assert host.latency == pytest.approx(0.1 + Host.DECAY * 0.5)
+
+
+def test_error_rate_average():
+    host = Host('a')
+
+    host.observe(0.1, True)
+    assert host.error_rate == pytest.approx(Host.DECAY)
+
+    host.observe(0.1, False)
+    assert host.error_rate == pytest.approx(Host.DECAY * (1 - Host.DECAY))
+
+
+def test_errors_raise_the_score():
+    fast, slow = make_hosts(0.01, 0.025)
+    fast.observe(0.01, True)
+
+    # An error rate of 20% triples the cost of the fast host.
+    assert fast.score(0.0) == pytest.approx(0.03)
+    assert fast.score(0.0) > slow.score(0.0)
+
+
+def test_hosts_are_ordered_by_score():
+    strategy = RetryStrategy()
+    hosts = make_hosts(0.05, 0.01, 0.03)
+
+    assert [h.url for h in strategy.valid_hosts(hosts)] == ['1', '2', '0']
+
+
+def test_unmeasured_hosts_score_as_the_best():
+    strategy = RetryStrategy()
+    hosts = make_hosts(0.05, None, 0.01)
+
+    assert [h.url for h in strategy.valid_hosts(hosts)] == ['1', '2', '0']
+
+
+def test_priority_breaks_ties():
+    strategy = RetryStrategy()
+    hosts = make_hosts(None, None, None)
+    hosts[2].priority = 10
+
+    assert [h.url for h in strategy.valid_hosts(hosts)] == ['2', '0', '1']
+
+
+@pytest.mark.parametrize('fallback_latency, first', [
+    (0.06, 'primary'),
+    (0.04, 'fallback'),
+])
+def test_priority_discounts_the_score(fallback_latency, first):
+    strategy = RetryStrategy()
+    primary = Host('primary', 10)
+    fallback = Host('fallback', 0)
+    primary.observe(0.1, False)
+    fallback.observe(fallback_latency, False)
+
+    # Preferred until it is twice as slow as the fallback.
+    assert strategy.valid_hosts([fallback, primary])[0].url == first
+
+
+def test_power_of_two_picks_the_best_of_two():
+    strategy = RetryStrategy(RetryStrategy.POWER_OF_TWO)
+    hosts = make_hosts(0.01, 0.02, 0.03)
+
+    random.seed(42)
+    firsts = [strategy.valid_hosts(hosts)[0].url for _ in range(300)]
+
+    # The slowest host never wins a draw, the fastest wins two in three.
+    assert '2' not in firsts
+    assert 170 <= firsts.count('0') <= 230
+
+
+def test_power_of_two_keeps_the_other_hosts_in_order():
+    strategy = RetryStrategy(RetryStrategy.POWER_OF_TWO)
+    hosts = make_hosts(0.01, 0.02, 0.03, 0.04)
+
+    random.seed(7)
+    for _ in range(20):
+        ordered = [h.url for h in strategy.valid_hosts(hosts)]
+        rest = ordered[1:]
+
+        assert sorted(ordered) == ['0', '1', '2', '3']
+        assert rest == sorted(rest)
@@ -0,0 +1,44 @@
+from monitoring.log import MAX_PAYLOAD, redact, truncate
+
+
+class Counted(object):
+    converted = 0
+
+    def __repr__(self):
+        Counted.converted += 1
+        return 'item'
+
+
+def test_short_payloads_are_kept_whole():
+    assert str(truncate({'a': [1, 2, {'b': 'c'}]})) == \
+        "{'a': [1, 2, {'b': 'c'}]}"
+    assert str(truncate('text')) == 'text'
+
+
+def test_long_strings_are_cut():
+    assert str(truncate('a' * 20, 5)) == 'aaaaa...'
+
+
+def test_large_payloads_are_cut_while_converted():
+    Counted.converted = 0
+    payload = {'records': [[Counted() for _ in range(300)]
+                           for _ in range(300)]}
+
+    text = str(truncate(payload))
+
+    assert text.startswith("{'records': [[item, item")
+    assert text.endswith('...')
+    assert len(text) <= MAX_PAYLOAD + 3
+    assert Counted.converted < MAX_PAYLOAD
+
+
+def test_api_key_is_redacted():
+    headers = {'X-ValidAndGo-API-Key': 'secret', 'Accept': 'text/plain'}
+
+    text = str(redact(headers))
+
+    assert 'secret' not in text
+    assert "'X-ValidAndGo-API-Key': '***'" in text
+    assert "'Accept': 'text/plain'" in text
+    assert headers['X-ValidAndGo-API-Key'] == 'secret'
+    assert str(redact(None)) == '{}'
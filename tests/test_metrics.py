@@ -0,0 +1,45 @@
+from monitoring.metrics import MetricsRegistry
+
+
+def lines(registry, name):
+    return [line for line in registry.prometheus().splitlines()
+            if line.startswith(name)]
+
+
+def test_counter_and_histogram():
+    registry = MetricsRegistry()
+    registry.retries.inc(('host-a',))
+    registry.retries.inc(('host-a',), 2)
+    registry.attempt_duration.observe(0.2, ('host-a',))
+
+    assert lines(registry, 'monitoring_retries_total') == [
+        'monitoring_retries_total{host="host-a"} 3']
+    assert 'monitoring_attempt_duration_seconds_count{host="host-a"} 1' in \
+        lines(registry, 'monitoring_attempt_duration_seconds_count')
+
+
+def test_non_finite_values_are_exported():
+    registry = MetricsRegistry()
+    gauge = registry.gauge('test_values', 'Test values', ('kind',))
+    gauge.set(float('nan'), ('nan',))
+    gauge.set(float('inf'), ('inf',))
+    gauge.set(float('-inf'), ('-inf',))
+    registry.attempt_duration.observe(float('nan'), ('host-a',))
+
+    assert sorted(lines(registry, 'test_values')) == sorted([
+        'test_values{kind="nan"} NaN',
+        'test_values{kind="inf"} +Inf',
+        'test_values{kind="-inf"} -Inf',
+    ])
+    assert 'monitoring_attempt_duration_seconds_sum{host="host-a"} NaN' in \
+        lines(registry, 'monitoring_attempt_duration_seconds_sum')
+
+
+def test_hooks_receive_events():
+    registry = MetricsRegistry()
+    events = []
+    registry.add_hook(lambda event, fields: events.append((event, fields)))
+
+    registry.emit('host_down', host='host-a')
+
+    assert events == [('host_down', {'host': 'host-a'})]
@@ -0,0 +1,151 @@
+import asyncio
+
+import pytest
+
+from monitoring.pagination import next_page, page_options, paginate
+from monitoring.http.request_options import RequestOptions
+
+
+def pages(total, page_size=10, **extra):
+    """fetch() of an endpoint paginating `total` items."""
+    calls = []
+
+    def fetch(params):
+        calls.append(dict(params))
+        page = params['page']
+        start = page * params['hitsPerPage']
+        response = {'items': list(range(start, min(start + page_size,
+                                                    total)))}
+        response.update(extra)
+        return response
+
+    return fetch, calls
+
+
+@pytest.mark.parametrize('prefetch', [True, False])
+def test_pages_are_read_until_the_last(prefetch):
+    fetch, calls = pages(35)
+
+    assert list(paginate(fetch, 'items', 10, prefetch)) == list(range(35))
+    assert [call['page'] for call in calls] == [0, 1, 2, 3]
+
+
+def test_page_count_stops_on_an_exact_multiple():
+    def fetch(params):
+        page = params['page']
+        return {'items': list(range(page * 10, page * 10 + 10)),
+                'page': page, 'nbPages': 2}
+
+    assert list(paginate(fetch, 'items', 10, False)) == list(range(20))
+
+
+def test_cursor():
+    def fetch(params):
+        cursor = params.get('cursor', 0)
+        return {'items': [cursor], 'cursor': cursor + 1 if cursor < 3
+                else None}
+
+    assert list(paginate(fetch, 'items', 1, False)) == [0, 1, 2, 3]
+
+
+def test_repeated_cursor_stops():
+    calls = []
+
+    def fetch(params):
+        calls.append(params)
+        return {'items': [len(calls)], 'cursor': 'same'}
+
+    assert list(paginate(fetch, 'items', 1, False)) == [1, 2]
+    assert len(calls) == 2
+
+
+def test_endpoint_ignoring_paging_is_read_once():
+    calls = []
+
+    def fetch(params):
+        calls.append(params)
+        return {'items': list(range(10))}
+
+    assert list(paginate(fetch, 'items', 10, True)) == list(range(10))
+    assert len(calls) == 2
+
+
+def test_unpaginated_list_larger_than_a_page():
+    assert list(paginate(lambda params: list(range(25)), 'items', 10)) == \
+        list(range(25))
+
+
+def test_closing_early_stops_fetching():
+    fetch, calls = pages(1000)
+    iterator = paginate(fetch, 'items', 10, False)
+
+    assert next(iterator) == 0
+    iterator.close()
+
+    assert len(calls) == 1
+
+
+def test_next_page_of_an_empty_page():
+    assert next_page({'items': []}, {'page': 3, 'hitsPerPage': 10}, 0,
+                     10) is None
+
+
+def test_page_options():
+    assert page_options({'a': 1}, {'page': 2}) == {'a': 1, 'page': 2}
+
+    options = RequestOptions({}, {}, {}, {'x': 1})
+    paged = page_options(options, {'page': 2})
+    assert paged.data['page'] == 2
+    assert 'page' not in options.data
+
+
+def test_async_pages():
+    from monitoring.async_client import _paginate
+
+    fetch, calls = pages(25)
+
+    async def read(params):
+        return fetch(params)
+
+    async def collect():
+        return [item async for item in _paginate(read, 'items', 10, True)]
+
+    assert asyncio.run(collect()) == list(range(25))
+
+
+def test_async_repeated_page_stops():
+    from monitoring.async_client import _paginate
+
+    async def read(params):
+        return {'items': list(range(10))}
+
+    async def collect():
+        return [item async for item in _paginate(read, 'items', 10, False)]
+
+    assert asyncio.run(collect()) == list(range(10))
+
+
+def test_async_iter_models(server):
+    from monitoring.async_client import AsyncApplication, AsyncClient
+    from monitoring.configs import MonitoringConfig
+    from monitoring.http.hosts import HostsCollection
+
+    server.listing_size = 25
+    config = MonitoringConfig('app', 'key')
+    config.hosts = HostsCollection([server.host()])
+
+    async def collect():
+        client = AsyncClient.connect_with_config(config)
+        application = client.init_application('application')
+        assert isinstance(application, AsyncApplication)
+
+        try:
+            return [model async for model in
+                    application.iter_models(page_size=10)]
+        finally:
+            client.close()
+
+    models = asyncio.run(collect())
+
+    assert [model['model_name'] for model in models] == \
+        ['model_name-{}'.format(i) for i in range(25)]
@@ -0,0 +1,54 @@
+from monitoring.http.requester import Requester
+from monitoring.http.transporter import Request
+
+
+def send(requester, server, path='status'):
+    request = Request('GET', {}, None, 2, 5)
+    request.url = 'http://127.0.0.1:{}/1/{}'.format(server.port, path)
+
+    return requester.send(request)
+
+
+def test_connections_are_reused(server):
+    requester = Requester()
+
+    for _ in range(3):
+        assert send(requester, server).status_code == 200
+
+    assert requester.stats() == {'requests': 3, 'hits': 2, 'misses': 1,
+                                 'pools': 1}
+    requester.close()
+
+
+def test_idle_pools_are_replaced(server):
+    requester = Requester(pool_idle_timeout=60.0)
+    send(requester, server)
+
+    pool, = requester._pools.values()
+    pool.last_use -= 61.0
+    assert send(requester, server).status_code == 200
+
+    assert list(requester._pools.values())[0] is not pool
+    assert requester.stats() == {'requests': 2, 'hits': 0, 'misses': 2,
+                                 'pools': 1}
+    requester.close()
+
+
+def test_pool_in_use_is_closed_when_released(server):
+    requester = Requester(pool_idle_timeout=60.0)
+    url = 'http://127.0.0.1:{}/1/status'.format(server.port)
+    closed = []
+
+    running = requester._checkout(url)
+    running.close = lambda: closed.append(running)
+    running.last_use -= 61.0
+
+    replacement = requester._checkout(url)
+    assert replacement is not running
+    assert closed == []
+
+    requester._release(running)
+    assert closed == [running]
+
+    requester._release(replacement)
+    requester.close()
@@ -0,0 +1,72 @@
+import threading
+
+import pytest
+
+from monitoring.sampling import (
+    FixedRateSampler,
+    HashSampler,
+    Sampler,
+    TokenBucketSampler
+)
+
+
+def test_fixed_rate_counts_every_decision():
+    sampler = FixedRateSampler(0.25)
+
+    kept = sum(sampler.sample() for _ in range(4000))
+
+    stats = sampler.stats()
+    assert stats['sampled'] == kept
+    assert stats['sampled'] + stats['dropped'] == 4000
+    assert stats['rate'] == 0.25
+    assert 800 < kept < 1200
+
+
+def test_hash_sampler_is_deterministic():
+    first = HashSampler(0.5)
+    second = HashSampler(0.5)
+    keys = ['query-{}'.format(i) for i in range(200)]
+
+    assert [first.sample(key) for key in keys] == \
+        [second.sample(key) for key in keys]
+    assert first.sample(None)
+
+
+def test_token_bucket_bounds_bursts():
+    sampler = TokenBucketSampler(1.0, burst=5)
+
+    kept = sum(sampler.sample() for _ in range(20))
+
+    assert kept == 5
+    assert sampler.rate() == 0.25
+
+
+def test_counters_are_consistent_across_threads():
+    sampler = FixedRateSampler(0.5)
+
+    def run():
+        for _ in range(1000):
+            sampler.sample()
+
+    threads = [threading.Thread(target=run) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = sampler.stats()
+    assert stats['sampled'] + stats['dropped'] == 8000
+
+
+def test_sampler_is_abstract():
+    with pytest.raises(TypeError):
+        Sampler()
+
+
+def test_token_bucket_rate_matches_its_counts():
+    sampler = TokenBucketSampler(1.0, burst=3)
+    for _ in range(6):
+        sampler.sample()
+
+    assert sampler.stats() == {'rate': 0.5, 'sampled': 3, 'dropped': 3}
+    assert sampler.rate() == 0.5
@@ -0,0 +1,165 @@
+import numpy
+import pandas
+import pytest
+
+from conftest import FakeTransporter, make_config
+from monitoring.exceptions import MonitoringException
+from monitoring.schema import EncoderCache, RecordEncoder
+from monitoring.session import Session
+
+FIELDS = [
+    {'name': 'age', 'type': 'int'},
+    {'name': 'city', 'type': 'category'},
+    {'name': 'member', 'type': 'bool'},
+]
+
+
+def test_rows_follow_the_field_order():
+    encoder = RecordEncoder({'data_input': FIELDS})
+
+    assert encoder.row('data_input', {'city': 'Paris', 'age': 31}) == \
+        [31, 'Paris', None]
+    # Sections without definitions are sent as given.
+    assert encoder.row('metadata', {'a': 1}) == {'a': 1}
+
+
+def test_undeclared_fields_are_rejected():
+    encoder = RecordEncoder({'data_input': FIELDS})
+
+    with pytest.raises(MonitoringException):
+        encoder.row('data_input', {'age': 1, 'height': 180})
+
+
+def test_types_are_checked():
+    encoder = RecordEncoder({'data_input': FIELDS})
+
+    with pytest.raises(MonitoringException):
+        encoder.row('data_input', {'age': 'thirty'})
+
+    assert encoder.row('data_input', {'age': 1.5, 'member': True}) == \
+        [1.5, None, True]
+
+
+def test_columns():
+    encoder = RecordEncoder({'data_input': FIELDS})
+
+    assert encoder.columns('data_input', {'age': [1, 2], 'city': ['a', 'b']}) \
+        == [[1, 2], ['a', 'b'], None]
+
+
+def test_fingerprint_follows_the_field_order():
+    first = RecordEncoder({'data_input': FIELDS})
+    same = RecordEncoder({'data_input': list(FIELDS)})
+    reordered = RecordEncoder({'data_input': FIELDS[::-1]})
+
+    assert first.fingerprint == same.fingerprint
+    assert first.fingerprint != reordered.fingerprint
+
+
+def test_encoder_cache_invalidation():
+    schemas = {'app': {'data_input': FIELDS}}
+    cache = EncoderCache(schemas)
+
+    encoder = cache.get('app')
+    assert cache.get('app') is encoder
+    assert cache.get('other') is None
+
+    schemas['app'] = {'data_input': FIELDS[:1]}
+    cache.invalidate('app')
+    assert cache.get('app').row('data_input', {'age': 3}) == [3]
+
+
+NUMBERS = [
+    {'name': 'age', 'type': 'int'},
+    {'name': 'height', 'type': 'float'},
+]
+
+
+def positional_session(**options):
+    transporter = FakeTransporter()
+    session = Session(transporter, make_config(**options), 'app', 'model',
+                      encoder=RecordEncoder({'data_input': NUMBERS,
+                                             'data_output': FIELDS}))
+
+    return session, transporter
+
+
+def stop(session, transporter, data_input):
+    session.start()
+    session.set_data_input(data_input)
+    session.stop()
+
+    _, record = transporter.writes[-1]
+    return record['data_input']
+
+
+def test_positional_session_with_a_dict_of_arrays():
+    session, transporter = positional_session()
+
+    data_input = stop(session, transporter, {
+        'height': numpy.array([1.8]), 'age': numpy.array([31])})
+
+    age, height = data_input
+    assert age['data'].tolist() == [31] and age['shape'] == [1]
+    assert height['data'].tolist() == [1.8]
+
+
+def test_positional_session_with_a_frame():
+    session, transporter = positional_session()
+    frame = pandas.DataFrame({'height': [1.8], 'age': [31]})
+
+    age, height = stop(session, transporter, frame)
+
+    assert age['name'] == 'age' and age['data'].tolist() == [31]
+    assert height['name'] == 'height' and height['data'].tolist() == [1.8]
+
+
+def test_positional_session_with_an_array():
+    session, transporter = positional_session()
+
+    assert stop(session, transporter, numpy.array([31, 1.8])) == [31.0, 1.8]
+
+
+def test_positional_arrays_are_checked():
+    session, transporter = positional_session()
+    session.start()
+
+    session.set_data_input({'age': numpy.array(['thirty'])})
+    with pytest.raises(MonitoringException):
+        session.stop()
+
+    session.set_data_input(numpy.array([31, 1.8, 0]))
+    with pytest.raises(MonitoringException):
+        session.stop()
+
+
+def test_positional_log_batch_with_a_frame():
+    session, transporter = positional_session(batch_size=2)
+    inputs = pandas.DataFrame({'age': [31, 42, 53],
+                               'height': [1.8, 1.7, 1.6]})
+    outputs = pandas.DataFrame({'member': [True, False, True],
+                                'city': ['a', 'b', 'c']})
+
+    session.log_batch(inputs, outputs)
+
+    first, second = [record for _, record in transporter.writes]
+    age, height = second['data_input']
+    assert age['data'].tolist() == [53] and height['data'].tolist() == [1.6]
+    age, city, member = first['data_output']
+    assert age is None
+    assert city['data'] == ['a', 'b'] and member['data'].tolist() == \
+        [True, False]
+
+
+def test_positional_log_batch_with_an_array():
+    session, transporter = positional_session()
+
+    session.log_batch(numpy.array([[31, 1.8], [42, 1.7]]))
+
+    (_, record), = transporter.writes
+    age, height = record['data_input']
+    assert age['data'].tolist() == [31, 42]
+    assert height['data'].tolist() == [1.8, 1.7]
+
+    with pytest.raises(MonitoringException):
+        session.log_batch(numpy.zeros((2, 3)))
@@ -0,0 +1,100 @@
+import datetime
+import decimal
+import json
+
+import numpy
+import pytest
+
+from monitoring.helpers import CustomJSONEncoder
+from monitoring.http import serializer
+from monitoring.http.arrays import encode_payload
+from monitoring.http.serializer import DataSerializer
+
+BACKENDS = sorted(DataSerializer._backends)
+
+
+class Opaque(object):
+    pass
+
+
+def test_serialize_known_types():
+    data = {'d': decimal.Decimal('1.5'),
+            'when': datetime.datetime(2020, 1, 1)}
+
+    assert json.loads(DataSerializer.serialize(data)) == {
+        'd': 1.5, 'when': 1577836800}
+
+
+def test_custom_encoder_falls_back_to_str():
+    encoded = json.loads(json.dumps({'o': Opaque()}, cls=CustomJSONEncoder))
+
+    assert encoded['o'].startswith('<')
+
+
+def test_custom_encoder_maps_bad_dates_to_zero():
+    class BadDate(datetime.datetime):
+        def utctimetuple(self):
+            raise ValueError('out of range')
+
+    when = BadDate(2020, 1, 1)
+
+    assert json.dumps(when, cls=CustomJSONEncoder) == '0'
+
+
+@pytest.fixture(params=BACKENDS)
+def dumps(request):
+    """
+    The backend, recording the length of every slice it encodes.
+    """
+
+    backend = DataSerializer._backends[request.param]
+    sizes = []
+
+    def recording(data):
+        encoded = backend(data)
+        sizes.append(len(encoded))
+        return encoded
+
+    recording.sizes = sizes
+    dumps = DataSerializer._dumps
+    DataSerializer._dumps = staticmethod(recording)
+    yield recording
+    DataSerializer._dumps = staticmethod(dumps)
+
+
+def test_chunks_join_into_the_document(dumps):
+    data = {
+        'records': [{'i': i, 'tags': ['a', 'b']} for i in range(3000)],
+        'columns': dict(('c{}'.format(i), i) for i in range(3000)),
+        'nested': {'rows': list(range(5000)), 'name': 'n'},
+        1: 'int key',
+    }
+
+    chunks = list(DataSerializer.serialize_chunks(data))
+
+    assert len(chunks) > 3
+    assert json.loads(b''.join(chunks)) == \
+        json.loads(DataSerializer.serialize_bytes(data))
+
+
+def test_large_arrays_are_encoded_by_slices(dumps):
+    array = numpy.arange(100000, dtype='float64').reshape(50000, 2)
+    data = {'records': [{'data_input': encode_payload(
+        {'x': array, 'small': numpy.arange(3)})}]}
+
+    chunks = list(DataSerializer.serialize_chunks(data))
+
+    whole = DataSerializer.serialize_bytes(data)
+    assert json.loads(b''.join(chunks)) == json.loads(whole)
+    # No slice holds more than `_CHUNK_SIZE` values of the array.
+    assert max(len(chunk) for chunk in chunks) < len(whole) // 10
+    assert max(dumps.sizes[:-1]) < len(whole) // 10
+
+
+def test_top_level_array_is_encoded_by_slices(dumps):
+    array = numpy.arange(5000, dtype='int64')
+
+    chunks = list(DataSerializer.serialize_chunks(array))
+
+    assert len(chunks) > 3
+    assert json.loads(b''.join(chunks)) == array.tolist()
@@ -0,0 +1,123 @@
+import numpy
+import pytest
+
+from conftest import FakeTransporter, make_config, make_transporter
+from monitoring.aggregation import Aggregator
+from monitoring.exceptions import MonitoringUnreachableHostException
+from monitoring.helpers import MonitoringException
+from monitoring.session import Session
+
+
+def make_session(aggregator=None, **options):
+    transporter = FakeTransporter()
+
+    return Session(transporter, make_config(**options), 'app', 'model',
+                   aggregator=aggregator), transporter
+
+
+def test_log_batch_sends_chunks():
+    session, transporter = make_session(batch_size=2)
+
+    query_ids = session.log_batch({'x': [1, 2, 3]}, {'y': [0, 1, 0]})
+
+    assert len(query_ids) == 3
+    records = [data for _, data in transporter.writes]
+    assert [record['query_ids'] for record in records] == \
+        [query_ids[:2], query_ids[2:]]
+    assert records[1]['data_input'] == {'x': [3]}
+    assert records[1]['data_output'] == {'y': [0]}
+
+
+@pytest.mark.parametrize('outputs, metadata', [
+    ({'y': [0, 1]}, None),
+    (None, {'m': [0, 1, 2, 3]}),
+    (numpy.zeros((2, 1)), None),
+])
+def test_log_batch_rejects_misaligned_columns(outputs, metadata):
+    session, transporter = make_session()
+
+    with pytest.raises(MonitoringException):
+        session.log_batch({'x': [1, 2, 3]}, outputs, metadata)
+
+    assert transporter.writes == []
+
+
+def test_log_batch_rejects_ragged_inputs():
+    session, _ = make_session()
+
+    with pytest.raises(MonitoringException):
+        session.log_batch({'x': [1, 2, 3], 'z': [1, 2]})
+
+
+def test_log_batch_counts_every_row_in_aggregation_mode():
+    transporter = FakeTransporter()
+    config = make_config(aggregation_interval=3600)
+    aggregator = Aggregator(transporter, config, {})
+
+    session = Session(transporter, config, 'app', 'model',
+                      aggregator=aggregator)
+    session.log_batch({'x': [1.0, 2.0, 3.0]})
+    session.log_batch({'x': numpy.array([4.0])})
+
+    aggregator.flush()
+    aggregator.close()
+
+    snapshot = transporter.writes[0][1]
+    assert snapshot['sessions'] == 4
+    assert snapshot['data_input']['x']['count'] == 4
+
+
+def run_session(transporter, config):
+    session = Session(transporter, config, 'app', 'model')
+
+    started = session.start()
+    session.set_data_input({'x': 1.0})
+    session.set_data_output({'y': 0})
+
+    return started, session.stop(), session
+
+
+@pytest.mark.parametrize('single_round_trip, requests', [
+    (True, 1),
+    (False, 2),
+])
+def test_requests_per_session(single_round_trip, requests):
+    transporter, requester = make_transporter(
+        hosts=('a',), single_round_trip=single_round_trip)
+
+    run_session(transporter, transporter._config)
+
+    assert len(requester.sent) == requests
+
+
+def test_single_round_trip_sends_the_whole_session():
+    transporter = FakeTransporter()
+    config = make_config(single_round_trip=True)
+
+    started, stopped, session = run_session(transporter, config)
+
+    assert started is None and session.id is None
+    assert stopped == {}
+    (path, record), = transporter.writes
+    assert path.endswith('applications/app/model/session')
+    assert record['query_id'] == session.query_id
+    assert record['start_time'] <= record['stop_time']
+    assert record['latency'] >= 0
+    assert record['data_input'] == {'x': 1.0}
+    assert record['data_output'] == {'y': 0}
+
+
+def test_single_round_trip_returns_the_response():
+    transporter, _ = make_transporter(hosts=('a',), single_round_trip=True)
+
+    _, stopped, _ = run_session(transporter, transporter._config)
+
+    assert stopped == {'status': 200}
+
+
+def test_single_round_trip_failure_is_raised():
+    transporter, _ = make_transporter({'a': 'down'}, hosts=('a',),
+                                      single_round_trip=True)
+
+    with pytest.raises(MonitoringUnreachableHostException):
+        run_session(transporter, transporter._config)
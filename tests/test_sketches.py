@@ -0,0 +1,130 @@
+import math
+
+import numpy
+import pytest
+
+from monitoring.aggregation import FeatureAggregator
+from monitoring.sketches import (
+    FeatureSummary,
+    HeavyHitters,
+    QuantileSketch,
+    RunningStats
+)
+
+
+def test_running_stats():
+    stats = RunningStats()
+    for value in (1.0, 2.0, 3.0, 4.0):
+        stats.add(value)
+
+    assert stats.mean == 2.5
+    assert stats.variance() == pytest.approx(5.0 / 3)
+    assert (stats.min, stats.max) == (1.0, 4.0)
+
+
+def test_running_stats_add_many_matches_add():
+    values = numpy.arange(100, dtype='float64')
+    one_by_one = RunningStats()
+    for value in values:
+        one_by_one.add(float(value))
+
+    at_once = RunningStats()
+    at_once.add_many(values[:40])
+    at_once.add_many(values[40:])
+
+    assert at_once.count == one_by_one.count
+    assert at_once.mean == pytest.approx(one_by_one.mean)
+    assert at_once.variance() == pytest.approx(one_by_one.variance())
+
+
+def test_quantiles_within_accuracy():
+    sketch = QuantileSketch(0.01)
+    sketch.add_many(numpy.arange(1, 10001, dtype='float64'))
+
+    assert sketch.quantile(0.5) == pytest.approx(5000, rel=0.02)
+    assert sketch.quantile(0.99) == pytest.approx(9900, rel=0.02)
+
+
+def test_sketch_merge():
+    first, second = QuantileSketch(), QuantileSketch()
+    for value in range(1, 51):
+        first.add(float(value))
+        second.add(float(value + 50))
+
+    first.merge(second)
+
+    assert first.count == 100
+    assert first.quantile(0.5) == pytest.approx(50, rel=0.03)
+
+
+@pytest.mark.parametrize('value', [float('inf'), float('-inf')])
+def test_infinity_is_counted_apart(value):
+    summary = FeatureSummary(True)
+    summary.add(value)
+    summary.add(1.0)
+
+    snapshot = summary.snapshot()
+    assert snapshot['infinite'] == 1
+    assert snapshot['count'] == 1
+    assert snapshot['mean'] == 1.0
+    assert summary.sketch.count == 1
+
+
+def test_non_finite_arrays():
+    summary = FeatureSummary(True)
+    summary.add_many(numpy.array([1.0, float('inf'), float('nan'),
+                                  -float('inf'), 3.0]))
+
+    assert summary.missing == 1
+    assert summary.infinite == 2
+    assert summary.stats.count == 2
+    assert summary.stats.mean == 2.0
+    assert summary.sketch.count == 2
+    assert not math.isnan(summary.snapshot()['variance'])
+
+
+def test_sketch_drops_non_finite_values():
+    sketch = QuantileSketch()
+    sketch.add(float('inf'))
+    sketch.add(float('nan'))
+    sketch.add_many(numpy.array([float('inf'), 2.0]))
+
+    assert sketch.count == 1
+    assert list(sketch.positive.values()) == [1]
+
+
+def test_string_array_in_numeric_feature():
+    summary = FeatureSummary(True)
+    summary.add_many(numpy.array(['1.5', 'abc', '2.5']))
+
+    assert summary.missing == 1
+    assert summary.stats.count == 2
+    assert summary.stats.mean == 2.0
+
+
+def test_object_array_with_none():
+    summary = FeatureSummary(True)
+    summary.add_many(numpy.array([1.0, None, 'x'], dtype=object))
+
+    assert summary.missing == 2
+    assert summary.stats.count == 1
+
+
+def test_zero_dimensional_arrays():
+    aggregator = FeatureAggregator({'data_input': [
+        {'name': 'x', 'type': 'float'}]})
+
+    aggregator.add('data_input', numpy.array(2.0))
+    aggregator.add('data_input', {'x': numpy.array(4.0)})
+
+    snapshot = aggregator.snapshot()['data_input']
+    assert snapshot['x']['count'] == 2
+    assert snapshot['x']['mean'] == 3.0
+
+
+def test_heavy_hitters():
+    top = HeavyHitters(2)
+    top.add_many(numpy.array(['a', 'a', 'b', 'a', 'c']))
+
+    assert top.count == 5
+    assert top.snapshot()['top'][0] == ('a', 3)
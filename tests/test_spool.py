@@ -0,0 +1,268 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import FakeTransporter, make_transporter
+from monitoring.spool import Spool, SpoolReplayer
+
+
+def record(i):
+    return {'verb': 'PUT', 'path': '1/sessions', 'data': {'i': i}}
+
+
+def segments(directory):
+    return sorted(name for name in os.listdir(directory)
+                  if name.endswith('.seg'))
+
+
+def test_read_and_commit(tmpdir):
+    spool = Spool(str(tmpdir))
+    for i in range(5):
+        spool.append(record(i))
+
+    records, cursor = spool.read(3)
+    assert [r['data']['i'] for r in records] == [0, 1, 2]
+
+    spool.commit(cursor)
+    records, cursor = spool.read(10)
+    assert [r['data']['i'] for r in records] == [3, 4]
+
+    spool.commit(cursor)
+    assert spool.read(10)[0] == []
+    spool.close()
+
+
+def test_records_survive_a_crash(tmpdir):
+    spool = Spool(str(tmpdir), fsync=Spool.FSYNC_ALWAYS)
+    for i in range(3):
+        spool.append(record(i))
+    spool.commit(spool.read(1)[1])
+    # No close: the process dies here.
+
+    recovered = Spool(str(tmpdir))
+    records, _ = recovered.read(10)
+
+    # The checkpoint survives too, delivered records are not replayed.
+    assert [r['data']['i'] for r in records] == [1, 2]
+    recovered.close()
+
+
+def test_torn_frame_is_truncated(tmpdir):
+    spool = Spool(str(tmpdir))
+    spool.append(record(0))
+    spool.append(record(1))
+    spool.close()
+
+    path = os.path.join(str(tmpdir), segments(str(tmpdir))[-1])
+    size = os.path.getsize(path)
+    with open(path, 'r+b') as segment:
+        segment.truncate(size - 3)
+
+    recovered = Spool(str(tmpdir))
+    records, _ = recovered.read(10)
+
+    assert [r['data']['i'] for r in records] == [0]
+    recovered.close()
+
+
+def test_foreign_segment_names_are_skipped(tmpdir):
+    tmpdir.join('notes.seg').write('not a segment')
+    tmpdir.join('00000000000000000001.seg.bak.seg').write('')
+
+    spool = Spool(str(tmpdir))
+    spool.append(record(0))
+
+    assert [r['data']['i'] for r in spool.read(10)[0]] == [0]
+    spool.close()
+
+
+def test_segments_rotate_and_delivered_ones_are_removed(tmpdir):
+    spool = Spool(str(tmpdir), segment_size=64)
+    for i in range(10):
+        spool.append(record(i))
+
+    assert len(segments(str(tmpdir))) > 2
+
+    records, cursor = spool.read(100)
+    assert len(records) == 10
+
+    spool.commit(cursor)
+    assert len(segments(str(tmpdir))) == 1
+    spool.close()
+
+
+def test_max_size_drops_the_oldest_segments(tmpdir):
+    spool = Spool(str(tmpdir), segment_size=64, max_size=256)
+    for i in range(50):
+        spool.append(record(i))
+
+    records, _ = spool.read(100)
+
+    assert spool.dropped > 0
+    assert spool.dropped + len(records) == 50
+    assert records[-1]['data']['i'] == 49
+    spool.close()
+
+
+@pytest.fixture
+def replayer_parts(tmpdir):
+    spool = Spool(str(tmpdir))
+    transporter = FakeTransporter()
+    replayer = SpoolReplayer(spool, transporter, batch_size=2,
+                             interval=3600)
+
+    yield spool, transporter, replayer
+
+    replayer.stop(5)
+    spool.close()
+
+
+def test_replay_delivers_in_order(replayer_parts):
+    spool, transporter, replayer = replayer_parts
+    for i in range(5):
+        spool.append(record(i))
+
+    assert replayer.replay() == 5
+    assert transporter.written == [0, 1, 2, 3, 4]
+    assert spool.read(10)[0] == []
+
+
+def test_replay_resumes_after_unreachable(replayer_parts):
+    spool, transporter, replayer = replayer_parts
+    for i in range(3):
+        spool.append(record(i))
+
+    transporter.unreachable = True
+    assert replayer.replay() == 0
+    assert len(spool.read(10)[0]) == 3
+
+    transporter.unreachable = False
+    assert replayer.replay() == 3
+    assert transporter.written == [0, 1, 2]
+
+
+def test_rejected_records_are_not_retried(replayer_parts):
+    spool, transporter, replayer = replayer_parts
+    transporter.rejected.add(1)
+    for i in range(3):
+        spool.append(record(i))
+
+    assert replayer.replay() == 2
+    assert replayer.rejected == 1
+    assert spool.read(10)[0] == []
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+
+    return process.pid
+
+
+def spool_records(directory, values, delivered=0):
+    spool = Spool(directory)
+    for i in values:
+        spool.append(record(i))
+    if delivered:
+        spool.commit(spool.read(delivered)[1])
+    spool.close()
+
+
+def test_restart_adopts_the_spools_of_dead_workers(tmpdir):
+    worker = os.path.join(str(tmpdir), str(dead_pid()))
+    spool_records(worker, range(4), delivered=1)
+
+    spool = Spool(str(tmpdir))
+    records, _ = spool.read(10)
+
+    assert [r['data']['i'] for r in records] == [1, 2, 3]
+    assert not os.path.exists(worker)
+    spool.close()
+
+
+def test_live_workers_keep_their_spool(tmpdir):
+    worker = os.path.join(str(tmpdir), str(os.getppid()))
+    spool_records(worker, range(2))
+
+    spool = Spool(str(tmpdir))
+
+    assert spool.read(10)[0] == []
+    assert os.path.isdir(worker)
+    spool.close()
+
+
+def test_claims_of_dead_adopters_are_taken_over(tmpdir):
+    claim = os.path.join(str(tmpdir),
+                         '{}.{}'.format(dead_pid(), dead_pid()))
+    spool_records(claim, range(2))
+
+    spool = Spool(str(tmpdir))
+
+    assert [r['data']['i'] for r in spool.read(10)[0]] == [0, 1]
+    assert not os.path.exists(claim)
+    spool.close()
+
+
+def test_replayer_adopts_orphans(tmpdir):
+    spool = Spool(str(tmpdir))
+    transporter = FakeTransporter()
+    replayer = SpoolReplayer(spool, transporter, interval=3600)
+
+    spool_records(os.path.join(str(tmpdir), str(dead_pid())), range(3))
+
+    assert replayer.replay() == 3
+    assert transporter.written == [0, 1, 2]
+
+    replayer.stop(5)
+    spool.close()
+
+
+@pytest.mark.skipif(not hasattr(os, 'register_at_fork'),
+                    reason='fork hooks need Python 3.7+')
+def test_records_of_a_crashed_forked_worker_are_replayed(tmpdir):
+    spool = Spool(str(tmpdir), fsync=Spool.FSYNC_ALWAYS)
+    spool.append(record(0))
+
+    pid = os.fork()
+    if pid == 0:
+        # Worker: spools to its own directory, then dies without closing.
+        code = 1
+        try:
+            spool.append(record(1))
+            spool.append(record(2))
+            code = 0 if spool._directory.endswith(str(os.getpid())) else 2
+        finally:
+            os._exit(code)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    # The parent's spool is untouched by the worker.
+    assert [r['data']['i'] for r in spool.read(10)[0]] == [0]
+
+    assert spool.adopt_orphans() == 2
+    assert [r['data']['i'] for r in spool.read(10)[0]] == [0, 1, 2]
+    assert not os.path.exists(os.path.join(str(tmpdir), str(pid)))
+    spool.close()
+
+
+def test_records_spooled_after_close_are_dropped(tmpdir):
+    spool = Spool(str(tmpdir))
+    spool.append(record(0))
+    spool.close()
+
+    spool.append(record(1))
+
+    assert spool.dropped == 1
+    assert [r['data']['i'] for r in spool.read(10)[0]] == [0]
+
+
+def test_unreachable_write_after_close_is_dropped(tmpdir):
+    transporter, _ = make_transporter({'a': 'down'}, hosts=('a',))
+    transporter.spool = Spool(str(tmpdir))
+    transporter.close()
+    transporter.spool.close()
+
+    assert transporter.write('POST', 'sessions', {'i': 0}, None) is None
+    assert transporter.spool.dropped == 1
@@ -0,0 +1,395 @@
+import time
+
+import pytest
+
+from conftest import Clock, make_config, make_transporter
+from monitoring.exceptions import MonitoringUnreachableHostException
+from monitoring.http.hosts import Host
+from monitoring.http.request_options import RequestOptions
+from monitoring.http.transporter import (
+    CircuitBreakers,
+    Response,
+    RetryBudget
+)
+from monitoring.http.verb import Verb
+from monitoring.metrics import MetricsRegistry
+
+
+def write(transporter, request_options=None):
+    return transporter.write(Verb.POST, 'sessions', {'x': 1},
+                             request_options)
+
+
+def test_fails_over_to_the_next_host():
+    transporter, requester = make_transporter({'a': 'down'})
+
+    assert write(transporter) == {'status': 200}
+    assert [host for host, _, _ in requester.sent] == ['a', 'b']
+
+
+def test_unreachable_when_every_host_fails():
+    transporter, requester = make_transporter(
+        {'a': 'down', 'b': 'down', 'c': 'down'})
+
+    with pytest.raises(MonitoringUnreachableHostException):
+        write(transporter)
+
+    assert len(requester.sent) == 3
+
+
+def test_deadline_bounds_the_whole_call():
+    transporter, requester = make_transporter(
+        {'a': 'hang', 'b': 'hang', 'c': 'hang'}, deadline=0.3)
+
+    started = time.time()
+    with pytest.raises(MonitoringUnreachableHostException):
+        write(transporter)
+
+    assert time.time() - started < 0.6
+    # The attempts share what is left of the deadline.
+    assert requester.sent[0][2] == pytest.approx(0.1, abs=0.02)
+
+
+def test_per_call_deadline_from_a_string():
+    transporter, requester = make_transporter(
+        {'a': 'hang', 'b': 'hang', 'c': 'hang'})
+
+    started = time.time()
+    with pytest.raises(MonitoringUnreachableHostException):
+        write(transporter, {'deadline': '0.2'})
+
+    assert time.time() - started < 0.5
+
+
+def test_request_options_convert_timeouts():
+    options = RequestOptions.create(make_config(),
+                                    {'deadline': '1.5', 'readTimeout': 2})
+
+    assert options.timeouts['deadline'] == 1.5
+    assert options.timeouts['readTimeout'] == 2.0
+
+    options['deadline'] = None
+    assert options.timeouts['deadline'] is None
+
+    with pytest.raises(ValueError):
+        options['deadline'] = 'soon'
+
+
+def test_backoff_is_bounded():
+    transporter, _ = make_transporter(retry_backoff=0.1,
+                                      retry_backoff_max=0.3)
+    request = type('Request', (), {'deadline': None})()
+
+    for attempt in range(1, 6):
+        delay = transporter._backoff(request, attempt, time.time())
+        assert 0 <= delay <= min(0.3, 0.1 * 2 ** (attempt - 1))
+
+
+def test_spent_budget_stops_retries():
+    transporter, requester = make_transporter(
+        {'a': 'down', 'b': 'down'}, retry_budget_ratio=0.0,
+        retry_budget_minimum=0)
+
+    with pytest.raises(MonitoringUnreachableHostException) as error:
+        write(transporter)
+
+    assert 'retry budget' in str(error.value)
+    assert len(requester.sent) == 1
+
+
+def make_budget(ratio, minimum):
+    clock = Clock()
+    budget = RetryBudget(ratio, minimum)
+    budget._now = clock
+    budget._second = int(clock.now)
+
+    return budget, clock
+
+
+def test_budget_allows_minimum_plus_ratio_of_calls():
+    budget, _ = make_budget(0.1, 2)
+    for _ in range(30):
+        budget.call()
+
+    allowed = sum(budget.retry() for _ in range(10))
+
+    assert allowed == 5
+
+
+def test_budget_window_slides():
+    budget, clock = make_budget(0.0, 3)
+
+    assert [budget.retry() for _ in range(4)] == [True, True, True, False]
+
+    clock.now += RetryBudget.WINDOW - 1
+    assert not budget.retry()
+
+    # The second of the first retries has left the window.
+    clock.now += 1
+    assert budget.retry()
+
+
+def test_budget_counts_calls_per_second():
+    budget, clock = make_budget(0.5, 0)
+    for _ in range(4):
+        budget.call()
+
+    clock.now += 5
+    assert budget.retry() and budget.retry()
+    assert not budget.retry()
+
+    clock.now += RetryBudget.WINDOW
+    assert not budget.retry()
+
+
+def make_breakers(threshold=2, reset_timeout=1.0, reset_timeout_max=3.0):
+    clock = Clock()
+    breakers = CircuitBreakers(threshold, reset_timeout, reset_timeout_max)
+    breakers._now = clock
+
+    return breakers, clock
+
+
+def test_circuit_opens_after_the_threshold():
+    breakers, _ = make_breakers()
+
+    breakers.record('e', True)
+    assert breakers.state('e') == CircuitBreakers.CLOSED
+    assert breakers.allow('e')
+
+    breakers.record('e', True)
+    assert breakers.state('e') == CircuitBreakers.OPEN
+    assert not breakers.allow('e')
+
+
+def test_success_resets_the_failure_count():
+    breakers, _ = make_breakers()
+
+    breakers.record('e', True)
+    breakers.record('e', False)
+    breakers.record('e', True)
+
+    assert breakers.state('e') == CircuitBreakers.CLOSED
+
+
+def test_half_open_lets_one_probe_through():
+    breakers, clock = make_breakers()
+    breakers.record('e', True)
+    breakers.record('e', True)
+
+    clock.now += 1.0
+    assert breakers.allow('e')
+    assert breakers.state('e') == CircuitBreakers.HALF_OPEN
+    assert not breakers.allow('e')
+
+    breakers.record('e', False)
+    assert breakers.state('e') == CircuitBreakers.CLOSED
+    assert breakers.allow('e')
+
+
+def test_failed_probe_doubles_the_wait():
+    breakers, clock = make_breakers()
+    breakers.record('e', True)
+    breakers.record('e', True)
+
+    waits = []
+    for _ in range(3):
+        opened = clock.now
+        while not breakers.allow('e'):
+            clock.now += 0.5
+        waits.append(clock.now - opened)
+        breakers.record('e', True)
+
+    assert waits == [1.0, 2.0, 3.0]
+
+
+def test_unanswered_probe_is_replaced():
+    breakers, clock = make_breakers()
+    breakers.record('e', True)
+    breakers.record('e', True)
+
+    clock.now += 1.0
+    assert breakers.allow('e')
+    clock.now += 1.0
+    assert breakers.allow('e')
+
+
+def test_circuits_are_per_endpoint():
+    breakers, _ = make_breakers()
+    breakers.record('e', True)
+    breakers.record('e', True)
+
+    assert not breakers.allow('e')
+    assert breakers.allow('other')
+
+
+def test_open_circuit_fails_fast_without_requests():
+    transporter, requester = make_transporter(
+        {'a': 'down', 'b': 'down', 'c': 'down'},
+        host_failure_threshold=100, circuit_failure_threshold=2,
+        circuit_reset_timeout=60.0)
+
+    for _ in range(2):
+        with pytest.raises(MonitoringUnreachableHostException):
+            write(transporter)
+    sent = len(requester.sent)
+
+    with pytest.raises(MonitoringUnreachableHostException) as error:
+        write(transporter)
+
+    assert 'circuit open' in str(error.value)
+    assert len(requester.sent) == sent
+
+
+def test_open_circuit_hands_writes_to_the_spool(tmpdir):
+    from monitoring.spool import Spool
+
+    transporter, requester = make_transporter(
+        {'a': 'down', 'b': 'down', 'c': 'down'},
+        host_failure_threshold=100, circuit_failure_threshold=1,
+        circuit_reset_timeout=60.0)
+    transporter.spool = Spool(str(tmpdir))
+
+    assert write(transporter) is None
+    sent = len(requester.sent)
+    assert write(transporter) is None
+
+    assert len(requester.sent) == sent
+    assert len(transporter.spool.read(10)[0]) == 2
+    transporter.spool.close()
+
+
+def test_hosts_are_marked_down_after_the_threshold():
+    transporter, _ = make_transporter(host_failure_threshold=2)
+    strategy = transporter._retry_strategy
+    hosts = transporter._config.hosts.write()
+    host_a = [host for host in hosts if host.url == 'a'][0]
+    failure = Response(error_message='refused', is_network_error=True)
+
+    strategy.decide(host_a, failure)
+    assert host_a.up
+
+    strategy.decide(host_a, failure)
+    assert not host_a.up
+    assert host_a not in strategy.valid_hosts(hosts)
+
+
+def test_down_host_is_probed_by_one_call():
+    transporter, requester = make_transporter({'a': 'down'})
+    strategy = transporter._retry_strategy
+    clock = Clock()
+    strategy._now = clock
+    hosts = transporter._config.hosts.write()
+    host_a = [host for host in hosts if host.url == 'a'][0]
+
+    strategy.decide(host_a, Response(error_message='refused',
+                                     is_network_error=True))
+    assert host_a not in strategy.valid_hosts(hosts)
+
+    clock.now += Host.BACKOFF
+    # The first call probes it first, the next ones skip it.
+    assert strategy.valid_hosts(hosts)[0] is host_a
+    assert host_a not in strategy.valid_hosts(hosts)
+
+    strategy.decide(host_a, Response(200, {}))
+    assert host_a in strategy.valid_hosts(hosts)
+
+
+def test_failed_probe_keeps_the_host_down_longer():
+    transporter, _ = make_transporter()
+    strategy = transporter._retry_strategy
+    clock = Clock()
+    strategy._now = clock
+    hosts = transporter._config.hosts.write()
+    host_a = [host for host in hosts if host.url == 'a'][0]
+    failure = Response(error_message='refused', is_network_error=True)
+
+    strategy.decide(host_a, failure)
+    first = host_a.down_until - clock.now
+
+    clock.now += first
+    assert strategy.valid_hosts(hosts)[0] is host_a
+    strategy.decide(host_a, failure)
+
+    assert host_a.down_until - clock.now == 2 * first
+
+
+def read(transporter, timeout=1):
+    return transporter.read(Verb.GET, 'applications', None,
+                            {'readTimeout': timeout})
+
+
+def make_hedged(answers=None, **options):
+    return make_transporter(answers, hosts=('a', 'b'), hedge_reads=True,
+                            hedge_delay=0.05, metrics=MetricsRegistry(),
+                            **options)
+
+
+def hedge_saturated(transporter, action):
+    name = 'monitoring_hedge_saturated_total{{action="{}"}} '.format(action)
+    for line in transporter.metrics.prometheus().splitlines():
+        if line.startswith(name):
+            return float(line.split(' ')[-1])
+
+    return 0
+
+
+def test_hedge_answers_past_a_hanging_host():
+    transporter, requester = make_hedged({'a': 'hang'})
+
+    started = time.time()
+    assert read(transporter) == {'status': 200}
+
+    assert time.time() - started < 0.5
+    assert [host for host, _, _ in requester.sent] == ['a', 'b']
+    transporter.close()
+
+
+def test_saturated_hedge_pool_sends_from_the_caller():
+    transporter, requester = make_hedged(hedge_workers=1)
+    # A losing attempt still holds the only worker.
+    assert transporter._hedge_acquire()
+
+    assert read(transporter) == {'status': 200}
+
+    assert transporter._hedge_executor._work_queue.qsize() == 0
+    assert hedge_saturated(transporter, 'sent_inline') == 1
+    transporter._hedge_release()
+    assert transporter._hedge_busy == 0
+    transporter.close()
+
+
+def test_hedge_is_not_queued_behind_busy_workers():
+    transporter, requester = make_hedged({'a': 'hang'}, hedge_workers=1)
+
+    started = time.time()
+    assert read(transporter, 0.3) == {'status': 200}
+
+    # No worker for the hedge: 'b' was tried once 'a' timed out.
+    assert time.time() - started >= 0.3
+    assert hedge_saturated(transporter, 'hedge_skipped') >= 1
+    assert [host for host, _, _ in requester.sent] == ['a', 'b']
+    transporter.close()
+
+
+def test_body_headers_do_not_leak_into_later_requests():
+    transporter, requester = make_transporter(compression='gzip',
+                                              compression_threshold=1024)
+    options = RequestOptions.create(make_config())
+    sent = []
+    send = requester.send
+
+    def record(request):
+        sent.append((request.headers, request.body))
+        return send(request)
+
+    requester.send = record
+    transporter.write(Verb.POST, 'sessions', {'x': 'y' * 4096}, options)
+    transporter.write(Verb.POST, 'sessions', {'x': 'y'}, options)
+
+    (large_headers, large), (small_headers, small) = sent
+    assert large_headers['Content-Encoding'] == 'gzip'
+    assert large[:2] == b'\x1f\x8b'
+    assert 'Content-Encoding' not in small_headers
+    assert small == b'{"x":"y"}'
+    assert 'Content-Encoding' not in options.headers
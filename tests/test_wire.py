@@ -0,0 +1,134 @@
+import json
+import random
+import zlib
+
+import pytest
+
+from monitoring.exceptions import MonitoringException
+from monitoring.http.wire import (
+    ChunkedBody,
+    Compression,
+    WireFormat,
+    encode_body
+)
+
+CODECS = [
+    Compression.GZIP,
+    Compression.DEFLATE,
+    pytest.param(Compression.ZSTD, marks=pytest.mark.skipif(
+        Compression.ZSTD not in Compression._codecs,
+        reason='zstd needs the zstandard package')),
+]
+
+PAYLOAD = {'records': [{'i': i, 'label': 'label-{}'.format(i % 7)}
+                       for i in range(2000)]}
+
+
+@pytest.mark.parametrize('codec', CODECS)
+def test_compressed_bodies_round_trip(codec):
+    body = json.dumps(PAYLOAD).encode('utf-8')
+
+    compressed = Compression.compress(body, codec)
+
+    assert len(compressed) < len(body)
+    assert Compression.decompress(compressed, codec) == body
+
+
+@pytest.mark.parametrize('codec', CODECS)
+def test_encoded_bodies_round_trip(codec):
+    body, headers = encode_body(PAYLOAD, compression=codec)
+
+    assert headers == {'Content-Type': 'application/json',
+                       'Content-Encoding': codec}
+    assert json.loads(Compression.decompress(body, codec)) == PAYLOAD
+
+
+def test_raw_deflate_responses_are_read():
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    content = compressor.compress(b'{"a": 1}') + compressor.flush()
+
+    assert Compression.decompress(content, Compression.DEFLATE) == \
+        b'{"a": 1}'
+
+
+def test_bodies_under_the_threshold_are_not_compressed():
+    body, headers = encode_body({'a': 1}, compression=Compression.GZIP,
+                                compression_threshold=1024)
+
+    assert body == b'{"a":1}'
+    assert headers == {'Content-Type': 'application/json'}
+
+
+def test_bodies_at_the_threshold_are_compressed():
+    size = len(WireFormat.encode(PAYLOAD, WireFormat.JSON))
+
+    body, headers = encode_body(PAYLOAD, compression=Compression.GZIP,
+                                compression_threshold=size)
+
+    assert headers['Content-Encoding'] == Compression.GZIP
+    assert body[:2] == b'\x1f\x8b'
+
+    body, headers = encode_body(PAYLOAD, compression=Compression.GZIP,
+                                compression_threshold=size + 1)
+
+    assert 'Content-Encoding' not in headers
+    assert json.loads(body) == PAYLOAD
+
+
+def test_accept_encoding_lists_the_codecs():
+    accepted = Compression.accept_encoding().split(', ')
+
+    assert accepted == sorted(Compression._codecs)
+    assert Compression.GZIP in accepted and Compression.DEFLATE in accepted
+
+
+def test_unknown_codec_raises():
+    with pytest.raises(MonitoringException):
+        encode_body({'a': 1}, compression='brotli')
+
+
+def test_bodies_past_the_stream_threshold_are_chunked():
+    size = len(WireFormat.encode(PAYLOAD, WireFormat.JSON))
+
+    body, headers = encode_body(PAYLOAD, stream_threshold=size)
+
+    assert isinstance(body, ChunkedBody)
+    assert headers == {'Content-Type': 'application/json'}
+    assert json.loads(b''.join(body)) == PAYLOAD
+
+    body, _ = encode_body(PAYLOAD, stream_threshold=size + 1)
+
+    assert isinstance(body, bytes)
+    assert json.loads(body) == PAYLOAD
+
+
+def test_streamed_bodies_are_compressed_past_both_thresholds():
+    body, headers = encode_body(PAYLOAD, compression=Compression.GZIP,
+                                compression_threshold=1024,
+                                stream_threshold=1024)
+
+    assert isinstance(body, ChunkedBody)
+    assert headers['Content-Encoding'] == Compression.GZIP
+    assert json.loads(Compression.decompress(b''.join(body),
+                                             Compression.GZIP)) == PAYLOAD
+
+
+@pytest.mark.parametrize('compression', [None, Compression.GZIP])
+def test_chunked_body_is_encoded_again_on_retry(compression):
+    # Random digits, which the compressor cannot shrink into one block.
+    rows = random.Random(0)
+    payload = {'rows': ['{:032x}'.format(rows.getrandbits(128))
+                        for _ in range(5000)]}
+    body = ChunkedBody(payload, compression)
+
+    first = list(body)
+    second = list(body)
+
+    assert len(first) > 1
+    assert first == second
+    assert all(len(block) >= body.BLOCK_SIZE for block in first[:-1])
+
+    content = b''.join(first)
+    if compression is not None:
+        content = Compression.decompress(content, compression)
+    assert json.loads(content) == payload